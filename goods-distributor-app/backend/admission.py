@@ -0,0 +1,168 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+from routers import auth
+
+# Admission control in front of the routers, per worker process:
+#  * a token bucket per (client, route class), the client being the authenticated
+#    user when the request carries a valid bearer token, else its IP address;
+#  * a cap on expensive report requests running at once. Over the cap the request is
+#    refused with 503 straight away rather than queued behind the slow ones.
+
+# Set 0 to turn both off (benchmarks do, since they hammer single endpoints on purpose)
+RATE_LIMIT = os.environ.get("RATE_LIMIT", "1") == "1"
+
+
+def _limit(name: str, default: str) -> tuple:
+    """RATE_LIMIT_<CLASS>="<requests per second>,<burst>"."""
+    rate, burst = os.environ.get(f"RATE_LIMIT_{name.upper()}", default).split(",")
+    return float(rate), float(burst)
+
+
+# Route class -> (tokens refilled per second, bucket size)
+RATE_LIMITS = {
+    "read": _limit("read", "20,60"),
+    "write": _limit("write", "10,30"),
+    "expensive": _limit("expensive", "1,10"),
+}
+
+# Expensive report requests running at once in this worker
+MAX_CONCURRENT_EXPENSIVE = int(os.environ.get("MAX_CONCURRENT_EXPENSIVE", "4"))
+
+# Buckets kept in memory; the least recently used is dropped beyond this
+MAX_BUCKETS = 10000
+
+# Multi-month scans and full-ledger aggregations
+EXPENSIVE_PREFIXES = (
+    "/reports/profit/",
+    "/reports/dashboard",
+    "/reports/yearly/",
+)
+
+# Monitoring and docs are never limited
+EXEMPT_PREFIXES = ("/metrics", "/docs", "/redoc", "/openapi.json")
+
+_lock = threading.Lock()
+_buckets = OrderedDict() # (client, route class) -> [tokens, last refill]
+_in_flight = 0
+_counters = defaultdict(lambda: {"allowed": 0, "rate_limited": 0, "shed": 0})
+
+
+def route_class(method: str, path: str):
+    """The route class of a request: "read", "write", "expensive", or None for exempt paths."""
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if method not in ("GET", "HEAD", "OPTIONS"):
+        return "write"
+    if path.startswith(EXPENSIVE_PREFIXES):
+        return "expensive"
+    return "read"
+
+
+async def _client(scope: Scope) -> str:
+    authorization = Headers(scope=scope).get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        try:
+            # Same check as the route dependency; verified tokens are cached, so this is cheap
+            user = await auth.get_current_user(authorization[7:])
+            return "user:" + user.username
+        except HTTPException:
+            pass
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+def _take(key: tuple, rate: float, burst: float) -> float:
+    """0 if a token was taken, else seconds until one is available."""
+    now = time.monotonic()
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = [burst, now]
+            if len(_buckets) > MAX_BUCKETS:
+                _buckets.popitem(last=False)
+        else:
+            _buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate if rate > 0 else 60.0
+
+
+def stats() -> dict:
+    """Per route class: requests allowed, refused by the rate limiter (429) and shed by the cap (503)."""
+    with _lock:
+        return {
+            "classes": {name: dict(counts) for name, counts in _counters.items()},
+            "expensive_in_flight": _in_flight,
+            "buckets": len(_buckets),
+        }
+
+
+async def _refuse(send: Send, status: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Token-bucket rate limiting per client and route class, plus the expensive-route concurrency cap."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        global _in_flight
+        if scope["type"] != "http" or not RATE_LIMIT:
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        rate, burst = RATE_LIMITS[name]
+        wait = _take((await _client(scope), name), rate, burst)
+        if wait:
+            with _lock:
+                _counters[name]["rate_limited"] += 1
+            await _refuse(send, 429, "Too many requests, slow down", wait)
+            return
+
+        if name != "expensive":
+            with _lock:
+                _counters[name]["allowed"] += 1
+            await self.app(scope, receive, send)
+            return
+
+        with _lock:
+            admitted = _in_flight < MAX_CONCURRENT_EXPENSIVE
+            if admitted:
+                _in_flight += 1
+                _counters[name]["allowed"] += 1
+            else:
+                _counters[name]["shed"] += 1
+        if not admitted:
+            await _refuse(send, 503, "Server busy with other reports, try again shortly", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            with _lock:
+                _in_flight -= 1
@@ -0,0 +1,189 @@
+import sys
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import models
+
+# Amounts are floats, so anything under a paisa is rounding noise, not drift.
+DRIFT_TOLERANCE = 0.01
+
+LEDGER_FIELDS = (
+    "commission_total", "commission_paid",
+    "remark_total", "remark_paid",
+    "product_taken_total", "product_taken_paid",
+)
+
+# GroupPayment.payment_type -> ledger column it settles
+PAYMENT_FIELDS = {
+    "commission": "commission_paid",
+    "remark": "remark_paid",
+}
+
+
+def total_due(balance) -> float:
+    """
+    Total Due = (Total Remarks - Paid Remarks) + (Total Commissions - Paid Commissions)
+    Product Taken is kept in the ledger but excluded here, same as the Total Due header.
+    """
+    if balance is None:
+        return 0.0
+    return ((balance.commission_total or 0.0) - (balance.commission_paid or 0.0)) + \
+        ((balance.remark_total or 0.0) - (balance.remark_paid or 0.0))
+
+
+def get_balance(db: Session, group_id: int):
+    return db.query(models.GroupBalance).filter(models.GroupBalance.group_id == group_id).first()
+
+
+def apply_delta(db: Session, group_id: int, **deltas):
+    """
+    Add the given deltas to the group's ledger row inside the caller's transaction.
+    Uses `col = col + delta` so concurrent writers never overwrite each other.
+    Call it after the sale/remark/payment rows are added to the session; the
+    caller is responsible for committing.
+    """
+    changes = {field: value for field, value in deltas.items() if value}
+    if not changes:
+        return
+
+    unknown = set(changes) - set(LEDGER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown ledger fields: {', '.join(sorted(unknown))}")
+
+    updated = db.query(models.GroupBalance).filter(
+        models.GroupBalance.group_id == group_id
+    ).update(
+        {getattr(models.GroupBalance, field): getattr(models.GroupBalance, field) + value
+         for field, value in changes.items()},
+        synchronize_session=False
+    )
+
+    if not updated:
+        # First movement for this group: start the row from the full history so
+        # a ledger created after the fact does not miss older sales.
+        db.flush()
+        balance = recompute_balance(db, group_id)
+        db.add(balance)
+        db.flush()
+
+
+def apply_payment(db: Session, group_id: int, payment_type: str, amount: float):
+    field = PAYMENT_FIELDS.get(payment_type)
+    if field:
+        apply_delta(db, group_id, **{field: amount})
+
+
+def compute_from_history(db: Session, group_id: int) -> dict:
+    """Recalculate the ledger values for one group by summing all history."""
+    commission_total = db.query(func.sum(models.DailySale.commission)).filter(
+        models.DailySale.group_id == group_id
+    ).scalar() or 0.0
+
+    remark_total = db.query(func.sum(models.SaleRemark.amount))\
+        .join(models.DailySale, models.SaleRemark.daily_sale_id == models.DailySale.id)\
+        .filter(models.DailySale.group_id == group_id).scalar() or 0.0
+
+    paid = dict(
+        db.query(models.GroupPayment.payment_type, func.sum(models.GroupPayment.amount))
+        .filter(models.GroupPayment.group_id == group_id)
+        .group_by(models.GroupPayment.payment_type).all()
+    )
+
+    taken_total, taken_paid = db.query(
+        func.sum(models.ProductTaken.total_price),
+        func.sum(models.ProductTaken.paid_amount)
+    ).filter(models.ProductTaken.group_id == group_id).one()
+
+    return {
+        "commission_total": commission_total,
+        "commission_paid": paid.get("commission") or 0.0,
+        "remark_total": remark_total,
+        "remark_paid": paid.get("remark") or 0.0,
+        "product_taken_total": taken_total or 0.0,
+        "product_taken_paid": taken_paid or 0.0,
+    }
+
+
+def recompute_balance(db: Session, group_id: int):
+    """Return the group's ledger row (existing or new) reset to the values derived from history."""
+    values = compute_from_history(db, group_id)
+    balance = get_balance(db, group_id) or models.GroupBalance(group_id=group_id)
+    for field, value in values.items():
+        setattr(balance, field, value)
+    return balance
+
+
+def rebuild_all(db: Session):
+    """Recompute every group's ledger row from scratch and commit."""
+    db.query(models.GroupBalance).filter(
+        ~models.GroupBalance.group_id.in_(db.query(models.Group.id))
+    ).delete(synchronize_session=False)
+
+    for (group_id,) in db.query(models.Group.id).all():
+        db.add(recompute_balance(db, group_id))
+    db.commit()
+
+
+def ensure_initialized(db: Session):
+    """Backfill the ledger once for databases created before group_balances existed."""
+    if db.query(models.GroupBalance).first() is None and db.query(models.Group).first() is not None:
+        rebuild_all(db)
+
+
+def verify(db: Session) -> list:
+    """
+    Compare every stored balance with a from-scratch recomputation.
+    Returns one entry per group whose ledger has drifted.
+    """
+    drift = []
+    for group in db.query(models.Group).order_by(models.Group.id).all():
+        expected = compute_from_history(db, group.id)
+        balance = get_balance(db, group.id)
+        stored = {field: (getattr(balance, field) or 0.0) if balance else 0.0 for field in LEDGER_FIELDS}
+
+        diffs = {
+            field: {"stored": stored[field], "expected": expected[field]}
+            for field in LEDGER_FIELDS
+            if abs(stored[field] - expected[field]) > DRIFT_TOLERANCE
+        }
+        if diffs or balance is None:
+            drift.append({
+                "group_id": group.id,
+                "name": group.name,
+                "missing": balance is None,
+                "fields": diffs,
+            })
+    return drift
+
+
+if __name__ == "__main__":
+    # Usage: python balances.py verify [--fix]
+    #        python balances.py rebuild
+    from database import SessionLocal, engine, Base
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if command == "rebuild":
+            rebuild_all(db)
+            print("Group balances rebuilt.")
+        elif command == "verify":
+            drift = verify(db)
+            if not drift:
+                print("Group balances are consistent.")
+            for entry in drift:
+                if entry["missing"]:
+                    print(f"Group {entry['group_id']} ({entry['name']}): ledger row missing")
+                for field, values in entry["fields"].items():
+                    print(f"Group {entry['group_id']} ({entry['name']}): {field} "
+                          f"stored={values['stored']:.2f} expected={values['expected']:.2f}")
+            if drift and "--fix" in sys.argv:
+                rebuild_all(db)
+                print("Group balances rebuilt.")
+            elif drift:
+                sys.exit(1)
+        else:
+            print(f"Unknown command: {command}")
+            sys.exit(2)
+    finally:
+        db.close()
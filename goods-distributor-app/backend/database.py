@@ -1,21 +1,105 @@
 import os
-from sqlalchemy import create_engine
+from pathlib import Path
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'goods_distributor.db')}"
+# DATABASE_URL lets benchmarks and scripts point the app at another database file
+SQLALCHEMY_DATABASE_URL = os.environ.get(
+    "DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'goods_distributor.db')}"
+)
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+
+# How long a writer waits for another worker's lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# WAL lets readers run alongside the single writer, so several workers can share the file
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+
+# Optional separate database for report reads, e.g. a Postgres streaming replica.
+# Without it, SQLite files get a second, read-only connection pool on the same file.
+READ_DATABASE_URL = os.environ.get("READ_DATABASE_URL")
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    if SQLITE_JOURNAL_MODE.upper() == "WAL":
+        # Durable at every checkpoint and much cheaper per commit; safe in WAL mode
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+def _read_only_sqlite_engine(database: str):
+    read_engine = create_engine(
+        f"sqlite:///{Path(database).as_uri()}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False}
+    )
+    event.listen(read_engine, "connect", _sqlite_pragmas)
+
+    # Run each read session as one explicit transaction, so a report's queries all see
+    # the same WAL snapshot while writers keep committing (pysqlite otherwise runs
+    # plain SELECTs outside any transaction).
+    @event.listens_for(read_engine, "connect")
+    def _manual_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(read_engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return read_engine
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {}
 )
+if IS_SQLITE:
+    event.listen(engine, "connect", _sqlite_pragmas)
+
+if READ_DATABASE_URL:
+    read_engine = create_engine(READ_DATABASE_URL)
+elif IS_SQLITE and engine.url.database and engine.url.database != ":memory:":
+    read_engine = _read_only_sqlite_engine(os.path.abspath(engine.url.database))
+else:
+    read_engine = engine
+
+def insert(table):
+    """INSERT supporting .on_conflict_do_update() (SQLite and PostgreSQL) for atomic upserts."""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(table)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
+if hasattr(os, "register_at_fork"):
+    # A worker forked from a preloaded app (gunicorn --preload) must not reuse the
+    # parent's pooled connections; give each process its own fresh pool.
+    def _dispose_pools():
+        engine.dispose(close=False)
+        if read_engine is not engine:
+            read_engine.dispose(close=False)
+
+    os.register_at_fork(after_in_child=_dispose_pools)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """
+    Session for GET report endpoints. It never takes the write lock, so long report
+    scans can't stall sale saves/locks; writing through it fails.
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,208 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import inspect, select, update, delete, extract, cast, func, Integer
+from database import engine, Base, SessionLocal, IS_SQLITE, SQLITE_JOURNAL_MODE
+import models
+import balances, rollups, etags, jobs, users
+
+# One-shot database setup: schema, journal mode and backfills of the derived tables.
+# Runs from the app lifespan (unless DB_INIT_ON_STARTUP=0) or as `python db_init.py`.
+# Every worker of a multi-process deployment may call it at once; a file lock makes
+# them run it one after another instead of racing DDL against the same database.
+
+logger = logging.getLogger("db_init")
+
+# Seconds to wait for another process to finish setup
+LOCK_TIMEOUT = float(os.environ.get("DB_INIT_LOCK_TIMEOUT", "120"))
+
+
+def _lock_path() -> str:
+    database = engine.url.database
+    if IS_SQLITE and database and database != ":memory:":
+        return os.path.abspath(database) + ".init.lock"
+    return os.path.join(tempfile.gettempdir(), "goods_distributor_db_init.lock")
+
+
+@contextmanager
+def _file_lock(path: str):
+    with open(path, "a+") as f:
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                if os.name == "nt":
+                    import msvcrt
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    import fcntl
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for database setup lock {path}")
+                time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# Indexes that an earlier version created and a newer one makes redundant
+RETIRED_INDEXES = (
+    "ix_sale_items_daily_sale_id", # covered by ix_sale_items_sale_product_qty
+)
+
+
+def _add_missing_columns():
+    """create_all never alters existing tables: add columns introduced since (all nullable)."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+
+
+def _backfill_year_month():
+    """year_month keys for rows written before the column existed (or by raw SQL)."""
+    with engine.begin() as conn:
+        for model in (models.DailySale, models.Expense):
+            conn.execute(
+                update(model.__table__)
+                .where(model.year_month.is_(None), model.date.isnot(None))
+                .values(year_month=extract("year", model.date) * 100 + extract("month", model.date))
+            )
+        target = models.MonthlyTarget
+        conn.execute(
+            update(target.__table__)
+            .where(target.year_month.is_(None), target.month.like("____-__"))
+            .values(year_month=cast(func.substr(target.month, 1, 4), Integer) * 100 +
+                    cast(func.substr(target.month, 6, 2), Integer))
+        )
+
+
+def _merge_duplicates():
+    """
+    Collapse rows that the unique indexes below would reject; they were created by
+    concurrent saves before the upserts existed.
+    Each copy of a daily sale is a full save of the same day's form, so summing them would
+    inflate the day. The row the app went on editing is kept as it is (the locked one, else
+    the oldest: the old lookup's unordered .first()) and the other copies are deleted with
+    their items and remarks. Only a copy's remarks that carry payments are moved onto the
+    kept row, so those payments aren't lost; each such move is logged. The caller rebuilds
+    the balances ledger and the rollups from the result.
+    Targets keep the most recently created row per group and month, pending jobs the
+    oldest of identical ones. Returns True if any daily sale was merged.
+    """
+    sale = models.DailySale.__table__
+    target = models.MonthlyTarget.__table__
+    with engine.begin() as conn:
+        duplicate_days = conn.execute(
+            select(sale.c.group_id, sale.c.date)
+            .group_by(sale.c.group_id, sale.c.date)
+            .having(func.count() > 1)
+        ).all()
+        item, remark = models.SaleItem.__table__, models.SaleRemark.__table__
+        for group_id, day in duplicate_days:
+            same_day = (sale.c.group_id == group_id) & (sale.c.date == day)
+            ids = list(conn.execute(
+                select(sale.c.id).where(same_day)
+                .order_by(func.coalesce(sale.c.is_locked, 0).desc(), sale.c.id)
+            ).scalars())
+            keep_id, others = ids[0], ids[1:]
+
+            paid = func.coalesce(remark.c.paid_amount, 0) > 0
+            moved = conn.execute(
+                update(remark).where(remark.c.daily_sale_id.in_(others), paid).values(daily_sale_id=keep_id)
+            ).rowcount
+            if moved:
+                logger.warning(
+                    "Group %s, %s: moved %d paid remark(s) from duplicate sale(s) %s onto sale %s; "
+                    "check them against that day's own remarks", group_id, day, moved, others, keep_id
+                )
+            conn.execute(delete(remark).where(remark.c.daily_sale_id.in_(others)))
+            conn.execute(delete(item).where(item.c.daily_sale_id.in_(others)))
+            conn.execute(delete(sale).where(sale.c.id.in_(others)))
+
+        duplicate_targets = conn.execute(
+            select(target.c.group_id, target.c.year_month, func.max(target.c.id))
+            .where(target.c.year_month.isnot(None))
+            .group_by(target.c.group_id, target.c.year_month)
+            .having(func.count() > 1)
+        ).all()
+        for group_id, key, keep_id in duplicate_targets:
+            conn.execute(delete(target).where(
+                target.c.group_id == group_id, target.c.year_month == key, target.c.id != keep_id
+            ))
+
+        # Identical pending jobs (submitted concurrently before uq_jobs_pending_kind_params):
+        # the oldest one stays, the others fail and point to it
+        job = models.Job.__table__
+        pending = job.c.status.in_(models.PENDING_JOB_STATUSES)
+        duplicate_jobs = conn.execute(
+            select(job.c.kind, job.c.params, func.min(job.c.id)).where(pending)
+            .group_by(job.c.kind, job.c.params)
+            .having(func.count() > 1)
+        ).all()
+        for kind, params, keep_id in duplicate_jobs:
+            conn.execute(update(job).where(
+                pending, job.c.kind == kind, job.c.params == params, job.c.id != keep_id
+            ).values(status="failed", error=f"Duplicate of job {keep_id}", finished_at=datetime.utcnow()))
+    return bool(duplicate_days)
+
+
+def init_db():
+    with _file_lock(_lock_path()):
+        if IS_SQLITE:
+            # Persistent property of the database file, so only needs setting once
+            with engine.connect() as conn:
+                conn.exec_driver_sql(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+
+        Base.metadata.create_all(bind=engine)
+        _add_missing_columns()
+        _backfill_year_month()
+        merged_sales = _merge_duplicates()
+        # create_all skips existing tables, so indexes added to a model later are created here
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+        with engine.begin() as conn:
+            for name in RETIRED_INDEXES:
+                conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+        # Backfill the group_balances ledger and product rollups for databases created before they existed
+        with SessionLocal() as db:
+            if merged_sales:
+                # Ledger and rollups counted every copy; recompute both from the kept rows
+                balances.rebuild_all(db)
+                rollups.rebuild(db)
+            balances.ensure_initialized(db)
+            rollups.ensure_initialized(db)
+            etags.ensure_initialized(db)
+            # Default logins for a new database (they lived in routers/auth.py before the users table)
+            users.ensure_initialized(db)
+            # Jobs whose worker died with them would otherwise stay "running" forever
+            jobs.recover(db)
+
+
+if __name__ == "__main__":
+    # Usage: python db_init.py
+    # Run once before starting several workers with DB_INIT_ON_STARTUP=0
+    if len(sys.argv) > 1:
+        print(f"Unknown argument: {sys.argv[1]}")
+        sys.exit(2)
+    init_db()
+    print("Database initialized.")
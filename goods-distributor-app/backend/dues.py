@@ -0,0 +1,241 @@
+from datetime import date, timedelta
+from sqlalchemy import case, func, literal, or_, select, update
+from sqlalchemy.orm import Session
+import models
+import balances
+
+# Outstanding receivables of an SR group, item by item:
+#  * remarks and products taken carry their own paid_amount, so what is left is per row;
+#  * commissions are paid as lump sums against the group (the ledger's commission_paid),
+#    so payments are taken to clear the oldest sale days first and what is left is the
+#    newest part of the commission history, found with a running total over the days.
+# Each kind is one SELECT of (group_id, kind, id, date, remaining) that can also be used
+# as a subquery, e.g. to bucket the dues by age.
+
+KINDS = ("commission", "remark", "product_taken")
+
+# Amounts below this are float noise (same tolerance as the pay endpoints)
+EPSILON = 0.01
+
+# Rows paid per UPDATE statement when settling
+UPDATE_CHUNK = 500
+
+# Receivable aging: (label, oldest age in days of the bucket); the last one is open-ended
+AGING_BUCKETS = (("0-7", 7), ("8-30", 30), ("31-90", 90), ("90+", None))
+
+
+class SettlementError(ValueError):
+    pass
+
+
+class SettlementConflict(SettlementError):
+    """The dues changed between reading and paying them (a concurrent payment)."""
+
+
+def commissions_statement(group_id: int = None):
+    sale, balance = models.DailySale, models.GroupBalance
+    earned = case((sale.commission > 0, sale.commission), else_=0.0)
+    # Negative commissions (corrections) count as paid, like a payment on that group
+    credited = case((sale.commission < 0, -sale.commission), else_=0.0)
+    days = select(
+        sale.group_id.label("group_id"),
+        sale.id.label("id"),
+        sale.date.label("date"),
+        sale.commission.label("commission"),
+        func.sum(earned).over(partition_by=sale.group_id, order_by=(sale.date, sale.id)).label("running"),
+        (func.coalesce(balance.commission_paid, 0.0) +
+         func.sum(credited).over(partition_by=sale.group_id)).label("paid"),
+    ).outerjoin(balance, balance.group_id == sale.group_id).where(sale.commission != 0)
+    if group_id is not None:
+        days = days.where(sale.group_id == group_id)
+    days = days.subquery()
+
+    # Part of this day's commission not covered by everything paid so far
+    unpaid = days.c.running - days.c.paid
+    remaining = case((unpaid < days.c.commission, unpaid), else_=days.c.commission)
+    return select(
+        days.c.group_id, literal("commission").label("kind"), days.c.id, days.c.date,
+        remaining.label("remaining")
+    ).where(days.c.commission > 0, remaining > EPSILON)
+
+
+def remarks_statement(group_id: int = None):
+    remark, sale = models.SaleRemark, models.DailySale
+    remaining = remark.amount - func.coalesce(remark.paid_amount, 0.0)
+    stmt = select(
+        sale.group_id.label("group_id"), literal("remark").label("kind"), remark.id.label("id"),
+        sale.date.label("date"), remaining.label("remaining")
+    ).join(sale, remark.daily_sale_id == sale.id).where(remark.is_fully_paid == 0, remaining > EPSILON)
+    if group_id is not None:
+        stmt = stmt.where(sale.group_id == group_id)
+    return stmt
+
+
+def product_taken_statement(group_id: int = None):
+    taken = models.ProductTaken
+    remaining = taken.total_price - func.coalesce(taken.paid_amount, 0.0)
+    stmt = select(
+        taken.group_id.label("group_id"), literal("product_taken").label("kind"), taken.id.label("id"),
+        taken.date.label("date"), remaining.label("remaining")
+    ).where(taken.is_fully_paid == 0, remaining > EPSILON)
+    if group_id is not None:
+        stmt = stmt.where(taken.group_id == group_id)
+    return stmt
+
+
+STATEMENTS = {
+    "commission": commissions_statement,
+    "remark": remarks_statement,
+    "product_taken": product_taken_statement,
+}
+
+
+def outstanding(db: Session, group_id: int) -> list:
+    """The group's unpaid items, oldest first: [{"kind", "id", "date", "remaining"}]."""
+    items = []
+    for kind in KINDS:
+        for row in db.execute(STATEMENTS[kind](group_id)):
+            items.append({"kind": kind, "id": row.id, "date": row.date, "remaining": row.remaining})
+    # Same day: commission, then remarks, then products taken
+    items.sort(key=lambda item: (item["date"], KINDS.index(item["kind"]), item["id"]))
+    return items
+
+
+def aging(db: Session, as_of: date) -> dict:
+    """
+    Outstanding amounts per group, kind and AGING_BUCKETS, aged from the sale (or
+    product taken) date to `as_of`: {group_id: {kind: {bucket: amount}}}.
+    One aggregate query per kind; only groups owing something are present.
+    """
+    result = {}
+    for kind in KINDS:
+        items = STATEMENTS[kind]().subquery()
+        columns, newer = [], None # newer: first day of the previous (more recent) bucket
+        for label, max_age in AGING_BUCKETS:
+            # Compared as dates, so the same SQL works on SQLite and PostgreSQL
+            if max_age is None:
+                condition = or_(items.c.date < newer, items.c.date.is_(None))
+            else:
+                oldest = as_of - timedelta(days=max_age)
+                condition = items.c.date >= oldest
+                if newer is not None:
+                    condition = condition & (items.c.date < newer)
+                newer = oldest
+            columns.append(func.coalesce(func.sum(case((condition, items.c.remaining), else_=0.0)), 0.0))
+        rows = db.execute(select(items.c.group_id, *columns).group_by(items.c.group_id)).all()
+        for group_id, *amounts in rows:
+            result.setdefault(group_id, {})[kind] = dict(zip((label for label, _ in AGING_BUCKETS), amounts))
+    return result
+
+
+def allocate(items: list, amount: float, plan: list = None) -> list:
+    """
+    Spread `amount` over outstanding items, oldest first or in the order of `plan`:
+    [{"kind", "id", "amount"}], where id is left out for commission (paid oldest day
+    first) and amount, if given, caps what that entry gets. Returns the items paid,
+    each with "amount" (paid now) and "remaining" (after it).
+    """
+    if plan is None:
+        steps = [(items, None)]
+    else:
+        by_key = {(item["kind"], item["id"]): item for item in items}
+        steps, planned = [], set()
+        for entry in plan:
+            kind = entry["kind"]
+            if kind not in KINDS:
+                raise SettlementError(f"Unknown kind: {kind}. Allowed: {', '.join(KINDS)}")
+            key = (kind, None if kind == "commission" else entry.get("id"))
+            label = kind if kind == "commission" else f"{kind} {key[1]}"
+            if key in planned:
+                raise SettlementError(f"{label} is in the plan more than once")
+            planned.add(key)
+            if kind == "commission":
+                selected = [item for item in items if item["kind"] == "commission"]
+            elif key in by_key:
+                selected = [by_key[key]]
+            else:
+                raise SettlementError(f"No outstanding {label}")
+            cap = entry.get("amount")
+            if cap is not None and cap > sum(item["remaining"] for item in selected) + EPSILON:
+                raise SettlementError(f"Plan pays more than the outstanding {label}")
+            steps.append((selected, cap))
+
+    left = amount
+    allocations = []
+    for selected, cap in steps:
+        budget = left if cap is None else min(left, cap)
+        for item in selected:
+            if budget <= EPSILON:
+                break
+            paid = min(budget, item["remaining"])
+            allocations.append(dict(item, amount=paid, remaining=item["remaining"] - paid))
+            budget -= paid
+            left -= paid
+    if left > EPSILON:
+        raise SettlementError(f"Amount is {left:.2f} more than the dues it was allocated to")
+    return allocations
+
+
+def _pay_rows(db: Session, model, total_column: str, amounts: dict):
+    """Add {row id: amount} to paid_amount with one UPDATE per chunk of rows."""
+    table = model.__table__
+    ids = sorted(amounts)
+    for start in range(0, len(ids), UPDATE_CHUNK):
+        chunk = ids[start:start + UPDATE_CHUNK]
+        paid = func.coalesce(table.c.paid_amount, 0.0) + case({i: amounts[i] for i in chunk}, value=table.c.id)
+        total = table.c[total_column]
+        result = db.execute(
+            update(table)
+            .where(table.c.id.in_(chunk), table.c.is_fully_paid == 0, paid <= total + EPSILON)
+            .values(paid_amount=paid, is_fully_paid=case((paid >= total - EPSILON, 1), else_=0))
+        )
+        # A row missing here was paid by someone else since it was read
+        if result.rowcount != len(chunk):
+            raise SettlementConflict("Dues changed while settling, try again")
+
+
+def settle(db: Session, group_id: int, amount: float, plan: list = None, paid_on: date = None) -> dict:
+    """
+    Pay `amount` off the group's dues inside the caller's transaction (the caller commits).
+    Remarks and products taken are updated in bulk; remark and commission parts are
+    recorded as one GroupPayment each, like the single-item pay endpoints do.
+    """
+    if amount <= 0:
+        raise SettlementError("Amount must be positive")
+    allocations = allocate(outstanding(db, group_id), amount, plan)
+
+    totals = {kind: 0.0 for kind in KINDS}
+    for allocation in allocations:
+        totals[allocation["kind"]] += allocation["amount"]
+
+    for kind, model, total_column in (
+        ("remark", models.SaleRemark, "amount"),
+        ("product_taken", models.ProductTaken, "total_price"),
+    ):
+        _pay_rows(db, model, total_column, {a["id"]: a["amount"] for a in allocations if a["kind"] == kind})
+
+    for payment_type in ("commission", "remark"):
+        if totals[payment_type]:
+            db.add(models.GroupPayment(
+                group_id=group_id, amount=totals[payment_type], payment_type=payment_type,
+                date=paid_on or date.today()
+            ))
+    balances.apply_delta(
+        db, group_id,
+        commission_paid=totals["commission"],
+        remark_paid=totals["remark"],
+        product_taken_paid=totals["product_taken"],
+    )
+    if totals["commission"]:
+        db.flush()
+        balance = balances.get_balance(db, group_id)
+        db.refresh(balance)
+        if balance.commission_paid > balance.commission_total + EPSILON:
+            raise SettlementConflict("Dues changed while settling, try again")
+
+    return {
+        "group_id": group_id,
+        "amount": amount,
+        "totals": totals,
+        "allocations": allocations,
+    }
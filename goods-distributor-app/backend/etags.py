@@ -0,0 +1,156 @@
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from database import engine
+import models
+
+# Resources whose version counters are bumped by the write paths:
+#   groups   - group created/deleted
+#   products - stock or prices changed (product CRUD, sale lock, product taken)
+#   sales    - daily sale saved/locked
+#   dues     - commissions, remarks, payments, product-taken balances
+#   expenses - expense recorded
+#   targets  - monthly target set
+RESOURCES = ("groups", "products", "sales", "dues", "expenses", "targets")
+
+# Counters live in the resource_versions table rather than process memory, so every
+# worker of a multi-process deployment hands out (and honours) the same ETags.
+_table = models.ResourceVersion.__table__
+
+# Seconds a worker answers conditional GETs from the counters it read last, so a 304
+# costs no query. Writes committed by this worker change its ETags at once; another
+# worker's writes can take up to this long to show.
+ETAG_CACHE_SECONDS = float(os.environ.get("ETAG_CACHE_SECONDS", "1"))
+
+_lock = threading.Lock()
+_stats = defaultdict(lambda: {"not_modified": 0, "full": 0})
+
+_cache_lock = threading.Lock()
+_cache = {"versions": None, "read_at": 0.0, "generation": 0}
+
+
+def bump(*resources, db: Session = None):
+    """
+    Mark resources as changed. Pass the request's session and call it before
+    db.commit(): the counters then commit in the same transaction as the data, so
+    nobody sees the new data under the old ETag. Without a session (jobs, scripts)
+    they are bumped in their own transaction; call it after the write has committed.
+    """
+    statement = _table.update()\
+        .where(_table.c.resource.in_(resources))\
+        .values(version=_table.c.version + 1)
+    if db is None:
+        with engine.begin() as conn:
+            conn.execute(statement)
+        invalidate()
+    else:
+        db.execute(statement)
+        db.info["etags_bumped"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    if session.info.pop("etags_bumped", False):
+        invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("etags_bumped", None)
+
+
+def invalidate():
+    """Drop this worker's cached counters (the next conditional GET reads them again)."""
+    with _cache_lock:
+        _cache["versions"] = None
+        _cache["generation"] += 1
+
+
+def _versions() -> dict:
+    with _cache_lock:
+        if _cache["versions"] is not None and time.monotonic() - _cache["read_at"] < ETAG_CACHE_SECONDS:
+            return _cache["versions"]
+        generation = _cache["generation"]
+    with engine.connect() as conn:
+        versions = dict(conn.execute(select(_table.c.resource, _table.c.version)).all())
+    with _cache_lock:
+        # A commit in between may have made this read stale already
+        if _cache["generation"] == generation:
+            _cache["versions"] = versions
+            _cache["read_at"] = time.monotonic()
+    return versions
+
+
+def current(*resources) -> tuple:
+    versions = _versions()
+    return tuple(versions.get(r, 0) for r in resources)
+
+
+def ensure_initialized(db: Session):
+    """
+    Create missing counter rows, then bump everything once: a restart may ship a
+    different response format, so representations cached before it must not get 304s.
+    """
+    existing = {row[0] for row in db.query(models.ResourceVersion.resource).all()}
+    for resource in RESOURCES:
+        if resource not in existing:
+            db.add(models.ResourceVersion(resource=resource, version=0))
+    db.commit()
+    bump(*RESOURCES)
+
+
+def make_etag(request: Request, resources: tuple) -> str:
+    # Query string is part of the key: ?limit=5 and ?limit=10 are different representations.
+    # Today's date too, since dashboard month/year/window figures roll over at midnight.
+    versions = ",".join(f"{r}={v}" for r, v in zip(resources, current(*resources)))
+    raw = f"{date.today()}|{request.url.path}?{request.url.query}|{versions}"
+    return '"' + hashlib.sha1(raw.encode()).hexdigest() + '"'
+
+
+def conditional(*resources):
+    """
+    Route dependency: answers 304 when the client's If-None-Match still matches,
+    before the handler runs any query; otherwise tags the response with an ETag.
+
+        @router.get("/", dependencies=[Depends(etags.conditional("groups", "products"))])
+    """
+    for resource in resources:
+        if resource not in RESOURCES:
+            raise ValueError(f"Unknown resource: {resource}")
+
+    def dependency(request: Request, response: Response):
+        etag = make_etag(request, resources)
+        route = request.scope.get("route")
+        key = route.path if route else request.url.path
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            with _lock:
+                _stats[key]["not_modified"] += 1
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+
+        with _lock:
+            _stats[key]["full"] += 1
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
+    return dependency
+
+
+def stats() -> dict:
+    """Per-route counts of 304 vs full responses (this worker process only)."""
+    with _lock:
+        result = {}
+        for route, counts in _stats.items():
+            total = counts["not_modified"] + counts["full"]
+            result[route] = {
+                **counts,
+                "not_modified_ratio": counts["not_modified"] / total if total else 0.0,
+            }
+        return result
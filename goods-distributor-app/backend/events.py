@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import json
+import threading
+from datetime import date, datetime
+
+# Events waiting per client before it is considered too slow
+CLIENT_QUEUE_SIZE = 100
+
+# Seconds between keep-alive comments so proxies don't close idle streams
+HEARTBEAT_SECONDS = 15
+
+# Event types pushed to clients:
+#   sale_locked   - a daily sale was finalized (sales totals, dashboard)
+#   payment       - a commission/remark/product-taken payment was recorded (dues)
+#   expense_added - an expense was recorded (profit)
+#   stock_changed - product stock or prices changed
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class Subscriber:
+    def __init__(self, types=None):
+        self.queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.types = set(types) if types else None
+
+    def offer(self, message: dict):
+        """
+        Runs on the event loop. A client that falls CLIENT_QUEUE_SIZE events behind
+        loses its backlog and gets a single `resync` event telling it to refetch,
+        so one slow dashboard never grows memory or blocks the others.
+        """
+        if self.types and message["type"] not in self.types and message["type"] != "resync":
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"id": message["id"], "type": "resync", "data": {}})
+
+
+class EventBroker:
+    """
+    Fan-out of small delta events to Server-Sent Events clients.
+    `publish` is safe to call from the sync route handlers running in the threadpool.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._loop = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, types=None) -> Subscriber:
+        # Called from the async /events handler, i.e. on the event loop
+        subscriber = Subscriber(types)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event_type: str, data: dict):
+        with self._lock:
+            if not self._subscribers or self._loop is None or self._loop.is_closed():
+                return
+            subscribers = list(self._subscribers)
+            loop = self._loop
+
+        message = {"id": next(self._ids), "type": event_type, "data": data}
+        for subscriber in subscribers:
+            loop.call_soon_threadsafe(subscriber.offer, message)
+
+    @staticmethod
+    def format(message: dict) -> str:
+        payload = json.dumps(message["data"], default=_default, separators=(",", ":"))
+        return f"id: {message['id']}\nevent: {message['type']}\ndata: {payload}\n\n"
+
+
+broker = EventBroker()
+
+
+def publish(event_type: str, **data):
+    broker.publish(event_type, data)
+
+
+def has_subscribers() -> bool:
+    """Lets callers skip building payloads (and reloading expired rows) when nobody listens."""
+    return broker.client_count > 0
+
+
+async def stream(request, subscriber: Subscriber):
+    """Async generator of SSE frames for one client; unsubscribes when the client goes away."""
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            yield EventBroker.format(message)
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,211 @@
+import inspect
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Session
+import models, balances, rollups, etags, sale_views, database
+from database import SessionLocal, ReadSessionLocal
+
+# Jobs running at once in this process; the rest wait in the queue
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+# Submissions are refused while this many jobs are queued or running
+MAX_PENDING_JOBS = int(os.environ.get("MAX_PENDING_JOBS", "20"))
+
+# Heavy work that shouldn't run inside an HTTP request. A job is a row in the jobs
+# table (so any worker can answer a poll) executed on this process's thread pool.
+# Submitting the same kind + params while one is still pending returns that job.
+# Both that check and the MAX_PENDING_JOBS cap are part of the INSERT itself, so
+# concurrent submissions from several workers can neither duplicate a job nor overshoot.
+
+logger = logging.getLogger("jobs")
+
+_executor = None
+_owner = None
+_executor_lock = threading.Lock()
+
+
+class JobError(ValueError):
+    pass
+
+
+class JobQueueFull(JobError):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+# Job kinds. Each opens its own session and returns something JSON-serializable.
+
+def lifetime_profit() -> dict:
+    from routers import reports
+    with ReadSessionLocal() as db:
+        return reports.get_lifetime_profit(db=db)
+
+
+def rebuild_balances() -> dict:
+    with SessionLocal() as db:
+        balances.rebuild_all(db)
+        groups = db.query(models.GroupBalance).count()
+    etags.bump("dues")
+    return {"groups": groups}
+
+
+def rebuild_rollups() -> dict:
+    with SessionLocal() as db:
+        rollups.rebuild(db)
+        rows = db.query(models.ProductSaleRollup).count()
+    etags.bump("sales")
+    return {"rows": rows}
+
+
+def export_year(year: int, group_id: int = None) -> dict:
+    year = int(year)
+    filters = [
+        models.DailySale.date >= date(year, 1, 1),
+        models.DailySale.date <= date(year, 12, 31),
+    ]
+    if group_id is not None:
+        filters.append(models.DailySale.group_id == group_id)
+    with ReadSessionLocal() as db:
+        sales = sale_views.load_sales(db, filters, list(sale_views.SUMMARY_FIELDS), [])
+    return {"year": year, "group_id": group_id, "sales": sales}
+
+
+JOB_KINDS = {
+    "lifetime_profit": lifetime_profit,
+    "rebuild_balances": rebuild_balances,
+    "rebuild_rollups": rebuild_rollups,
+    "export_year": export_year,
+}
+
+
+def owner() -> str:
+    """host:pid:token of this process (computed after fork; the token tells a restarted pid 1 apart)."""
+    global _owner
+    if _owner is None or _owner.split(":")[-2] != str(os.getpid()):
+        _owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    return _owner
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        return _executor
+
+
+def _run(job_id: int):
+    with SessionLocal() as db:
+        job = db.get(models.Job, job_id)
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        db.commit()
+        kind, params = job.kind, json.loads(job.params or "{}")
+
+    try:
+        result = JOB_KINDS[kind](**params)
+        status, result_json, error = "succeeded", json.dumps(result, default=_json_default), None
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job_id, kind)
+        status, result_json, error = "failed", None, f"{type(e).__name__}: {e}"
+
+    with SessionLocal() as db:
+        job = db.get(models.Job, job_id)
+        job.status = status
+        job.result = result_json
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+
+def submit(db: Session, kind: str, params: dict) -> models.Job:
+    """Queue a job (or return the identical one still pending). Raises JobError for bad input."""
+    if kind not in JOB_KINDS:
+        raise JobError(f"Unknown job kind: {kind}. Allowed: {', '.join(JOB_KINDS)}")
+    try:
+        inspect.signature(JOB_KINDS[kind]).bind(**params)
+    except TypeError as e:
+        raise JobError(f"Invalid params for {kind}: {e}")
+
+    params_json = json.dumps(params, sort_keys=True)
+    job_table = models.Job.__table__
+    pending = job_table.c.status.in_(models.PENDING_JOB_STATUSES)
+    pending_count = select(func.count()).select_from(job_table).where(pending).scalar_subquery()
+    # INSERT ... SELECT ... WHERE <room left> ON CONFLICT DO NOTHING: no row when the queue
+    # is full or an identical job is pending (uq_jobs_pending_kind_params)
+    row = select(
+        literal(kind), literal(params_json), literal("queued"), literal(owner()), literal(datetime.utcnow())
+    ).where(pending_count < MAX_PENDING_JOBS)
+    statement = database.insert(job_table)\
+        .from_select(["kind", "params", "status", "owner", "created_at"], row)\
+        .on_conflict_do_nothing(index_elements=["kind", "params"], index_where=pending)\
+        .returning(job_table.c.id)
+
+    # A second attempt covers the identical job finishing between the INSERT and the lookup
+    for _ in range(2):
+        job_id = db.execute(statement).scalar()
+        db.commit()
+        if job_id is not None:
+            _get_executor().submit(_run, job_id)
+            return db.get(models.Job, job_id)
+        existing = db.query(models.Job).filter(
+            models.Job.status.in_(models.PENDING_JOB_STATUSES),
+            models.Job.kind == kind, models.Job.params == params_json
+        ).first()
+        if existing:
+            return existing
+        if db.query(models.Job).filter(models.Job.status.in_(models.PENDING_JOB_STATUSES)).count() >= MAX_PENDING_JOBS:
+            break
+    raise JobQueueFull("Too many pending jobs, try again later")
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        return True # no cheap, safe check; leave such jobs alone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover(db: Session):
+    """Fail jobs left queued/running by a process on this host that no longer exists."""
+    me = owner()
+    host, pid = socket.gethostname(), os.getpid()
+    interrupted = 0
+    for job in db.query(models.Job).filter(models.Job.status.in_(("queued", "running"))).all():
+        parts = (job.owner or "").rsplit(":", 2)
+        if len(parts) != 3 or parts[0] != host or not parts[1].isdigit() or job.owner == me:
+            continue
+        job_pid = int(parts[1])
+        if job_pid == pid or not _pid_alive(job_pid):
+            job.status = "failed"
+            job.error = "Interrupted: the worker running this job stopped"
+            job.finished_at = datetime.utcnow()
+            interrupted += 1
+    if interrupted:
+        db.commit()
+
+
+def shutdown():
+    """Stop accepting work; queued jobs are failed by `recover` on the next start."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -1,12 +1,43 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import groups, products, sales, reports, auth, total_due
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from database import engine, read_engine
+from routers import groups, products, sales, reports, auth, total_due, events, jobs as jobs_router
+import admission, db_init, etags, jobs, metrics, profit, query_debug
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+try:
+    import orjson  # noqa: F401
+    DefaultResponse = ORJSONResponse
+except ImportError: # Fall back to stdlib json if orjson isn't installed
+    DefaultResponse = JSONResponse
 
-app = FastAPI(title="Goods Distributor API")
+# Responses smaller than this are not worth compressing
+COMPRESSION_MINIMUM_SIZE = 1024
+
+# Run schema setup when the app starts. Multi-worker deployments may leave it on (workers
+# take turns under a file lock) or set 0 and run `python db_init.py` once beforehand.
+DB_INIT_ON_STARTUP = os.environ.get("DB_INIT_ON_STARTUP", "1") == "1"
+
+# Count SQL statements / DB time per request, on the read-only report pool too
+for db_engine in {engine, read_engine}:
+    metrics.install(db_engine)
+    # N+1 detector and slow-query log (only when QUERY_DEBUG=1)
+    query_debug.install(db_engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Not at import time: importing the app must not touch the database
+    if DB_INIT_ON_STARTUP:
+        db_init.init_db()
+    yield
+    jobs.shutdown()
+    profit.shutdown()
+
+app = FastAPI(title="Goods Distributor API", default_response_class=DefaultResponse, lifespan=lifespan)
 
 # Configure CORS
 origins = [
@@ -22,6 +53,10 @@ origins = [
     "*",
 ]
 
+# Per-client rate limits and the expensive-report concurrency cap (set RATE_LIMIT=0 to disable).
+# Added first so it runs inside CORS: browsers can then read the 429/503 responses.
+app.add_middleware(admission.AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -30,15 +65,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Large report/ledger payloads compress well (Brotli if available, else GZip)
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
+# Per-route latency / query counts for /metrics (outermost, so it times everything).
+# Set SERVER_TIMING=1 to also send them back as a Server-Timing header.
+app.add_middleware(MetricsMiddleware)
+
 # Include Routers
 app.include_router(groups.router)
 app.include_router(products.router)
 app.include_router(sales.router)
 app.include_router(reports.router)
-app.include_router(reports.router)
 app.include_router(auth.router)
 app.include_router(total_due.router)
+app.include_router(events.router)
+app.include_router(jobs_router.router)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Goods Distributor API"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus text format: latency histograms, status codes, SQL statements and DB time per route."""
+    return PlainTextResponse(
+        metrics.render(etag_stats=etags.stats(), admission_stats=admission.stats()),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/metrics/etag")
+def read_etag_metrics():
+    """How often conditional GETs were answered with 304 vs a full response, per route."""
+    return etags.stats()
+
+@app.get("/metrics/admission")
+def read_admission_metrics():
+    """Requests allowed, rate limited (429) and shed (503) per route class, in this worker."""
+    return admission.stats()
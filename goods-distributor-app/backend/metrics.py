@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Latency histogram buckets in seconds (Prometheus `le` labels)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Add a Server-Timing header (app/db durations, query count) to every response
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+# Per-request SQL counters. The dict is created by the middleware and shared with
+# the threadpool that runs sync handlers (contextvars are copied into it).
+_request_stats: ContextVar = ContextVar("request_stats", default=None)
+
+_lock = threading.Lock()
+_routes = defaultdict(lambda: {
+    "buckets": [0] * len(LATENCY_BUCKETS),
+    "count": 0,
+    "sum": 0.0,
+    "queries": 0,
+    "db_seconds": 0.0,
+    "statuses": defaultdict(int),
+})
+
+
+def current_request_stats():
+    """The running request's {"queries", "db_seconds"} dict, or None outside a request."""
+    return _request_stats.get()
+
+
+def install(engine):
+    """Hook SQLAlchemy cursor events so each statement is counted against the running request."""
+
+    # The start time lives on the statement's execution context rather than the pooled
+    # connection: after_cursor_execute doesn't fire for a statement that raises
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["queries"] += 1
+            stats["db_seconds"] += elapsed
+
+
+def _record(route: str, status: int, seconds: float, stats: dict):
+    with _lock:
+        entry = _routes[route]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                entry["buckets"][i] += 1
+        entry["count"] += 1
+        entry["sum"] += seconds
+        entry["queries"] += stats["queries"]
+        entry["db_seconds"] += stats["db_seconds"]
+        entry["statuses"][status] += 1
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and attributes SQL statement count / DB time to its route."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = {"queries": 0, "db_seconds": 0.0}
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+        streaming = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                streaming = headers.get("content-type", "").startswith("text/event-stream")
+                if SERVER_TIMING:
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    headers.append(
+                        "Server-Timing",
+                        f'app;dur={elapsed_ms:.1f}, db;dur={stats["db_seconds"] * 1000:.1f};desc="{stats["queries"]} queries"'
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            # Long-lived SSE streams would only distort the latency histogram
+            if not streaming:
+                route = scope.get("route")
+                label = route.path if route is not None else "unmatched"
+                _record(f'{scope["method"]} {label}', status, time.perf_counter() - start, stats)
+
+
+def _labels(key: str, **extra) -> str:
+    method, route = key.split(" ", 1)
+    pairs = {"method": method, "route": route, **extra}
+    return ",".join(f'{k}="{v}"' for k, v in pairs.items())
+
+
+def render(etag_stats: dict = None, admission_stats: dict = None) -> str:
+    """All collected metrics in Prometheus text exposition format."""
+    with _lock:
+        snapshot = {
+            key: {**entry, "buckets": list(entry["buckets"]), "statuses": dict(entry["statuses"])}
+            for key, entry in _routes.items()
+        }
+
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for key, entry in sorted(snapshot.items()):
+        for bound, count in zip(LATENCY_BUCKETS, entry["buckets"]):
+            lines.append(f'http_request_duration_seconds_bucket{{{_labels(key, le=bound)}}} {count}')
+        lines.append(f'http_request_duration_seconds_bucket{{{_labels(key, le="+Inf")}}} {entry["count"]}')
+        lines.append(f'http_request_duration_seconds_sum{{{_labels(key)}}} {entry["sum"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{{_labels(key)}}} {entry["count"]}')
+
+    lines += [
+        "# HELP http_requests_total Requests by route and status code.",
+        "# TYPE http_requests_total counter",
+    ]
+    for key, entry in sorted(snapshot.items()):
+        for status, count in sorted(entry["statuses"].items()):
+            lines.append(f'http_requests_total{{{_labels(key, status=status)}}} {count}')
+
+    lines += [
+        "# HELP db_statements_total SQL statements executed, by route.",
+        "# TYPE db_statements_total counter",
+    ]
+    for key, entry in sorted(snapshot.items()):
+        lines.append(f'db_statements_total{{{_labels(key)}}} {entry["queries"]}')
+
+    lines += [
+        "# HELP db_time_seconds_total Time spent in SQL statements, by route.",
+        "# TYPE db_time_seconds_total counter",
+    ]
+    for key, entry in sorted(snapshot.items()):
+        lines.append(f'db_time_seconds_total{{{_labels(key)}}} {entry["db_seconds"]:.6f}')
+
+    if etag_stats:
+        lines += [
+            "# HELP http_conditional_responses_total Conditional GETs answered 304 vs in full.",
+            "# TYPE http_conditional_responses_total counter",
+        ]
+        for route, counts in sorted(etag_stats.items()):
+            for result in ("not_modified", "full"):
+                lines.append(f'http_conditional_responses_total{{route="{route}",result="{result}"}} {counts[result]}')
+
+    if admission_stats:
+        lines += [
+            "# HELP http_admission_total Requests allowed, rate limited (429) or shed (503), by route class.",
+            "# TYPE http_admission_total counter",
+        ]
+        for route_class, counts in sorted(admission_stats["classes"].items()):
+            for result in ("allowed", "rate_limited", "shed"):
+                lines.append(f'http_admission_total{{class="{route_class}",result="{result}"}} {counts[result]}')
+        lines += [
+            "# HELP http_expensive_in_flight Expensive report requests running now.",
+            "# TYPE http_expensive_in_flight gauge",
+            f'http_expensive_in_flight {admission_stats["expensive_in_flight"]}',
+        ]
+
+    return "\n".join(lines) + "\n"
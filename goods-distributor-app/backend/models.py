@@ -1,8 +1,29 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Index, Text, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
 
+
+def year_month(day) -> int:
+    """Integer month key used for monthly grouping: 202610 for any day of October 2026."""
+    return day.year * 100 + day.month
+
+
+def parse_year_month(month: str):
+    """Parse "2026-10" into 202610; None if it isn't a YYYY-MM month."""
+    parts = (month or "").split("-")
+    if len(parts) != 2 or len(parts[0]) != 4 or len(parts[1]) != 2 or not (parts[0] + parts[1]).isdigit():
+        return None
+    if not 1 <= int(parts[1]) <= 12:
+        return None
+    return int(parts[0]) * 100 + int(parts[1])
+
+
+def _year_month_default(context):
+    # Insert default for rows whose date comes from the column default (set just before it)
+    day = context.get_current_parameters().get("date")
+    return year_month(day) if day is not None else None
+
 class Group(Base):
     __tablename__ = "groups"
 
@@ -53,7 +74,8 @@ class DailySale(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     group_id = Column(Integer, ForeignKey("groups.id"))
-    date = Column(Date, default=datetime.utcnow().date)
+    date = Column(Date, default=datetime.utcnow().date, index=True)
+    year_month = Column(Integer, default=_year_month_default, index=True) # from date, e.g. 202610 (kept in sync on flush)
     
     total_amount = Column(Float, default=0.0)
     cash_received = Column(Float, default=0.0)
@@ -68,6 +90,12 @@ class DailySale(Base):
     sale_items = relationship("SaleItem", back_populates="daily_sale")
     remarks = relationship("SaleRemark", back_populates="daily_sale")
 
+    __table_args__ = (
+        # One sale record per group per day (saves upsert on it)
+        Index("uq_daily_sales_group_date", "group_id", "date", unique=True),
+        Index("ix_daily_sales_group_year_month", "group_id", "year_month"),
+    )
+
 class SaleItem(Base):
     __tablename__ = "sale_items"
 
@@ -89,11 +117,16 @@ class SaleItem(Base):
     daily_sale = relationship("DailySale", back_populates="sale_items")
     product = relationship("Product")
 
+    __table_args__ = (
+        # Covers the per-sale lookups and lets profit breakdowns sum quantities from the index alone
+        Index("ix_sale_items_sale_product_qty", "daily_sale_id", "product_id", "sold_type_qty", "sold_piece_qty"),
+    )
+
 class SaleRemark(Base):
     __tablename__ = "sale_remarks"
     
     id = Column(Integer, primary_key=True, index=True)
-    daily_sale_id = Column(Integer, ForeignKey("daily_sales.id"))
+    daily_sale_id = Column(Integer, ForeignKey("daily_sales.id"), index=True)
     comment = Column(String)
     amount = Column(Float, default=0.0)
     paid_amount = Column(Float, default=0.0)
@@ -101,11 +134,18 @@ class SaleRemark(Base):
     
     daily_sale = relationship("DailySale", back_populates="remarks")
 
+    __table_args__ = (
+        # Partial index: only the remarks still owed, so the dues screen never walks paid history
+        Index("ix_sale_remarks_unpaid", "daily_sale_id",
+              sqlite_where=is_fully_paid == 0, postgresql_where=is_fully_paid == 0),
+    )
+
 class Expense(Base):
     __tablename__ = "expenses"
     
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, default=datetime.utcnow().date)
+    year_month = Column(Integer, default=_year_month_default, index=True) # from date, e.g. 202610 (kept in sync on flush)
     description = Column(String)
     amount = Column(Float, default=0.0)
 
@@ -122,13 +162,13 @@ class MonthlyTarget(Base):
     id = Column(Integer, primary_key=True, index=True)
     group_id = Column(Integer, ForeignKey("groups.id"))
     month = Column(String) # Format: "YYYY-MM"
+    year_month = Column(Integer, index=True) # from month, e.g. 202610 (kept in sync on flush)
     target_amount = Column(Float, default=0.0)
     
-    # Ensure one target per group per month
+    # Ensure one target per group per month (a unique index, so it can be added to existing databases)
     __table_args__ = (
-        # UniqueConstraint('group_id', 'month', name='unique_group_month_target'),
-    ) 
-    # SQLite might need manual handling or naming convention for constraints, but straightforward definition works usually.
+        Index("uq_monthly_targets_group_year_month", "group_id", "year_month", unique=True),
+    )
 
 class ProductTaken(Base):
     __tablename__ = "products_taken"
@@ -152,6 +192,12 @@ class ProductTaken(Base):
     group = relationship("Group")
     product = relationship("Product")
 
+    __table_args__ = (
+        # Partial index: only the items still owed, per group
+        Index("ix_products_taken_group_unpaid", "group_id",
+              sqlite_where=is_fully_paid == 0, postgresql_where=is_fully_paid == 0),
+    )
+
 class GroupPayment(Base):
     __tablename__ = "group_payments"
     
@@ -162,3 +208,96 @@ class GroupPayment(Base):
     date = Column(Date, default=datetime.utcnow().date)
     
     group = relationship("Group")
+
+class GroupBalance(Base):
+    __tablename__ = "group_balances"
+
+    # One running ledger row per group so the current due is a single read
+    # instead of re-summing every sale, remark and payment ever recorded.
+    group_id = Column(Integer, ForeignKey("groups.id"), primary_key=True)
+    commission_total = Column(Float, default=0.0)
+    commission_paid = Column(Float, default=0.0)
+    remark_total = Column(Float, default=0.0)
+    remark_paid = Column(Float, default=0.0)
+    # Tracked alongside, but not part of the header total due
+    product_taken_total = Column(Float, default=0.0)
+    product_taken_paid = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    group = relationship("Group")
+
+class ProductSaleRollup(Base):
+    __tablename__ = "product_sale_rollups"
+
+    # Sold pieces/revenue per product per day, added when a sale is locked.
+    # Day grain so the leaderboard can answer 7d/30d windows as well as month/year.
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"))
+    group_id = Column(Integer, ForeignKey("groups.id"), index=True)
+    date = Column(Date, index=True)
+    sold_pieces = Column(Integer, default=0)
+    revenue = Column(Float, default=0.0)
+
+    __table_args__ = (
+        Index("ix_product_sale_rollups_product_date", "product_id", "date", unique=True),
+    )
+
+class ResourceVersion(Base):
+    __tablename__ = "resource_versions"
+
+    # ETag version counters (see etags.py), shared by every worker process
+    resource = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+# Jobs in these states count towards MAX_PENDING_JOBS and are shared by identical submissions
+PENDING_JOB_STATUSES = ("queued", "running")
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    # Background recomputations/exports (see jobs.py); params and result are JSON text
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    params = Column(Text, default="{}")
+    status = Column(String, default="queued", index=True) # queued, running, succeeded, failed
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    owner = Column(String, nullable=True) # host:pid of the worker running it
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # At most one pending job per kind + params: identical submissions upsert onto it
+        Index("uq_jobs_pending_kind_params", "kind", "params", unique=True,
+              sqlite_where=status.in_(PENDING_JOB_STATUSES), postgresql_where=status.in_(PENDING_JOB_STATUSES)),
+    )
+
+class User(Base):
+    __tablename__ = "users"
+
+    # Login accounts (see users.py); passwords are bcrypt hashes
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True, index=True, nullable=False)
+    password_hash = Column(String, nullable=False)
+    role = Column(String, default="sr", nullable=False) # admin, sr
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# year_month is derived, so it's filled in on every ORM insert/update. Core bulk inserts
+# (benchmarks/generate_dataset.py) set it themselves; db_init backfills older rows.
+
+@event.listens_for(DailySale, "before_insert")
+@event.listens_for(DailySale, "before_update")
+@event.listens_for(Expense, "before_insert")
+@event.listens_for(Expense, "before_update")
+def _set_year_month_from_date(mapper, connection, target):
+    # A missing date is left to the column default (and year_month to _year_month_default)
+    if target.date is not None:
+        target.year_month = year_month(target.date)
+
+
+@event.listens_for(MonthlyTarget, "before_insert")
+@event.listens_for(MonthlyTarget, "before_update")
+def _set_year_month_from_month(mapper, connection, target):
+    target.year_month = parse_year_month(target.month)
@@ -0,0 +1,346 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from sqlalchemy import select, func
+import models, snapshots
+
+# Worker processes for multi-month profit scans (1 disables the pool)
+PROFIT_WORKERS = int(os.environ.get("PROFIT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Ranges shorter than this many months are computed inline; the pool only pays off on
+# multi-year scans (lifetime profit, wide breakdown ranges), not on a year or less
+PARALLEL_MIN_MONTHS = int(os.environ.get("PARALLEL_MIN_MONTHS", "24"))
+
+# Buckets accepted by `series`; weeks start on Monday
+BUCKETS = ("day", "week", "month")
+
+# Profit engine shared by the profit reports and the dashboard.
+# Revenue and COGS are priced from the current stock table, same as the per-item loops did:
+#   revenue = sold_type_qty * sell_price_per_type + sold_piece_qty * sell_price_per_piece
+#   cogs    = (sold_type_qty * pieces_per_quantity + sold_piece_qty) * buy_price_avg
+# The date range is split into month partitions (further split by group when there are fewer
+# months than workers). Each partition is one aggregate query; long ranges run the partitions
+# in a process pool over read-only connections and the partial sums are merged here.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _next_month(month_start: date) -> date:
+    return date(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+
+
+def _month_starts(start: date, end: date) -> list:
+    """First day of every month overlapping [start, end]."""
+    months = []
+    current = start.replace(day=1)
+    while current <= end:
+        months.append(current)
+        current = _next_month(current)
+    return months
+
+
+def _revenue_cogs_columns() -> tuple:
+    item, product = models.SaleItem, models.Product
+    revenue = func.coalesce(func.sum(
+        item.sold_type_qty * product.sell_price_per_type + item.sold_piece_qty * product.sell_price_per_piece
+    ), 0.0)
+    cogs = func.coalesce(func.sum(
+        (item.sold_type_qty * product.pieces_per_quantity + item.sold_piece_qty) * product.buy_price_avg
+    ), 0.0)
+    return revenue, cogs
+
+
+def _sales_join(statement):
+    """daily_sales -> sale_items -> products, for the revenue/COGS columns."""
+    item, product, sale = models.SaleItem, models.Product, models.DailySale
+    return statement.select_from(sale)\
+        .join(item, item.daily_sale_id == sale.id)\
+        .join(product, product.id == item.product_id)
+
+
+def _statement(start: date, end: date, group_id: int = None):
+    """One partition: revenue and COGS of sales dated [start, end)."""
+    sale = models.DailySale
+    statement = _sales_join(select(*_revenue_cogs_columns()))\
+        .where(sale.date >= start, sale.date < end)
+    if group_id is not None:
+        statement = statement.where(sale.group_id == group_id)
+    return statement
+
+
+def _partition_sums(conn, partition: tuple) -> tuple:
+    month_start, group_id = partition
+    revenue, cogs = conn.execute(_statement(month_start, _next_month(month_start), group_id)).one()
+    return month_start, revenue, cogs
+
+
+def _worker(partitions: list) -> list:
+    # Runs in a pool process with its own read-only connection pool
+    import database
+    with database.read_engine.connect() as conn:
+        return [_partition_sums(conn, p) for p in partitions]
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process has live threads and connection pools
+            _pool = ProcessPoolExecutor(max_workers=PROFIT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def monthly_sums(db, start: date, end: date, group_id: int = None, parallel: bool = None) -> dict:
+    """
+    {month_start: (revenue, cogs)} for every whole month overlapping [start, end].
+    `parallel` forces the process pool on/off; by default it is used for ranges of
+    PARALLEL_MIN_MONTHS or more.
+    """
+    months = _month_starts(start, end)
+    if parallel is None:
+        parallel = PROFIT_WORKERS > 1 and len(months) >= PARALLEL_MIN_MONTHS
+
+    if group_id is not None:
+        partitions = [(m, group_id) for m in months]
+    elif parallel and len(months) < PROFIT_WORKERS:
+        group_ids = [g for (g,) in db.query(models.DailySale.group_id).filter(
+            models.DailySale.date >= months[0], models.DailySale.date < _next_month(months[-1]),
+            models.DailySale.group_id.isnot(None)
+        ).distinct().all()]
+        partitions = [(m, g) for m in months for g in group_ids]
+    else:
+        partitions = [(m, None) for m in months]
+
+    if parallel and len(partitions) > 1:
+        chunks = [partitions[i::PROFIT_WORKERS] for i in range(PROFIT_WORKERS)]
+        results = [r for chunk in _get_pool().map(_worker, [c for c in chunks if c]) for r in chunk]
+    else:
+        conn = db.connection()
+        results = [_partition_sums(conn, p) for p in partitions]
+
+    sums = {m: (0.0, 0.0) for m in months}
+    for month_start, revenue, cogs in results:
+        total_revenue, total_cogs = sums[month_start]
+        sums[month_start] = (total_revenue + revenue, total_cogs + cogs)
+    return sums
+
+
+def totals(db, start: date, end: date, group_id: int = None, parallel: bool = None) -> tuple:
+    """(revenue, cogs) summed over every whole month overlapping [start, end]."""
+    sums = monthly_sums(db, start, end, group_id, parallel)
+    return sum(r for r, _ in sums.values()), sum(c for _, c in sums.values())
+
+
+def _quantities_statement(start: date, end: date, group_id: int = None):
+    """Sold type/piece quantities per (sale group, product) over [start, end]; prices are applied afterwards."""
+    item, sale = models.SaleItem, models.DailySale
+    statement = select(
+        sale.group_id,
+        item.product_id,
+        func.coalesce(func.sum(item.sold_type_qty), 0),
+        func.coalesce(func.sum(item.sold_piece_qty), 0),
+    ).select_from(sale)\
+        .join(item, item.daily_sale_id == sale.id)\
+        .where(sale.date >= start, sale.date <= end)\
+        .group_by(sale.group_id, item.product_id)
+    if group_id is not None:
+        statement = statement.where(sale.group_id == group_id)
+    return statement
+
+
+def _quantity_rows(conn, partition: tuple) -> list:
+    return [tuple(row) for row in conn.execute(_quantities_statement(*partition)).all()]
+
+
+def _quantities_worker(partitions: list) -> list:
+    import database
+    with database.read_engine.connect() as conn:
+        return [row for p in partitions for row in _quantity_rows(conn, p)]
+
+
+def _uncovered_ranges(start: date, end: date, covered: list) -> list:
+    """[start, end] minus the covered whole months, as contiguous (from, to) ranges."""
+    ranges, current = [], start
+    for month_start in covered:
+        if current < month_start:
+            ranges.append((current, month_start - timedelta(days=1)))
+        current = _next_month(month_start)
+    if current <= end:
+        ranges.append((current, end))
+    return ranges
+
+
+def sold_quantities(db, start: date, end: date, group_id: int = None, parallel: bool = None) -> dict:
+    """
+    {(sale group_id, product_id): [sold_type_qty, sold_piece_qty]} over [start, end].
+    Months with an up-to-date analytics snapshot are read from it; the rest from the database.
+    """
+    covered = snapshots.covered_months(db, start, end)
+    rows = snapshots.sold_quantities(covered, group_id)
+
+    for range_start, range_end in _uncovered_ranges(start, end, covered):
+        months = _month_starts(range_start, range_end)
+        use_pool = parallel
+        if use_pool is None:
+            use_pool = PROFIT_WORKERS > 1 and len(months) >= PARALLEL_MIN_MONTHS
+
+        if use_pool and len(months) > 1:
+            partitions = [
+                (max(m, range_start), min(_next_month(m) - timedelta(days=1), range_end), group_id)
+                for m in months
+            ]
+            chunks = [c for c in (partitions[i::PROFIT_WORKERS] for i in range(PROFIT_WORKERS)) if c]
+            rows += [row for chunk in _get_pool().map(_quantities_worker, chunks) for row in chunk]
+        else:
+            rows += _quantity_rows(db.connection(), (range_start, range_end, group_id))
+
+    quantities = {}
+    for sale_group_id, product_id, type_qty, piece_qty in rows:
+        entry = quantities.setdefault((sale_group_id, product_id), [0, 0])
+        entry[0] += type_qty
+        entry[1] += piece_qty
+    return quantities
+
+
+def _margin(revenue: float, gross_profit: float) -> float:
+    return round(gross_profit / revenue * 100, 2) if revenue else 0.0
+
+
+def breakdown(db, start: date, end: date, by: str, group_id: int = None) -> list:
+    """
+    Revenue, COGS, gross profit and margin % per sale group (by="group") or product
+    (by="product") over [start, end]: one grouped aggregate of sold quantities, priced
+    per product afterwards (a few hundred rows) instead of joining products into the scan.
+    """
+    quantities = sold_quantities(db, start, end, group_id)
+    product_ids = {product_id for _, product_id in quantities}
+    products = {
+        p.id: p for p in db.query(
+            models.Product.id, models.Product.name, models.Product.group_id,
+            models.Product.sell_price_per_type, models.Product.sell_price_per_piece,
+            models.Product.pieces_per_quantity, models.Product.buy_price_avg
+        ).filter(models.Product.id.in_(product_ids)).all()
+    } if product_ids else {}
+    group_names = dict(db.query(models.Group.id, models.Group.name).all())
+
+    rows = {}
+    for (sale_group_id, product_id), (type_qty, piece_qty) in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            continue # Product deleted since the sale
+        revenue = type_qty * (product.sell_price_per_type or 0) + piece_qty * (product.sell_price_per_piece or 0)
+        cogs = (type_qty * (product.pieces_per_quantity or 0) + piece_qty) * (product.buy_price_avg or 0)
+
+        if by == "group":
+            key = sale_group_id
+            row = rows.setdefault(key, {
+                "group_id": sale_group_id,
+                "group": group_names.get(sale_group_id),
+                "revenue": 0.0,
+                "cogs": 0.0,
+            })
+        else:
+            key = product_id
+            row = rows.setdefault(key, {
+                "product_id": product_id,
+                "product": product.name,
+                "group_id": product.group_id,
+                "group": group_names.get(product.group_id),
+                "sold_type_qty": 0,
+                "sold_piece_qty": 0,
+                "revenue": 0.0,
+                "cogs": 0.0,
+            })
+            row["sold_type_qty"] += type_qty
+            row["sold_piece_qty"] += piece_qty
+        row["revenue"] += revenue
+        row["cogs"] += cogs
+
+    result = list(rows.values())
+    for row in result:
+        row["gross_profit"] = row["revenue"] - row["cogs"]
+        row["margin"] = _margin(row["revenue"], row["gross_profit"])
+    return result
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return _next_month(start)
+    return start + timedelta(days=1)
+
+
+def bucket_count(start: date, end: date, bucket: str) -> int:
+    first, last = _bucket_start(start, bucket), _bucket_start(end, bucket)
+    if bucket == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days // (7 if bucket == "week" else 1) + 1
+
+
+def series(db, start: date, end: date, bucket: str = "day", group_id: int = None) -> list:
+    """
+    Revenue, COGS, expenses and profit per day/week/month bucket over [start, end], every
+    bucket present (zero-filled). One grouped aggregate per table, by day; days are then
+    folded into buckets here, which keeps week/month boundaries independent of the SQL dialect.
+    Expenses are company-wide, so they are left out (0) when a group_id is given.
+    """
+    sale, expense = models.DailySale, models.Expense
+    statement = _sales_join(select(sale.date, *_revenue_cogs_columns()))\
+        .where(sale.date >= start, sale.date <= end)\
+        .group_by(sale.date)
+    if group_id is not None:
+        statement = statement.where(sale.group_id == group_id)
+    sales_by_day = db.execute(statement).all()
+
+    expenses_by_day = []
+    if group_id is None:
+        expenses_by_day = db.execute(
+            select(expense.date, func.sum(expense.amount))
+            .where(expense.date >= start, expense.date <= end)
+            .group_by(expense.date)
+        ).all()
+
+    buckets = {}
+    current = _bucket_start(start, bucket)
+    while current <= end:
+        following = _next_bucket(current, bucket)
+        buckets[current] = {
+            "start": max(current, start),
+            "end": min(following - timedelta(days=1), end),
+            "revenue": 0.0,
+            "cogs": 0.0,
+            "expense": 0.0,
+        }
+        current = following
+    for day, revenue, cogs in sales_by_day:
+        entry = buckets[_bucket_start(day, bucket)]
+        entry["revenue"] += revenue
+        entry["cogs"] += cogs
+    for day, amount in expenses_by_day:
+        buckets[_bucket_start(day, bucket)]["expense"] += amount or 0.0
+
+    result = list(buckets.values())
+    for entry in result:
+        entry["gross_profit"] = entry["revenue"] - entry["cogs"]
+        entry["net_profit"] = entry["gross_profit"] - entry["expense"]
+    return result
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,73 @@
+import logging
+import os
+import time
+from collections import Counter
+from sqlalchemy import event
+import metrics
+
+ENABLED = os.environ.get("QUERY_DEBUG", "0") == "1"
+RAISE = os.environ.get("QUERY_DEBUG_RAISE", "0") == "1"
+REPEAT_THRESHOLD = int(os.environ.get("QUERY_DEBUG_REPEAT_THRESHOLD", "10"))
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+
+# Development/staging query diagnostics, enabled with QUERY_DEBUG=1:
+#   * N+1 detector - flags the same SQL statement run more than QUERY_DEBUG_REPEAT_THRESHOLD
+#     times within one request (the signature of a lazy load inside a loop).
+#   * Slow-query log - logs statements slower than SLOW_QUERY_MS together with their plan.
+# With QUERY_DEBUG_RAISE=1 a detected N+1 raises QueryDebugError instead of logging,
+# so any test driving the app through TestClient fails on it.
+
+logger = logging.getLogger("query_debug")
+
+
+class QueryDebugError(RuntimeError):
+    pass
+
+
+def _explain(conn, statement, parameters):
+    # Raw DBAPI cursor so the EXPLAIN itself doesn't go through these hooks again
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join("  " + " | ".join(str(col) for col in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f"  (plan unavailable: {e})"
+    finally:
+        cursor.close()
+
+
+def check_repeats(stats: dict, statement: str):
+    counts = stats.setdefault("statement_counts", Counter())
+    counts[statement] += 1
+    if counts[statement] == REPEAT_THRESHOLD + 1:
+        message = (f"Possible N+1: statement executed more than {REPEAT_THRESHOLD} times "
+                   f"in one request:\n  {statement}")
+        if RAISE:
+            raise QueryDebugError(message)
+        logger.warning(message)
+
+
+def install(engine):
+    """Attach the detector and slow-query log to `engine` (no-op unless QUERY_DEBUG=1)."""
+    if not ENABLED:
+        return
+
+    # Timed on the execution context, like metrics.py (nothing is left behind when a statement raises)
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_debug_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - context._query_debug_start) * 1000
+
+        if elapsed_ms > SLOW_QUERY_MS:
+            plan = ""
+            if not executemany and statement.lstrip().upper().startswith("SELECT"):
+                plan = "\n" + _explain(conn, statement, parameters)
+            logger.warning("Slow query (%.1f ms): %s\n  params: %r%s", elapsed_ms, statement, parameters, plan)
+
+        stats = metrics.current_request_stats()
+        if stats is not None:
+            check_repeats(stats, statement)
@@ -0,0 +1,100 @@
+import sys
+from collections import defaultdict
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import database
+import models
+
+
+def _sold_pieces(item, pieces_per_quantity):
+    return (item.sold_type_qty or 0) * (pieces_per_quantity or 1) + (item.sold_piece_qty or 0)
+
+
+def record_locked_sale(db: Session, sale):
+    """
+    Add a sale's items to the product rollup. Called from lock_daily_sale so only
+    finalized sales are counted; the caller commits.
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for item in sale.sale_items:
+        product = item.product
+        if not product:
+            continue
+        totals[(product.id, product.group_id)][0] += _sold_pieces(item, product.pieces_per_quantity)
+        totals[(product.id, product.group_id)][1] += item.price or 0.0
+
+    if not totals:
+        return
+    # One upsert for all of the sale's products (executemany), on the (product_id, date) unique index
+    table = models.ProductSaleRollup.__table__
+    upsert = database.insert(table)
+    db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=["product_id", "date"],
+            set_={
+                "sold_pieces": table.c.sold_pieces + upsert.excluded.sold_pieces,
+                "revenue": table.c.revenue + upsert.excluded.revenue,
+            }
+        ),
+        [
+            {"product_id": product_id, "group_id": group_id, "date": sale.date,
+             "sold_pieces": pieces, "revenue": revenue}
+            for (product_id, group_id), (pieces, revenue) in totals.items()
+        ]
+    )
+
+
+def rebuild(db: Session):
+    """Regenerate the whole rollup from locked sale items and commit."""
+    db.query(models.ProductSaleRollup).delete(synchronize_session=False)
+
+    rows = db.query(
+        models.SaleItem.product_id,
+        models.Product.group_id,
+        models.DailySale.date,
+        func.sum(
+            models.SaleItem.sold_type_qty * func.coalesce(models.Product.pieces_per_quantity, 1) +
+            models.SaleItem.sold_piece_qty
+        ),
+        func.sum(models.SaleItem.price)
+    ).join(models.DailySale, models.SaleItem.daily_sale_id == models.DailySale.id)\
+     .join(models.Product, models.SaleItem.product_id == models.Product.id)\
+     .filter(models.DailySale.is_locked == 1)\
+     .group_by(models.SaleItem.product_id, models.Product.group_id, models.DailySale.date).all()
+
+    db.bulk_save_objects([
+        models.ProductSaleRollup(
+            product_id=product_id,
+            group_id=group_id,
+            date=day,
+            sold_pieces=int(pieces or 0),
+            revenue=revenue or 0.0
+        )
+        for product_id, group_id, day, pieces, revenue in rows
+    ])
+    db.commit()
+
+
+def ensure_initialized(db: Session):
+    """Backfill the rollup once for databases that already had locked sales."""
+    if db.query(models.ProductSaleRollup).first() is None and \
+            db.query(models.DailySale).filter(models.DailySale.is_locked == 1).first() is not None:
+        rebuild(db)
+
+
+if __name__ == "__main__":
+    # Usage: python rollups.py rebuild
+    from database import SessionLocal, engine, Base
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "rebuild"
+    if command != "rebuild":
+        print(f"Unknown command: {command}")
+        sys.exit(2)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        print("Product sale rollups rebuilt.")
+    finally:
+        db.close()
@@ -1,9 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+import users
 
 router = APIRouter(
     prefix="/auth",
@@ -15,19 +24,12 @@ SECRET_KEY = "goodluck_enterprise_secret_key_change_in_production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 24 hours
 
-# Hardcoded Credentials
-USERS_DB = {
-    "admin": {
-        "username": "admin",
-        "password": "admin1234", 
-        "role": "admin"
-    },
-    "guest": {
-        "username": "guest",
-        "password": "guest1234",
-        "role": "sr"
-    }
-}
+# "builtin" signs/verifies HS256 with hmac from the standard library; "jose" uses python-jose.
+# Both produce and accept the same tokens.
+JWT_BACKEND = os.environ.get("JWT_BACKEND", "builtin")
+
+# Verified tokens kept per worker (LRU); an entry is dropped once the token expires
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "1024"))
 
 class Token(BaseModel):
     access_token: str
@@ -42,21 +44,115 @@ class TokenData(BaseModel):
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+class InvalidToken(Exception):
+    pass
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+def _sign(signing_input: bytes) -> bytes:
+    return hmac.new(SECRET_KEY.encode(), signing_input, hashlib.sha256).digest()
+
+def _encode_builtin(claims: dict) -> str:
+    header = _b64encode(json.dumps({"alg": ALGORITHM, "typ": "JWT"}, separators=(",", ":")).encode())
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = f"{header}.{payload}".encode()
+    return f"{header}.{payload}.{_b64encode(_sign(signing_input))}"
+
+def _decode_builtin(token: str) -> dict:
+    try:
+        header_segment, payload_segment, signature_segment = token.split(".")
+        header = json.loads(_b64decode(header_segment))
+        signature = _b64decode(signature_segment)
+    except ValueError:
+        raise InvalidToken("Malformed token")
+    if not isinstance(header, dict) or header.get("alg") != ALGORITHM:
+        raise InvalidToken("Unexpected algorithm")
+    if not hmac.compare_digest(signature, _sign(f"{header_segment}.{payload_segment}".encode())):
+        raise InvalidToken("Bad signature")
+    try:
+        payload = json.loads(_b64decode(payload_segment))
+    except ValueError:
+        raise InvalidToken("Malformed payload")
+    if not isinstance(payload, dict):
+        raise InvalidToken("Malformed payload")
+    exp = payload.get("exp")
+    if exp is not None and (not isinstance(exp, (int, float)) or exp <= time.time()):
+        raise InvalidToken("Token expired")
+    return payload
+
+def encode_token(claims: dict) -> str:
+    if JWT_BACKEND == "jose":
+        # Imported on first use: python-jose and its crypto backends are a large share of cold start
+        from jose import jwt
+        return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+    return _encode_builtin(claims)
+
+def decode_token(token: str) -> dict:
+    """Verified claims of `token`; raises InvalidToken."""
+    if JWT_BACKEND == "jose":
+        from jose import JWTError, jwt
+        try:
+            return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError as e:
+            raise InvalidToken(str(e))
+    return _decode_builtin(token)
+
+# sha256(token) -> (TokenData, exp timestamp)
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+_token_cache_stats = {"hits": 0, "misses": 0}
+
+def _verify_cached(token: str):
+    """TokenData for a valid token, verifying the signature only on a cache miss."""
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                _token_cache.move_to_end(key)
+                _token_cache_stats["hits"] += 1
+                return entry[0]
+            del _token_cache[key]
+        _token_cache_stats["misses"] += 1
+
+    payload = decode_token(token)
+    username = payload.get("sub")
+    if username is None:
+        raise InvalidToken("No subject")
+    token_data = TokenData(username=username, role=payload.get("role"))
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and TOKEN_CACHE_SIZE > 0:
+        with _token_cache_lock:
+            _token_cache[key] = (token_data, exp)
+            while len(_token_cache) > TOKEN_CACHE_SIZE:
+                _token_cache.popitem(last=False)
+    return token_data
+
+def token_cache_stats() -> dict:
+    """Hits/misses of the verified-token cache (this worker process only)."""
+    with _token_cache_lock:
+        return {**_token_cache_stats, "size": len(_token_cache)}
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode.update({"exp": calendar.timegm(expire.utctimetuple())})
+    return encode_token(to_encode)
 
+# Plain def: bcrypt verification is deliberately slow and would block the event loop
 @router.post("/login", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = USERS_DB.get(form_data.username)
+def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+    user = users.store.authenticate(form_data.username, form_data.password)
     
-    if not user or user['password'] != form_data.password:
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -83,11 +179,6 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        role: str = payload.get("role")
-        if username is None:
-            raise credentials_exception
-        return TokenData(username=username, role=role)
-    except JWTError:
+        return _verify_cached(token)
+    except InvalidToken:
         raise credentials_exception
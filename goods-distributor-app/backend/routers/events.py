@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import events
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"],
+)
+
+@router.get("")
+async def stream_events(request: Request, types: Optional[str] = None):
+    """
+    Server-Sent Events stream of live changes (sale_locked, payment, expense_added, stock_changed),
+    so dashboards can update instead of polling. `types` optionally filters, e.g. ?types=payment,sale_locked.
+    A `resync` event means the client fell behind and should refetch.
+    """
+    subscriber = events.broker.subscribe(types.split(",") if types else None)
+    return StreamingResponse(
+        events.stream(request, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List
-import models, schemas, database
+import models, schemas, database, balances, etags
 
 router = APIRouter(
     prefix="/groups",
@@ -16,13 +16,17 @@ def create_group(group: schemas.GroupCreate, db: Session = Depends(database.get_
     
     new_group = models.Group(name=group.name)
     db.add(new_group)
+    db.flush()
+    db.add(models.GroupBalance(group_id=new_group.id))
+    etags.bump("groups", "dues", db=db)
     db.commit()
     db.refresh(new_group)
     return new_group
 
-@router.get("/", response_model=List[schemas.GroupResponse])
+@router.get("/", response_model=List[schemas.GroupResponse], dependencies=[Depends(etags.conditional("groups", "products"))])
 def read_groups(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    groups = db.query(models.Group).offset(skip).limit(limit).all()
+    # Products of all listed groups in one extra query, not one lazy load per group
+    groups = db.query(models.Group).options(selectinload(models.Group.products)).offset(skip).limit(limit).all()
     
     # Calculate total stock value for each group
     for group in groups:
@@ -59,7 +63,9 @@ def delete_group(group_id: int, db: Session = Depends(database.get_db)):
     # This is a safeguard for SQLite
     db.query(models.Product).filter(models.Product.group_id == group_id).delete()
     db.query(models.DailySale).filter(models.DailySale.group_id == group_id).delete()
+    db.query(models.GroupBalance).filter(models.GroupBalance.group_id == group_id).delete()
     
     db.delete(group)
+    etags.bump("groups", "products", "sales", "dues", db=db)
     db.commit()
     return None
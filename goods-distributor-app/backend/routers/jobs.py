@@ -0,0 +1,69 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import models, schemas, database, jobs
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+)
+
+def _to_response(job: models.Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "params": json.loads(job.params or "{}"),
+        "status": job.status,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
+
+def _get_job(db: Session, job_id: int) -> models.Job:
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def submit_job(job: schemas.JobCreate, db: Session = Depends(database.get_db)):
+    """
+    Queue a heavy recomputation/export: lifetime_profit, rebuild_balances, rebuild_rollups,
+    export_year (params: year, optional group_id). Poll GET /jobs/{id}, then fetch /jobs/{id}/result.
+    """
+    try:
+        created = jobs.submit(db, job.kind, job.params)
+    except jobs.JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    except jobs.JobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _to_response(created)
+
+@router.get("", response_model=List[schemas.JobResponse])
+def list_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|succeeded|failed)$"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(database.get_db)
+):
+    query = db.query(models.Job)
+    if status:
+        query = query.filter(models.Job.status == status)
+    return [_to_response(j) for j in query.order_by(models.Job.id.desc()).limit(limit).all()]
+
+@router.get("/{job_id}", response_model=schemas.JobResponse)
+def get_job(job_id: int, db: Session = Depends(database.get_db)):
+    return _to_response(_get_job(db, job_id))
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: int, db: Session = Depends(database.get_db)):
+    """The finished job's JSON result; 409 while it is queued/running or if it failed."""
+    job = _get_job(db, job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=409, detail=f"Job failed: {job.error}")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    # Stored already serialized, so pass it through instead of parsing and re-encoding
+    return Response(content=job.result, media_type="application/json")
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
-import models, schemas, database
+import models, schemas, database, etags, events
 from utils import QuantityHandler
 
 router = APIRouter(
@@ -9,6 +9,18 @@ router = APIRouter(
     tags=["products"],
 )
 
+def _publish_stock(product):
+    if not events.has_subscribers():
+        return
+    events.publish("stock_changed", products=[{
+        "id": product.id,
+        "group_id": product.group_id,
+        "quantity_value": product.quantity_value,
+        "pieces_quantity": product.pieces_quantity,
+        "sell_price_per_type": product.sell_price_per_type,
+        "sell_price_per_piece": product.sell_price_per_piece
+    }])
+
 @router.post("/", response_model=schemas.ProductResponse, status_code=status.HTTP_201_CREATED)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(database.get_db)):
     # Normalize quantity
@@ -43,11 +55,13 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(databas
         description=f"{new_product.quantity_value}{new_product.quantity_type[0].upper() if new_product.quantity_type else ''} {new_product.pieces_quantity}pc {new_product.name} ({new_product.weight_value}{new_product.weight_type}) were added"
     )
     db.add(log)
+    etags.bump("products", db=db)
     db.commit()
+    _publish_stock(new_product)
     
     return new_product
 
-@router.get("/group/{group_id}", response_model=List[schemas.ProductResponse])
+@router.get("/group/{group_id}", response_model=List[schemas.ProductResponse], dependencies=[Depends(etags.conditional("products"))])
 def read_products_by_group(group_id: int, db: Session = Depends(database.get_db)):
     products = db.query(models.Product).filter(models.Product.group_id == group_id).all()
     return products
@@ -120,7 +134,9 @@ def add_product_stock(product_id: int, transaction: schemas.StockTransaction, db
         description=f"{new_qty_val}{product.quantity_type[0].upper() if product.quantity_type else ''} {new_qty_pcs}pc {product.name} ({product.weight_value}{product.weight_type}) were added"
     )
     db.add(log)
+    etags.bump("products", db=db)
     db.commit()
+    _publish_stock(product)
     
     return product
 
@@ -205,10 +221,13 @@ def purchase_product_stock(product_id: int, transaction: schemas.StockTransactio
             product_id=product.id,
             product_name=product.name,
             group_name=product.group.name if product.group else "Unknown",
+            action="Purchased/Returned",
             description=f"{sub_qty_val}{product.quantity_type[0].upper() if product.quantity_type else ''} {sub_qty_pcs}pc {product.name} ({product.weight_value}{product.weight_type}) were purchased"
         )
         db.add(log)
+        etags.bump("products", db=db)
         db.commit()
+        _publish_stock(product)
     
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -230,9 +249,12 @@ def delete_product(product_id: int, db: Session = Depends(database.get_db)):
         description=f"{product.quantity_value}{product.quantity_type[0].upper() if product.quantity_type else ''} {product.pieces_quantity}pc {product.name} ({product.weight_value}{product.weight_type}) were Deleted"
     )
     db.add(log) # Add log first
+    product_id, group_id = product.id, product.group_id
     
     db.delete(product) # Then delete product
+    etags.bump("products", db=db)
     db.commit()
+    events.publish("stock_changed", products=[{"id": product_id, "group_id": group_id, "deleted": True}])
     return None
 
 @router.get("/group/{group_id}/history", response_model=List[schemas.ProductHistoryResponse])
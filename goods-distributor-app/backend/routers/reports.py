@@ -1,52 +1,64 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from typing import List, Optional
-from datetime import date
-import models, schemas, database
+from datetime import date, timedelta
+import heapq
+import models, schemas, database, sale_views, etags, events, profit
 
 router = APIRouter(
     prefix="/reports",
     tags=["reports"],
 )
-print("DEBUG: Loading reports router...")
 
-@router.get("/monthly/{group_id}", response_model=schemas.MonthlyReportResponse)
-def get_monthly_sales(group_id: int, month: int, year: int, db: Session = Depends(database.get_db)):
-    sales = db.query(models.DailySale).filter(
+@router.get("/monthly/{group_id}", response_model=schemas.MonthlyReportSummaryResponse, response_model_exclude_unset=True)
+def get_monthly_sales(
+    group_id: int,
+    month: int = Query(..., ge=1, le=12),
+    year: int = Query(...),
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: Session = Depends(database.get_read_db)
+):
+    # e.g. ?fields=date,total_amount for the list view, ?expand=sale_items,remarks for details.
+    # With neither, the full report (all fields, items and remarks) is returned as before.
+    field_list = sale_views.parse_fields(fields)
+    expand_list = sale_views.parse_expand(expand) if (fields or expand) else list(sale_views.EXPANDABLE)
+    
+    # Date range instead of extract() so the date index can be used
+    month_start = date(year, month, 1)
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    
+    columns = field_list if "total_amount" in field_list else field_list + ["total_amount"]
+    sales = sale_views.load_sales(db, [
         models.DailySale.group_id == group_id,
-        extract('month', models.DailySale.date) == month,
-        extract('year', models.DailySale.date) == year
-    ).all()
-    
-    total_sales = sum(s.total_amount for s in sales)
+        models.DailySale.date >= month_start,
+        models.DailySale.date < next_month
+    ], columns, expand_list)
+    
+    total_sales = sum(s["total_amount"] or 0.0 for s in sales)
+    if "total_amount" not in field_list:
+        for s in sales:
+            del s["total_amount"]
+            
     return {"sales": sales, "total_sales": total_sales}
 
 @router.get("/yearly/{group_id}")
-def get_yearly_sales(group_id: int, year: int, db: Session = Depends(database.get_db)):
-    try:
-        # distinct months
-        # SQLite specific: strftime('%m', date)
-        # SQLAlchemy extract('year', ...) compiles to strftime('%Y', ...) on sqlite usually
-        
-        monthly_sales = db.query(
-            func.strftime("%m", models.DailySale.date).label("month"),
-            func.sum(models.DailySale.total_amount).label("total")
-        ).filter(
-            models.DailySale.group_id == group_id,
-            extract('year', models.DailySale.date) == year
-        ).group_by(func.strftime("%m", models.DailySale.date)).all()
-        
-        # Convert to list of dicts
-        result = [
-            {"month": row.month, "total": row.total}
-            for row in monthly_sales
-        ]
-        
-        return result
-    except Exception as e:
-        print(f"Error in get_yearly_sales: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+def get_yearly_sales(group_id: int, year: int, db: Session = Depends(database.get_read_db)):
+    # Integer month keys: an indexed (group_id, year_month) range instead of strftime per row
+    monthly_sales = db.query(
+        models.DailySale.year_month,
+        func.sum(models.DailySale.total_amount).label("total")
+    ).filter(
+        models.DailySale.group_id == group_id,
+        models.DailySale.year_month.between(year * 100 + 1, year * 100 + 12)
+    ).group_by(models.DailySale.year_month).all()
+    
+    # Convert to list of dicts ("month" stays the zero-padded "01".."12" it always was)
+    return [
+        {"month": f"{row.year_month % 100:02d}", "total": row.total}
+        for row in monthly_sales
+    ]
 
 @router.post("/expense", response_model=schemas.ExpenseCreate)
 def add_expense(expense: schemas.ExpenseCreate, db: Session = Depends(database.get_db)):
@@ -56,146 +68,76 @@ def add_expense(expense: schemas.ExpenseCreate, db: Session = Depends(database.g
         date=expense.date
     )
     db.add(new_expense)
+    etags.bump("expenses", db=db)
     db.commit()
     db.refresh(new_expense)
+    events.publish("expense_added", id=new_expense.id, date=new_expense.date, amount=new_expense.amount)
     return new_expense
 
 @router.get("/profit/daily/{date}")
-def get_daily_profit(date: date, db: Session = Depends(database.get_db)):
+def get_daily_profit(date: date, db: Session = Depends(database.get_read_db)):
     # Calculate profit: (Total Sell Price - Total Buy Price) - Expense
+    # Revenue/COGS from the Stock Table prices, as one aggregate (see profit.py)
+    day = profit.series(db, date, date, "day")[0]
     
-    sales = db.query(models.DailySale).filter(models.DailySale.date == date).all()
-    
-    total_revenue = 0.0 # From Stock Table Sell Prices (Calculated)
-    total_cost_goods_sold = 0.0 # From Stock Table Buy Prices (Calculated)
-    
-    for sale in sales:
-        for item in sale.sale_items:
-            product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-            if not product:
-                continue
-            
-            # --- Sell Price Calculation (from Stock Table) ---
-            # Formula: (Sold Type Qty * Sell Price Per Type) + (Sold Piece Qty * Sell Price Per Piece)
-            sell_price_total = (
-                (item.sold_type_qty * product.sell_price_per_type) + 
-                (item.sold_piece_qty * product.sell_price_per_piece)
-            )
-            
-            # --- Buy Price Calculation (from Stock Table) ---
-            # Formula: (Sold Type Qty * Buy Price Per Type) + (Sold Piece Qty * Buy Price Per Piece)
-            # Derived Buy Prices:
-            # - Buy Price Per Piece = product.buy_price_avg
-            # - Buy Price Per Type = product.buy_price_avg * product.pieces_per_quantity
-            
-            buy_price_per_piece = product.buy_price_avg
-            buy_price_per_type = product.buy_price_avg * product.pieces_per_quantity
-            
-            buy_price_total = (
-                (item.sold_type_qty * buy_price_per_type) + 
-                (item.sold_piece_qty * buy_price_per_piece)
-            )
-            
-            total_revenue += sell_price_total
-            total_cost_goods_sold += buy_price_total
-
     # Expenses
     expenses = db.query(models.Expense).filter(models.Expense.date == date).all()
-    total_expense = sum(e.amount for e in expenses)
-    
-    gross_profit = total_revenue - total_cost_goods_sold
-    net_profit = gross_profit - total_expense
     
     return {
         "date": date,
-        "revenue": total_revenue, # Returns the Calculated Sell Price Revenue
-        "cogs": total_cost_goods_sold,
-        "gross_profit": gross_profit,
-        "expense": total_expense,
-        "net_profit": net_profit,
+        "revenue": day["revenue"], # Returns the Calculated Sell Price Revenue
+        "cogs": day["cogs"],
+        "gross_profit": day["gross_profit"],
+        "expense": day["expense"],
+        "net_profit": day["net_profit"],
         "expenses_list": [{"id": e.id, "description": e.description, "amount": e.amount} for e in expenses]
     }
 
-@router.get("/dashboard")
-def get_dashboard_metrics(db: Session = Depends(database.get_db)):
+@router.get("/dashboard", dependencies=[Depends(etags.conditional("sales", "products", "dues", "expenses"))])
+def get_dashboard_metrics(db: Session = Depends(database.get_read_db)):
     today = date.today()
     current_year = today.year
     current_month = today.month
     
-    # 1. Total Sell This Year
-    sales_year = db.query(models.DailySale).filter(
-        extract('year', models.DailySale.date) == current_year
-    ).all()
-    total_sell_year = sum(s.total_amount for s in sales_year)
-    
-    # 2. Total Sell This Month
-    sales_month = [s for s in sales_year if s.date.month == current_month]
-    total_sell_month = sum(s.total_amount for s in sales_month)
-    
-    # 3. Total Due (Commissions + Remarks - Payments)
-    # Commissions
-    total_commissions = db.query(func.sum(models.DailySale.commission)).scalar() or 0.0
-    paid_commissions = db.query(func.sum(models.GroupPayment.amount)).filter(
-        models.GroupPayment.payment_type == 'commission'
-    ).scalar() or 0.0
-    
-    # Remarks
-    total_remarks = db.query(func.sum(models.SaleRemark.amount)).scalar() or 0.0
-    paid_remarks = db.query(func.sum(models.GroupPayment.amount)).filter(
-        models.GroupPayment.payment_type == 'remark'
-    ).scalar() or 0.0
+    # 1./2. Total Sell This Year / This Month
+    year_start = date(current_year, 1, 1)
+    month_start = date(current_year, current_month, 1)
+    sell_by_month = dict(db.query(
+        models.DailySale.year_month,
+        func.sum(models.DailySale.total_amount)
+    ).filter(
+        models.DailySale.year_month.between(current_year * 100 + 1, current_year * 100 + 12)
+    ).group_by(models.DailySale.year_month).all())
+    total_sell_year = sum(v or 0.0 for v in sell_by_month.values())
+    total_sell_month = sell_by_month.get(models.year_month(today)) or 0.0
+    
+    # 3. Total Due (Commissions + Remarks - Payments), summed from the group_balances ledger
+    due_totals = db.query(
+        func.sum(models.GroupBalance.commission_total),
+        func.sum(models.GroupBalance.commission_paid),
+        func.sum(models.GroupBalance.remark_total),
+        func.sum(models.GroupBalance.remark_paid)
+    ).one()
+    total_commissions, paid_commissions, total_remarks, paid_remarks = (v or 0.0 for v in due_totals)
     
     total_due = (total_commissions - paid_commissions) + (total_remarks - paid_remarks)
     
     # 4. Profit Calculations (Year & Month)
-    # Helper to calculate profit for a list of sales and expenses
-    def calculate_profit(sales_list, start_date=None, end_date=None):
-        revenue = sum(s.total_amount for s in sales_list)
-        
-        # Expenses
-        expense_query = db.query(models.Expense)
-        if start_date and end_date:
-            expense_query = expense_query.filter(models.Expense.date >= start_date, models.Expense.date <= end_date)
-        elif start_date: # Year filter approximation
-             expense_query = expense_query.filter(extract('year', models.Expense.date) == start_date.year)
-             if end_date: # Month filter
-                 expense_query = expense_query.filter(extract('month', models.Expense.date) == start_date.month)
-
-        # Re-doing expense query properly based on passed sales scope is tricky without date ranges.
-        # Let's use the dates from sales to bound expenses? No, sales might not exist every day.
-        # Better: Filter expenses by Year/Month independently.
-        return 0 # Placeholder, logic below is better
-        
     # Yearly Expenses
     expenses_year = db.query(func.sum(models.Expense.amount)).filter(
-        extract('year', models.Expense.date) == current_year
+        models.Expense.year_month.between(current_year * 100 + 1, current_year * 100 + 12)
     ).scalar() or 0.0
     
     # Monthly Expenses
     expenses_month = db.query(func.sum(models.Expense.amount)).filter(
-        extract('year', models.Expense.date) == current_year,
-        extract('month', models.Expense.date) == current_month
+        models.Expense.year_month == models.year_month(today)
     ).scalar() or 0.0
     
-    # COGS Calculation (Year)
-    cogs_year = 0.0
-    for sale in sales_year:
-        for item in sale.sale_items:
-             # Optimization: This N+1 query loop is bad for performance but acceptable for MVP with low data volume.
-             # Eager loading would be better.
-             product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-             if product:
-                 pieces = (item.sold_type_qty * product.pieces_per_quantity) + item.sold_piece_qty
-                 cogs_year += pieces * product.buy_price_avg
-
-    # COGS Calculation (Month)
-    cogs_month = 0.0
-    for sale in sales_month:
-        for item in sale.sale_items:
-             product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-             if product:
-                 pieces = (item.sold_type_qty * product.pieces_per_quantity) + item.sold_piece_qty
-                 cogs_month += pieces * product.buy_price_avg
+    # COGS Calculation (Year & Month), one aggregate per month instead of a product query per item.
+    # At most 12 small queries: run inline, the dashboard is polled too often to fan out to the pool
+    profit_by_month = profit.monthly_sums(db, year_start, date(current_year, 12, 31), parallel=False)
+    cogs_year = sum(cogs for _, cogs in profit_by_month.values())
+    cogs_month = profit_by_month[month_start][1]
                  
     total_profit_year = total_sell_year - cogs_year - expenses_year
     profit_month = total_sell_month - cogs_month - expenses_month
@@ -208,106 +150,112 @@ def get_dashboard_metrics(db: Session = Depends(database.get_db)):
         "totalDue": total_due
     }
 
-# Helper for profit calc
-def _calculate_sales_profit(sales, db):
-    revenue = 0.0
-    cogs = 0.0
-    for sale in sales:
-        for item in sale.sale_items:
-            product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-            if not product:
-                continue
-            
-            # Sell Price
-            revenue += (item.sold_type_qty * product.sell_price_per_type) + (item.sold_piece_qty * product.sell_price_per_piece)
-            
-            # Buy Price
-            buy_price_per_piece = product.buy_price_avg
-            buy_price_per_type = product.buy_price_avg * product.pieces_per_quantity
-            cogs += (item.sold_type_qty * buy_price_per_type) + (item.sold_piece_qty * buy_price_per_piece)
-            
-    return revenue, cogs
+# Longest series one request may ask for (10 years of days)
+MAX_SERIES_BUCKETS = 3660
+
+@router.get("/profit/series", dependencies=[Depends(etags.conditional("sales", "products", "expenses"))])
+def get_profit_series(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    bucket: str = Query("day", pattern="^(day|week|month)$"),
+    group_id: Optional[int] = None,
+    db: Session = Depends(database.get_read_db)
+):
+    # Every bucket in the range is returned, zero-filled; week buckets start on Monday.
+    # With group_id, expenses (company-wide) are not subtracted.
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if profit.bucket_count(from_date, to_date, bucket) > MAX_SERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range too long: more than {MAX_SERIES_BUCKETS} {bucket} buckets")
+    return profit.series(db, from_date, to_date, bucket, group_id)
+
+def _profit_range(from_date: Optional[date], to_date: Optional[date], db: Session):
+    """Explicit range, or the first/last sale date for whichever end is missing."""
+    if from_date is None or to_date is None:
+        first_date, last_date = db.query(func.min(models.DailySale.date), func.max(models.DailySale.date)).one()
+        from_date = from_date or first_date or date.today()
+        to_date = to_date or last_date or date.today()
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    return from_date, to_date
+
+def _ranked(rows: list, sort: str, order: str, limit: Optional[int]):
+    if limit is None:
+        return sorted(rows, key=lambda row: row[sort], reverse=(order == "desc"))
+    # Top-N: a heap instead of sorting every row
+    pick = heapq.nlargest if order == "desc" else heapq.nsmallest
+    return pick(limit, rows, key=lambda row: row[sort])
+
+@router.get("/profit/by-group", dependencies=[Depends(etags.conditional("sales", "products", "groups"))])
+def get_profit_by_group(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    sort: str = Query("gross_profit", pattern="^(revenue|cogs|gross_profit|margin)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: Session = Depends(database.get_read_db)
+):
+    # Gross profit per SR group (expenses are company-wide, so not allocated); margin in %
+    from_date, to_date = _profit_range(from_date, to_date, db)
+    return _ranked(profit.breakdown(db, from_date, to_date, "group"), sort, order, limit)
+
+@router.get("/profit/by-product", dependencies=[Depends(etags.conditional("sales", "products", "groups"))])
+def get_profit_by_product(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    group_id: Optional[int] = None,
+    sort: str = Query("gross_profit", pattern="^(revenue|cogs|gross_profit|margin)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: Session = Depends(database.get_read_db)
+):
+    # group_id limits it to sales made by that group
+    from_date, to_date = _profit_range(from_date, to_date, db)
+    return _ranked(profit.breakdown(db, from_date, to_date, "product", group_id), sort, order, limit)
 
 @router.get("/profit/monthly/{year}/{month}")
-def get_monthly_profit_report(year: int, month: int, db: Session = Depends(database.get_db)):
+def get_monthly_profit_report(year: int, month: int, db: Session = Depends(database.get_read_db)):
     import calendar
     
-    # Get all days in month
-    num_days = calendar.monthrange(year, month)[1]
-    
-    daily_profits = []
-    
-    # Optimize: Fetch all sales and expenses for the month once
-    sales_month = db.query(models.DailySale).filter(
-        extract('year', models.DailySale.date) == year,
-        extract('month', models.DailySale.date) == month
-    ).all()
-    
-    expenses_month = db.query(models.Expense).filter(
-        extract('year', models.Expense.date) == year,
-        extract('month', models.Expense.date) == month
-    ).all()
-    
-    for day in range(1, num_days + 1):
-        current_date = date(year, month, day)
-        
-        # Filter for day
-        day_sales = [s for s in sales_month if s.date == current_date]
-        day_expenses = [e for e in expenses_month if e.date == current_date]
-        
-        revenue, cogs = _calculate_sales_profit(day_sales, db)
-        expense_total = sum(e.amount for e in day_expenses)
-        
-        net_profit = revenue - cogs - expense_total
-        
-        daily_profits.append({
-            "date": current_date,
-            "revenue": revenue,
-            "cogs": cogs,
-            "expense": expense_total,
-            "net_profit": net_profit
-        })
-        
-    return daily_profits
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
+    
+    # Day-by-day series of the month (one grouped query for sales, one for expenses)
+    days = profit.series(db, date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1]), "day")
+    
+    return [
+        {
+            "date": day["start"],
+            "revenue": day["revenue"],
+            "cogs": day["cogs"],
+            "expense": day["expense"],
+            "net_profit": day["net_profit"]
+        }
+        for day in days
+    ]
 
 @router.get("/profit/yearly/{year}")
-def get_yearly_profit_report(year: int, db: Session = Depends(database.get_db)):
-    monthly_profits = []
-    
-    sales_year = db.query(models.DailySale).filter(
-        extract('year', models.DailySale.date) == year
-    ).all()
-    
-    expenses_year = db.query(models.Expense).filter(
-        extract('year', models.Expense.date) == year
-    ).all()
-    
-    for month in range(1, 13):
-        month_sales = [s for s in sales_year if s.date.month == month]
-        month_expenses = [e for e in expenses_year if e.date.month == month]
-        
-        revenue, cogs = _calculate_sales_profit(month_sales, db)
-        expense_total = sum(e.amount for e in month_expenses)
-        
-        net_profit = revenue - cogs - expense_total
-        
-        monthly_profits.append({
-            "month": month,
-            "revenue": revenue,
-            "cogs": cogs,
-            "expense": expense_total,
-            "net_profit": net_profit
-        })
-        
-    return monthly_profits
+def get_yearly_profit_report(year: int, db: Session = Depends(database.get_read_db)):
+    months = profit.series(db, date(year, 1, 1), date(year, 12, 31), "month")
+    
+    return [
+        {
+            "month": entry["start"].month,
+            "revenue": entry["revenue"],
+            "cogs": entry["cogs"],
+            "expense": entry["expense"],
+            "net_profit": entry["net_profit"]
+        }
+        for entry in months
+    ]
 
 @router.get("/profit/lifetime")
-def get_lifetime_profit(db: Session = Depends(database.get_db)):
-    # 1. Get All Sales
-    sales = db.query(models.DailySale).all()
+def get_lifetime_profit(db: Session = Depends(database.get_read_db)):
+    # 1. Date range of all sales
+    first_date, last_date = db.query(func.min(models.DailySale.date), func.max(models.DailySale.date)).one()
     
-    # 2. Calculate Revenue & COGS
-    revenue, cogs = _calculate_sales_profit(sales, db)
+    # 2. Calculate Revenue & COGS, partitioned by month (in parallel for multi-year histories)
+    revenue, cogs = profit.totals(db, first_date, last_date) if first_date else (0.0, 0.0)
     
     # 3. Get All Expenses
     total_expense = db.query(func.sum(models.Expense.amount)).scalar() or 0.0
@@ -326,31 +274,33 @@ def get_lifetime_profit(db: Session = Depends(database.get_db)):
 
 @router.post("/target", response_model=schemas.MonthlyTargetResponse)
 def set_monthly_target(target: schemas.MonthlyTargetCreate, db: Session = Depends(database.get_db)):
-    # Check if target exists
-    db_target = db.query(models.MonthlyTarget).filter(
-        models.MonthlyTarget.group_id == target.group_id,
-        models.MonthlyTarget.month == target.month
-    ).first()
-    
-    if db_target:
-        db_target.target_amount = target.target_amount
-    else:
-        db_target = models.MonthlyTarget(
-            group_id=target.group_id,
-            month=target.month,
-            target_amount=target.target_amount
-        )
-        db.add(db_target)
-    
+    # Insert or overwrite in one statement on the (group_id, year_month) unique index
+    target_table = models.MonthlyTarget.__table__
+    upsert = database.insert(target_table).values(
+        group_id=target.group_id,
+        month=target.month,
+        year_month=models.parse_year_month(target.month),
+        target_amount=target.target_amount
+    )
+    target_id = db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=["group_id", "year_month"],
+            set_={"target_amount": upsert.excluded.target_amount, "month": upsert.excluded.month}
+        ).returning(target_table.c.id)
+    ).scalar()
+    
+    etags.bump("targets", db=db)
     db.commit()
-    db.refresh(db_target)
-    return db_target
+    return db.get(models.MonthlyTarget, target_id)
 
 @router.get("/target/{group_id}/{month}", response_model=schemas.MonthlyTargetResponse)
-def get_monthly_target(group_id: int, month: str, db: Session = Depends(database.get_db)):
+def get_monthly_target(group_id: int, month: str, db: Session = Depends(database.get_read_db)):
+    key = models.parse_year_month(month)
+    if key is None:
+        raise HTTPException(status_code=400, detail="Month must be YYYY-MM")
     db_target = db.query(models.MonthlyTarget).filter(
         models.MonthlyTarget.group_id == group_id,
-        models.MonthlyTarget.month == month
+        models.MonthlyTarget.year_month == key
     ).first()
     
     if not db_target:
@@ -359,8 +309,8 @@ def get_monthly_target(group_id: int, month: str, db: Session = Depends(database
         
     return db_target
 
-@router.get("/dashboard/chart")
-def get_dashboard_chart_data(db: Session = Depends(database.get_db)):
+@router.get("/dashboard/chart", dependencies=[Depends(etags.conditional("sales", "targets"))])
+def get_dashboard_chart_data(db: Session = Depends(database.get_read_db)):
     today = date.today()
     current_year = today.year
     
@@ -374,18 +324,16 @@ def get_dashboard_chart_data(db: Session = Depends(database.get_db)):
             "target": 0.0
         })
         
-    # 1. Get Monthly Sales for current year
+    # 1. Get Monthly Sales for current year (indexed integer year_month range)
     monthly_sales = db.query(
-        func.strftime("%m", models.DailySale.date).label("month"),
+        models.DailySale.year_month,
         func.sum(models.DailySale.total_amount).label("total")
     ).filter(
-        extract('year', models.DailySale.date) == current_year
-    ).group_by(func.strftime("%m", models.DailySale.date)).all()
+        models.DailySale.year_month.between(current_year * 100 + 1, current_year * 100 + 12)
+    ).group_by(models.DailySale.year_month).all()
     
     for row in monthly_sales:
-        month_idx = int(row.month) - 1
-        if 0 <= month_idx < 12:
-            chart_data[month_idx]["sales"] = row.total
+        chart_data[row.year_month % 100 - 1]["sales"] = row.total
 
     # 2. Get Monthly Targets for current year (All Groups Summed? Or Average?)
     # The chart seems to be global. So we should sum targets of all groups for that month?
@@ -394,63 +342,76 @@ def get_dashboard_chart_data(db: Session = Depends(database.get_db)):
     # PROPOSAL: Sum all targets for the month across all groups.
     
     monthly_targets = db.query(
-        models.MonthlyTarget.month,
+        models.MonthlyTarget.year_month,
         func.sum(models.MonthlyTarget.target_amount).label("total_target")
     ).filter(
-        models.MonthlyTarget.month.like(f"{current_year}-%")
-    ).group_by(models.MonthlyTarget.month).all()
+        models.MonthlyTarget.year_month.between(current_year * 100 + 1, current_year * 100 + 12)
+    ).group_by(models.MonthlyTarget.year_month).all()
     
     for row in monthly_targets:
-        # row.month is "YYYY-MM"
-        try:
-            parts = row.month.split('-')
-            if len(parts) == 2:
-                m_year = int(parts[0])
-                m_month = int(parts[1])
-                if m_year == current_year:
-                    month_idx = m_month - 1
-                    if 0 <= month_idx < 12:
-                        chart_data[month_idx]["target"] = row.total_target
-        except:
-            pass
+        chart_data[row.year_month % 100 - 1]["target"] = row.total_target
             
     return chart_data
 
-@router.get("/dashboard/top-products")
-def get_top_products(db: Session = Depends(database.get_db)):
-    # Calculate total quantity sold for each product across all groups
-    # We need to sum up (sold_type_qty * pieces_per_quantity + sold_piece_qty) for each product
-    
-    # SQLAlchemy query
-    # Join SaleItem -> Product -> Group
-    # Group by Product.id
-    # Order by total_sold desc
-    # Limit 5
-    
-    results = db.query(
-        models.Product.name,
-        models.Group.name.label("group_name"),
-        func.sum(
-            models.SaleItem.sold_type_qty * models.Product.pieces_per_quantity + 
-            models.SaleItem.sold_piece_qty
-        ).label("total_sold_pieces")
-    ).join(models.Product, models.SaleItem.product_id == models.Product.id)\
-     .join(models.Group, models.Product.group_id == models.Group.id)\
-     .group_by(models.Product.id)\
-     .order_by(func.sum(
-        models.SaleItem.sold_type_qty * models.Product.pieces_per_quantity + 
-        models.SaleItem.sold_piece_qty
-     ).desc())\
-     .limit(5)\
-     .all()
+def _window_start(window: Optional[str], today: date):
+    if window == "7d":
+        return today - timedelta(days=6)
+    if window == "30d":
+        return today - timedelta(days=29)
+    if window == "month":
+        return today.replace(day=1)
+    if window == "year":
+        return today.replace(month=1, day=1)
+    return None # All time
+
+@router.get("/dashboard/top-products", dependencies=[Depends(etags.conditional("sales", "products", "groups"))])
+def get_top_products(
+    window: Optional[str] = Query(None, pattern="^(7d|30d|month|year)$"),
+    group_id: Optional[int] = None,
+    limit: int = Query(5, ge=1, le=100),
+    db: Session = Depends(database.get_read_db)
+):
+    # Answered from the product_sale_rollups aggregate (locked sales only),
+    # then a heap picks the top `limit` products instead of sorting them all.
+    sold_pieces = func.sum(models.ProductSaleRollup.sold_pieces)
+    revenue = func.sum(models.ProductSaleRollup.revenue)
+    
+    query = db.query(models.ProductSaleRollup.product_id, sold_pieces, revenue)
+    
+    start_date = _window_start(window, date.today())
+    if start_date:
+        query = query.filter(models.ProductSaleRollup.date >= start_date)
+    if group_id is not None:
+        query = query.filter(models.ProductSaleRollup.group_id == group_id)
+    
+    totals = query.group_by(models.ProductSaleRollup.product_id).all()
+    top = heapq.nlargest(limit, totals, key=lambda row: row[1] or 0)
+    
+    if not top:
+        return []
+    
+    # Names for the winners only
+    names = {
+        row.id: row
+        for row in db.query(
+            models.Product.id,
+            models.Product.name,
+            models.Group.name.label("group_name")
+        ).join(models.Group, models.Product.group_id == models.Group.id)
+         .filter(models.Product.id.in_([row[0] for row in top])).all()
+    }
      
     # Format response
     top_products = []
-    for row in results:
+    for product_id, total_sold_pieces, total_revenue in top:
+        product = names.get(product_id)
+        if not product:
+            continue # Product deleted since the sale
         top_products.append({
-            "group": row.group_name,
-            "name": row.name,
-            "sold": int(row.total_sold_pieces) if row.total_sold_pieces else 0
+            "group": product.group_name,
+            "name": product.name,
+            "sold": int(total_sold_pieces) if total_sold_pieces else 0,
+            "revenue": total_revenue or 0.0
         })
         
     return top_products
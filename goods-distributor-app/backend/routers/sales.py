@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func, insert
+from typing import List, Optional
 from datetime import date
-import models, schemas, database
+import models, schemas, database, balances, rollups, sale_views, etags, events
 from utils import QuantityHandler
 
 router = APIRouter(
@@ -10,18 +11,22 @@ router = APIRouter(
     tags=["sales"],
 )
 
-@router.get("/today/{group_id}", response_model=schemas.DailySaleResponse)
-def get_today_sale(group_id: int, db: Session = Depends(database.get_db)):
+@router.get("/today/{group_id}", response_model=schemas.DailySaleSummary, response_model_exclude_unset=True)
+def get_today_sale(group_id: int, fields: Optional[str] = None, expand: Optional[str] = None, db: Session = Depends(database.get_db)):
+    # Same fields=/expand= contract as /reports/monthly; full record when neither is given
+    field_list = sale_views.parse_fields(fields)
+    expand_list = sale_views.parse_expand(expand) if (fields or expand) else list(sale_views.EXPANDABLE)
+    
     today = date.today()
-    sale = db.query(models.DailySale).filter(
+    sales = sale_views.load_sales(db, [
         models.DailySale.group_id == group_id,
         models.DailySale.date == today
-    ).first()
+    ], field_list, expand_list)
     
-    if not sale:
+    if not sales:
         raise HTTPException(status_code=404, detail="No sale record for today")
         
-    return sale
+    return sales[0]
 
 @router.post("/today", response_model=schemas.DailySaleResponse)
 def create_or_update_daily_sale(sale_data: schemas.DailySaleCreate, db: Session = Depends(database.get_db)):
@@ -29,43 +34,57 @@ def create_or_update_daily_sale(sale_data: schemas.DailySaleCreate, db: Session
     # Users can edit "Today's Sale" until it is saved/locked.
     # If it exists and is not locked, we update it.
     
-    existing_sale = db.query(models.DailySale).filter(
-        models.DailySale.group_id == sale_data.group_id,
-        models.DailySale.date == sale_data.date
-    ).first()
+    # One atomic upsert on the (group_id, date) unique index: concurrent saves of the same
+    # day can no longer both insert. A locked row is left untouched and returns no id.
+    sale_table = models.DailySale.__table__
+    upsert = database.insert(sale_table).values(
+        group_id=sale_data.group_id,
+        date=sale_data.date,
+        year_month=models.year_month(sale_data.date),
+        cash_received=sale_data.cash_received,
+        status=sale_data.status or "draft"
+    )
+    changes = {"cash_received": upsert.excluded.cash_received}
+    if sale_data.status:
+        changes["status"] = upsert.excluded.status
+    sale_id = db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=["group_id", "date"],
+            set_=changes,
+            where=func.coalesce(sale_table.c.is_locked, 0) == 0
+        ).returning(sale_table.c.id)
+    ).scalar()
     
-    if existing_sale and existing_sale.is_locked:
+    if sale_id is None:
         raise HTTPException(status_code=400, detail="Sale record for this date is locked and cannot be edited.")
 
-    if existing_sale:
-        # Update logic: remove old items/remarks and add new ones (simplest approach for full form submission)
-        # Detailed update logic might be better but for MVP replacing items is easier
-        db.query(models.SaleItem).filter(models.SaleItem.daily_sale_id == existing_sale.id).delete()
-        db.query(models.SaleRemark).filter(models.SaleRemark.daily_sale_id == existing_sale.id).delete()
-        
-        daily_sale = existing_sale
-        daily_sale.cash_received = sale_data.cash_received
-        if sale_data.status:
-            daily_sale.status = sale_data.status
-    else:
-        # Create new
-        daily_sale = models.DailySale(
-            group_id=sale_data.group_id,
-            date=sale_data.date,
-            cash_received=sale_data.cash_received,
-            status=sale_data.status or "draft"
-        )
-        db.add(daily_sale)
-        db.commit()
-        db.refresh(daily_sale)
+    # The upsert holds the write lock from here to the commit, so these reads can't go stale.
+    # Previous ledger contribution of this day (0 for a new one), so the group balance only moves by the difference
+    daily_sale = db.get(models.DailySale, sale_id, populate_existing=True)
+    old_commission = daily_sale.commission or 0.0
+    old_remarks_total = db.query(func.sum(models.SaleRemark.amount)).filter(
+        models.SaleRemark.daily_sale_id == daily_sale.id
+    ).scalar() or 0.0
+
+    # Update logic: remove old items/remarks and add new ones (simplest approach for full form submission)
+    # Detailed update logic might be better but for MVP replacing items is easier
+    db.query(models.SaleItem).filter(models.SaleItem.daily_sale_id == daily_sale.id).delete()
+    db.query(models.SaleRemark).filter(models.SaleRemark.daily_sale_id == daily_sale.id).delete()
         
     total_amount = 0.0
+    new_items = []
     
     # Process Sale Items
+    # Every product on the form in one query, not one per line
+    product_ids = {item.product_id for item in sale_data.sale_items}
+    products = {
+        p.id: p for p in db.query(models.Product).filter(models.Product.id.in_(product_ids))
+    } if product_ids else {}
+
     for item in sale_data.sale_items:
         # Calculate Sold Quantity: Request - Return
         # We need product details to know piece logic
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
+        product = products.get(item.product_id)
         if not product:
             continue
 
@@ -88,7 +107,7 @@ def create_or_update_daily_sale(sale_data: schemas.DailySaleCreate, db: Session
         item_price = (sold_type_qty * product.sell_price_per_type) + (sold_piece_qty * product.sell_price_per_piece)
         total_amount += item_price
         
-        new_item = models.SaleItem(
+        new_items.append(dict(
             daily_sale_id=daily_sale.id,
             product_id=product.id,
             request_type_qty=item.request_type_qty,
@@ -98,21 +117,26 @@ def create_or_update_daily_sale(sale_data: schemas.DailySaleCreate, db: Session
             sold_type_qty=sold_type_qty,
             sold_piece_qty=sold_piece_qty,
             price=item_price
-        )
-        db.add(new_item)
+        ))
+
+    # One executemany INSERT for all lines (db.add() would insert them one by one to get their ids)
+    if new_items:
+        db.execute(insert(models.SaleItem), new_items)
         
     daily_sale.total_amount = total_amount
     
     # Process Remarks
     remarks_total = 0.0
+    new_remarks = []
     for remark in sale_data.remarks:
-        new_remark = models.SaleRemark(
+        new_remarks.append(dict(
             daily_sale_id=daily_sale.id,
             comment=remark['comment'],
             amount=remark['amount']
-        )
-        db.add(new_remark)
+        ))
         remarks_total += remark['amount']
+    if new_remarks:
+        db.execute(insert(models.SaleRemark), new_remarks)
 
     # Recalculate Financials
     # Due = Total Amount - Cash Received (User says: subtract Total Amount from Cash Received... wait)
@@ -134,10 +158,16 @@ def create_or_update_daily_sale(sale_data: schemas.DailySaleCreate, db: Session
     # Commission = Remaining Due?
     # "SR commission... will be the remaining after adding or subtracting all works... the remaining Due amount"
     daily_sale.commission = daily_sale.due
+
+    balances.apply_delta(
+        db, daily_sale.group_id,
+        commission_total=daily_sale.commission - old_commission,
+        remark_total=remarks_total - old_remarks_total
+    )
     
+    etags.bump("sales", "dues", db=db)
     db.commit()
-    db.refresh(daily_sale)
-    return daily_sale
+    return sale_views.load_sale(db, daily_sale.id)
 
 @router.post("/{sale_id}/lock", response_model=schemas.DailySaleResponse)
 def lock_daily_sale(sale_id: int, db: Session = Depends(database.get_db)):
@@ -148,8 +178,14 @@ def lock_daily_sale(sale_id: int, db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=400, detail="Sale already locked")
         
     # Subtract Stock Logic
+    changed_stock = []
+    product_ids = {item.product_id for item in sale.sale_items}
+    # Loaded once; item.product (rollups below) then comes from the session's identity map
+    products = {
+        p.id: p for p in db.query(models.Product).filter(models.Product.id.in_(product_ids))
+    } if product_ids else {}
     for item in sale.sale_items:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
+        product = products.get(item.product_id)
         if not product:
             continue
             
@@ -165,6 +201,12 @@ def lock_daily_sale(sale_id: int, db: Session = Depends(database.get_db)):
         
         product.quantity_value = new_stock_pieces // product.pieces_per_quantity
         product.pieces_quantity = new_stock_pieces % product.pieces_per_quantity
+        changed_stock.append({
+            "id": product.id,
+            "group_id": product.group_id,
+            "quantity_value": product.quantity_value,
+            "pieces_quantity": product.pieces_quantity
+        })
         
         # Log History? "record on our history" is mentioned for Add/Delete logic but implied for sales too?
         # "Total sell this month will have the record of each day"
@@ -173,8 +215,19 @@ def lock_daily_sale(sale_id: int, db: Session = Depends(database.get_db)):
         # But it affects stock.
         # I'll adding a log for consistency if desired, but for now strict requirements don't force it.
     
+    # Finalized sales feed the top-products leaderboard
+    rollups.record_locked_sale(db, sale)
+    
     sale.is_locked = 1
     sale.status = 'completed'
+    etags.bump("sales", "products", db=db)
     db.commit()
-    db.refresh(sale)
+    sale = sale_views.load_sale(db, sale.id)
+    
+    events.publish(
+        "sale_locked",
+        sale_id=sale.id, group_id=sale.group_id, date=sale.date,
+        total_amount=sale.total_amount, commission=sale.commission
+    )
+    events.publish("stock_changed", products=changed_stock)
     return sale
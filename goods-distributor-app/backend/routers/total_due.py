@@ -3,57 +3,78 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List
 from datetime import date, datetime
-import models, schemas, database
+import models, schemas, database, balances, dues, etags, events
 
 router = APIRouter(
     prefix="/total-due",
     tags=["total-due"],
 )
 
-@router.get("/groups")
-def get_groups_total_due(db: Session = Depends(database.get_db)):
+def _publish_payment(db: Session, group_id: int, payment_type: str, amount: float):
+    if not events.has_subscribers():
+        return
+    events.publish(
+        "payment",
+        group_id=group_id, payment_type=payment_type, amount=amount,
+        total_due=balances.total_due(balances.get_balance(db, group_id))
+    )
+
+def _publish_stock(product):
+    if not events.has_subscribers():
+        return
+    events.publish("stock_changed", products=[{
+        "id": product.id,
+        "group_id": product.group_id,
+        "quantity_value": product.quantity_value,
+        "pieces_quantity": product.pieces_quantity
+    }])
+
+@router.get("/groups", dependencies=[Depends(etags.conditional("groups", "dues"))])
+def get_groups_total_due(db: Session = Depends(database.get_read_db)):
     """
     Get all groups with their calculated total due.
     Total Due = (Total Remarks - Paid Remarks) + (Total Commissions - Paid Commissions)
     Note: Product Taken Due is excluded from this header total as per user request.
+    Read from the group_balances ledger instead of re-summing history.
     """
-    groups = db.query(models.Group).all()
-    result = []
+    rows = db.query(models.Group, models.GroupBalance)\
+        .outerjoin(models.GroupBalance, models.GroupBalance.group_id == models.Group.id).all()
     
-    for group in groups:
-        # 1. Commissions
-        commissions_total = db.query(func.sum(models.DailySale.commission)).filter(
-            models.DailySale.group_id == group.id
-        ).scalar() or 0.0
-        
-        commissions_paid = db.query(func.sum(models.GroupPayment.amount)).filter(
-            models.GroupPayment.group_id == group.id,
-            models.GroupPayment.payment_type == 'commission'
-        ).scalar() or 0.0
-        
-        # 2. Remarks
-        remarks_total = db.query(func.sum(models.SaleRemark.amount))\
-            .join(models.DailySale, models.SaleRemark.daily_sale_id == models.DailySale.id)\
-            .filter(models.DailySale.group_id == group.id).scalar() or 0.0
-            
-        remarks_paid = db.query(func.sum(models.GroupPayment.amount)).filter(
-            models.GroupPayment.group_id == group.id,
-            models.GroupPayment.payment_type == 'remark'
-        ).scalar() or 0.0
-            
-        total_due = (commissions_total - commissions_paid) + (remarks_total - remarks_paid)
-        
-        group_dict = {
+    return [
+        {
             "id": group.id,
             "name": group.name,
-            "total_due": total_due
+            "total_due": balances.total_due(balance)
         }
-        result.append(group_dict)
-        
-    return result
+        for group, balance in rows
+    ]
+
+@router.get("/aging", dependencies=[Depends(etags.conditional("groups", "dues"))])
+def get_dues_aging(db: Session = Depends(database.get_read_db)):
+    """
+    How old each group's outstanding commissions, remarks and products taken are,
+    in 0-7 / 8-30 / 31-90 / 90+ day buckets counted from the sale (or taken) date.
+    Commission payments are taken to clear the oldest days first.
+    The ETag includes today's date, so clients can cache it for the day.
+    """
+    today = date.today()
+    buckets = [label for label, _ in dues.AGING_BUCKETS]
+    aged = dues.aging(db, today)
+    empty = dict.fromkeys(buckets, 0.0)
+    
+    groups = []
+    totals = {kind: dict(empty) for kind in dues.KINDS}
+    for group in db.query(models.Group).order_by(models.Group.id).all():
+        by_kind = {kind: aged.get(group.id, {}).get(kind, dict(empty)) for kind in dues.KINDS}
+        for kind, amounts in by_kind.items():
+            for label, amount in amounts.items():
+                totals[kind][label] += amount
+        groups.append({"id": group.id, "name": group.name, **by_kind})
+    
+    return {"as_of": today, "buckets": buckets, "groups": groups, "totals": totals}
 
 @router.get("/{group_id}/commissions")
-def get_group_commissions(group_id: int, db: Session = Depends(database.get_db)):
+def get_group_commissions(group_id: int, db: Session = Depends(database.get_read_db)):
     """
     Fetch commissions with paid status.
     """
@@ -62,12 +83,9 @@ def get_group_commissions(group_id: int, db: Session = Depends(database.get_db))
         models.DailySale.commission != 0
     ).order_by(desc(models.DailySale.date)).all()
     
-    total_commission = sum(s.commission for s in sales)
-    
-    paid_commission = db.query(func.sum(models.GroupPayment.amount)).filter(
-        models.GroupPayment.group_id == group_id,
-        models.GroupPayment.payment_type == 'commission'
-    ).scalar() or 0.0
+    balance = balances.get_balance(db, group_id)
+    total_commission = balance.commission_total if balance else 0.0
+    paid_commission = balance.commission_paid if balance else 0.0
     
     return {
         "total_commission": total_commission,
@@ -84,21 +102,22 @@ def get_group_commissions(group_id: int, db: Session = Depends(database.get_db))
     }
 
 @router.get("/{group_id}/remarks")
-def get_group_remarks(group_id: int, db: Session = Depends(database.get_db)):
+def get_group_remarks(group_id: int, unpaid: bool = False, db: Session = Depends(database.get_read_db)):
     """
     Fetch remarks with paid status.
+    unpaid=true lists only the remarks still owed, read from the partial index on unpaid
+    remarks, so the cost follows what is outstanding rather than the group's whole history.
     """
-    remarks = db.query(models.SaleRemark, models.DailySale.date)\
+    query = db.query(models.SaleRemark, models.DailySale.date)\
         .join(models.DailySale, models.SaleRemark.daily_sale_id == models.DailySale.id)\
-        .filter(models.DailySale.group_id == group_id)\
-        .order_by(desc(models.DailySale.date)).all()
+        .filter(models.DailySale.group_id == group_id)
+    if unpaid:
+        query = query.filter(models.SaleRemark.is_fully_paid == 0)
+    remarks = query.order_by(desc(models.DailySale.date)).all()
         
-    total_remarks = sum(r[0].amount for r in remarks)
-    
-    paid_remarks = db.query(func.sum(models.GroupPayment.amount)).filter(
-        models.GroupPayment.group_id == group_id,
-        models.GroupPayment.payment_type == 'remark'
-    ).scalar() or 0.0
+    balance = balances.get_balance(db, group_id)
+    total_remarks = balance.remark_total if balance else 0.0
+    paid_remarks = balance.remark_paid if balance else 0.0
     
     return {
         "total_remarks": total_remarks,
@@ -141,8 +160,11 @@ def pay_remark(remark_id: int, payment: schemas.GroupPaymentCreate, db: Session
         date=datetime.strptime(payment.date, "%Y-%m-%d").date() if payment.date else date.today()
     )
     db.add(new_payment)
+    balances.apply_payment(db, new_payment.group_id, new_payment.payment_type, new_payment.amount)
     
+    etags.bump("dues", db=db)
     db.commit()
+    _publish_payment(db, new_payment.group_id, "remark", payment.amount)
     return {"message": "Payment recorded", "paid_amount": remark.paid_amount, "is_fully_paid": remark.is_fully_paid}
 
 @router.post("/{group_id}/pay-generic", response_model=schemas.GroupPaymentResponse)
@@ -161,40 +183,71 @@ def pay_group_generic(group_id: int, payment: schemas.GroupPaymentCreate, db: Se
     )
     
     db.add(new_payment)
+    balances.apply_payment(db, new_payment.group_id, new_payment.payment_type, new_payment.amount)
+    etags.bump("dues", db=db)
     db.commit()
     db.refresh(new_payment)
+    _publish_payment(db, new_payment.group_id, new_payment.payment_type, new_payment.amount)
     return new_payment
 
+@router.post("/{group_id}/settle")
+def settle_group_dues(group_id: int, settlement: schemas.SettlementCreate, db: Session = Depends(database.get_db)):
+    """
+    Pay one lump amount off the group's commissions, remarks and products taken in a
+    single transaction: oldest first, or in the order given by `plan`.
+    Returns how the amount was allocated.
+    """
+    if db.get(models.Group, group_id) is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    
+    plan = [entry.model_dump() for entry in settlement.plan] if settlement.plan is not None else None
+    try:
+        result = dues.settle(
+            db, group_id, settlement.amount, plan,
+            paid_on=datetime.strptime(settlement.date, "%Y-%m-%d").date() if settlement.date else None
+        )
+    except dues.SettlementConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except dues.SettlementError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    etags.bump("dues", db=db)
+    db.commit()
+    for payment_type, amount in result["totals"].items():
+        if amount:
+            _publish_payment(db, group_id, payment_type, amount)
+    result["total_due"] = balances.total_due(balances.get_balance(db, group_id))
+    return result
+
 @router.get("/{group_id}/product-taken", response_model=List[schemas.ProductTakenResponse])
-def get_group_product_taken(group_id: int, db: Session = Depends(database.get_db)):
+def get_group_product_taken(group_id: int, db: Session = Depends(database.get_read_db)):
     """
     List products taken by this group that are NOT fully paid.
+    Product fields come from the same query (outer join), not a lazy load per row.
     """
-    items = db.query(models.ProductTaken).filter(
-        models.ProductTaken.group_id == group_id,
-        models.ProductTaken.is_fully_paid == 0
-    ).all()
+    taken, product = models.ProductTaken, models.Product
+    rows = db.query(taken, product.id, product.quantity_type, product.pieces_per_quantity)\
+        .outerjoin(product, product.id == taken.product_id)\
+        .filter(taken.group_id == group_id, taken.is_fully_paid == 0)\
+        .order_by(taken.id).all()
     
-    # Populate quantity_type from relationship
-    result = []
-    for item in items:
-        item_dict = {
+    return [
+        {
             "id": item.id,
             "group_id": item.group_id,
             "product_id": item.product_id,
             "product_name": item.product_name,
             "quantity": item.quantity,
-            "quantity_type": item.product.quantity_type if item.product else "box",
-            "pieces_per_quantity": item.product.pieces_per_quantity if item.product else 1,
+            "quantity_type": quantity_type if product_id is not None else "box",
+            "pieces_per_quantity": pieces_per_quantity if product_id is not None else 1,
             "pieces": item.pieces,
             "total_price": item.total_price,
             "paid_amount": item.paid_amount,
             "date": item.date,
             "is_fully_paid": item.is_fully_paid
         }
-        result.append(item_dict)
-        
-    return result
+        for item, product_id, quantity_type, pieces_per_quantity in rows
+    ]
 
 @router.post("/product-taken", response_model=schemas.ProductTakenResponse)
 def add_product_taken(item: schemas.ProductTakenCreate, db: Session = Depends(database.get_db)):
@@ -229,8 +282,11 @@ def add_product_taken(item: schemas.ProductTakenCreate, db: Session = Depends(da
     )
     
     db.add(new_item)
+    balances.apply_delta(db, new_item.group_id, product_taken_total=new_item.total_price)
+    etags.bump("dues", "products", db=db)
     db.commit()
     db.refresh(new_item)
+    _publish_stock(product)
     return new_item
 
 @router.post("/product-taken/{id}/pay")
@@ -243,8 +299,12 @@ def pay_product_taken(id: int, payment: schemas.ProductTakenPay, db: Session = D
     
     if item.paid_amount >= item.total_price:
         item.is_fully_paid = 1
+
+    balances.apply_delta(db, item.group_id, product_taken_paid=payment.amount)
         
+    etags.bump("dues", db=db)
     db.commit()
+    _publish_payment(db, item.group_id, "product_taken", payment.amount)
     return {"message": "Payment recorded", "paid_amount": item.paid_amount, "is_fully_paid": item.is_fully_paid}
 
 @router.post("/product-taken/{id}/return")
@@ -273,8 +333,10 @@ def return_product_taken(id: int, return_data: schemas.ProductTakenReturn, db: S
     return_pieces_count = (return_data.quantity * (product.pieces_per_quantity or 1)) + return_data.pieces
     refund_amount = return_pieces_count * price_per_piece
     
+    previous_total_price = item.total_price
     item.total_price -= refund_amount
     if item.total_price < 0: item.total_price = 0
+    balances.apply_delta(db, item.group_id, product_taken_total=item.total_price - previous_total_price)
     
     # Reduce recorded quantity
     current_item_pieces = (item.quantity * (product.pieces_per_quantity or 1)) + item.pieces
@@ -288,5 +350,8 @@ def return_product_taken(id: int, return_data: schemas.ProductTakenReturn, db: S
     if item.paid_amount >= item.total_price:
         item.is_fully_paid = 1
         
+    etags.bump("dues", "products", db=db)
     db.commit()
+    if product:
+        _publish_stock(product)
     return {"message": "Return processed", "new_total_price": item.total_price}
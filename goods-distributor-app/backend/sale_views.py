@@ -0,0 +1,78 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
+import models
+
+# Plain columns a caller can ask for with `fields=`
+SUMMARY_FIELDS = (
+    "group_id", "date", "cash_received", "id", "total_amount",
+    "due", "commission", "status", "is_locked",
+)
+
+# Child collections only loaded when named in `expand=`
+EXPANDABLE = ("sale_items", "remarks")
+
+
+def _split(value: Optional[str]) -> list:
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+
+def parse_fields(fields: Optional[str]) -> list:
+    requested = _split(fields)
+    unknown = [f for f in requested if f not in SUMMARY_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(SUMMARY_FIELDS)}"
+        )
+    # `id` always comes back so the client can ask for details later
+    return [f for f in SUMMARY_FIELDS if f in requested or f == "id"] if requested else list(SUMMARY_FIELDS)
+
+
+def parse_expand(expand: Optional[str]) -> list:
+    requested = _split(expand)
+    unknown = [e for e in requested if e not in EXPANDABLE]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown expand: {', '.join(unknown)}. Allowed: {', '.join(EXPANDABLE)}"
+        )
+    return [e for e in EXPANDABLE if e in requested]
+
+
+def load_sales(db: Session, filters: list, fields: list, expand: list) -> list:
+    """
+    Load daily sales matching `filters`.
+    Without `expand` this is one column-projected query returning dicts of `fields`;
+    with it, entities are loaded and the requested children are fetched with selectinload
+    (one extra IN query per collection), never lazily per row.
+    """
+    if not expand:
+        columns = [getattr(models.DailySale, f) for f in fields]
+        rows = db.query(*columns).filter(*filters).order_by(models.DailySale.date).all()
+        return [dict(zip(fields, row)) for row in rows]
+
+    options = []
+    if "sale_items" in expand:
+        options.append(selectinload(models.DailySale.sale_items).selectinload(models.SaleItem.product))
+    if "remarks" in expand:
+        options.append(selectinload(models.DailySale.remarks))
+
+    sales = db.query(models.DailySale).options(*options)\
+        .filter(*filters).order_by(models.DailySale.date).all()
+
+    result = []
+    for sale in sales:
+        row = {f: getattr(sale, f) for f in fields}
+        for relation in expand:
+            row[relation] = getattr(sale, relation)
+        result.append(row)
+    return result
+
+
+def load_sale(db: Session, sale_id: int):
+    """One daily sale with its items (and their products) and remarks, for a DailySaleResponse."""
+    return db.query(models.DailySale).options(
+        selectinload(models.DailySale.sale_items).selectinload(models.SaleItem.product),
+        selectinload(models.DailySale.remarks)
+    ).populate_existing().filter(models.DailySale.id == sale_id).one()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import date, datetime
 
@@ -110,6 +110,30 @@ class MonthlyReportResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Alias so a field named `date` with a default can still refer to the type
+DateType = date
+
+# Lean variants: every field is optional so `fields=`/`expand=` responses
+# only carry what was asked for (served with response_model_exclude_unset).
+class DailySaleSummary(BaseModel):
+    group_id: Optional[int] = None
+    date: Optional[DateType] = None
+    cash_received: Optional[float] = None
+    id: Optional[int] = None
+    total_amount: Optional[float] = None
+    due: Optional[float] = None
+    commission: Optional[float] = None
+    status: Optional[str] = None
+    is_locked: Optional[int] = None
+    sale_items: Optional[List[SaleItemResponse]] = None
+    remarks: Optional[List[SaleRemarkResponse]] = None
+    class Config:
+        from_attributes = True
+
+class MonthlyReportSummaryResponse(BaseModel):
+    sales: List[DailySaleSummary]
+    total_sales: float
+
 # Expense & Target
 class ExpenseCreate(BaseModel):
     description: str
@@ -122,7 +146,7 @@ class TargetCreate(BaseModel):
 
 class MonthlyTargetCreate(BaseModel):
     group_id: int
-    month: str
+    month: str = Field(pattern=r"^\d{4}-(0[1-9]|1[0-2])$") # YYYY-MM
     target_amount: float
 
 class MonthlyTargetResponse(BaseModel):
@@ -190,3 +214,28 @@ class GroupPaymentResponse(BaseModel):
     date: date
     class Config:
         from_attributes = True
+
+class SettlementPlanItem(BaseModel):
+    kind: str # 'commission', 'remark' or 'product_taken'
+    id: Optional[int] = None # Remark / product taken id, not used for commission
+    amount: Optional[float] = None # Defaults to as much as the item still owes
+
+class SettlementCreate(BaseModel):
+    amount: float
+    date: str = None # YYYY-MM-DD
+    plan: Optional[List[SettlementPlanItem]] = None # Defaults to oldest dues first
+
+# Background Jobs
+class JobCreate(BaseModel):
+    kind: str
+    params: dict = {}
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    params: dict
+    status: str
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
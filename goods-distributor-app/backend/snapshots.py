@@ -0,0 +1,231 @@
+import os
+import sys
+import threading
+from datetime import date
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+import models
+from database import engine, IS_SQLITE
+
+# Columnar copies of finished months for the profit breakdowns. `python snapshots.py export`
+# writes one Arrow IPC file per month whose sales are all locked (locked sales never change),
+# holding sold quantities per day, group and product. Reports read those months memory-mapped
+# and aggregate them with pyarrow; everything else (the current month, months with drafts,
+# partitions that no longer match the database) is still summed in SQLite.
+# pyarrow is optional: without it, or without exported files, nothing changes.
+
+# Set 0 to ignore exported partitions
+ANALYTICS_SNAPSHOTS = os.environ.get("ANALYTICS_SNAPSHOTS", "1") == "1"
+
+# 2: partitions are checked against a fingerprint of the month's locked sales
+FORMAT_VERSION = "2"
+
+_cache_lock = threading.Lock()
+_tables = {} # path -> (mtime, table)
+
+
+def snapshot_dir() -> str:
+    """SNAPSHOT_DIR, else `<database file>.snapshots` next to a SQLite database."""
+    configured = os.environ.get("SNAPSHOT_DIR")
+    if configured:
+        return configured
+    database = engine.url.database
+    if IS_SQLITE and database and database != ":memory:":
+        return os.path.abspath(database) + ".snapshots"
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+
+
+def _pyarrow():
+    # Imported on first use: pyarrow is optional and slow to import
+    try:
+        import pyarrow
+        import pyarrow.compute  # noqa: F401
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _path(month_start: date) -> str:
+    return os.path.join(snapshot_dir(), f"sales-{month_start:%Y-%m}.arrow")
+
+
+def _month_end(month_start: date) -> date:
+    following = date(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+    return date.fromordinal(following.toordinal() - 1)
+
+
+def _month_states(db: Session, start: date, end: date) -> dict:
+    """
+    {month_start: (unlocked sales, fingerprint)} for months with sales in [start, end].
+    The fingerprint (count, max id and summed total_amount of the locked sales) changes
+    when a locked sale is deleted, replaced by another one or has its amounts corrected.
+    """
+    sale = models.DailySale
+    locked = func.coalesce(sale.is_locked, 0) != 0
+    rows = db.query(
+        sale.year_month,
+        func.count(sale.id),
+        func.count(case((locked, sale.id))),
+        func.max(case((locked, sale.id))),
+        func.sum(case((locked, sale.total_amount))),
+    ).filter(sale.date >= start, sale.date <= end).group_by(sale.year_month).all()
+    return {
+        date(key // 100, key % 100, 1): (total - locked_count, f"{locked_count}:{max_id or 0}:{amount or 0.0:.2f}")
+        for key, total, locked_count, max_id, amount in rows if key is not None
+    }
+
+
+def export(db: Session, force: bool = False) -> dict:
+    """
+    Write a partition for every finished, fully locked month without one (or every
+    such month with force=True). Returns {"written": [...], "skipped": {month: reason}}.
+    """
+    pa = _pyarrow()
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed (pip install pyarrow)")
+    os.makedirs(snapshot_dir(), exist_ok=True)
+
+    first, last = db.query(func.min(models.DailySale.date), func.max(models.DailySale.date)).one()
+    written, skipped = [], {}
+    if first is None:
+        return {"written": written, "skipped": skipped}
+    current_month = date.today().replace(day=1)
+    states = _month_states(db, first, last)
+
+    schema = pa.schema([
+        ("date", pa.date32()),
+        ("group_id", pa.int32()),
+        ("product_id", pa.int32()),
+        ("sold_type_qty", pa.int64()),
+        ("sold_piece_qty", pa.int64()),
+        ("amount", pa.float64()),
+    ])
+    sale, item = models.DailySale, models.SaleItem
+    for month_start, (unlocked, fingerprint) in sorted(states.items()):
+        label = f"{month_start:%Y-%m}"
+        if month_start >= current_month:
+            skipped[label] = "current month"
+            continue
+        if unlocked:
+            skipped[label] = f"{unlocked} unlocked sale(s)"
+            continue
+        path = _path(month_start)
+        if os.path.exists(path) and not force:
+            skipped[label] = "already exported"
+            continue
+
+        rows = db.query(
+            sale.date, sale.group_id, item.product_id,
+            func.coalesce(func.sum(item.sold_type_qty), 0),
+            func.coalesce(func.sum(item.sold_piece_qty), 0),
+            func.coalesce(func.sum(item.price), 0.0),
+        ).join(item, item.daily_sale_id == sale.id)\
+         .filter(sale.date >= month_start, sale.date <= _month_end(month_start))\
+         .group_by(sale.date, sale.group_id, item.product_id).all()
+
+        columns = list(zip(*rows)) if rows else [[] for _ in schema.names]
+        table = pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema.with_metadata({
+                "version": FORMAT_VERSION,
+                "month": label,
+                "fingerprint": fingerprint,
+            })
+        )
+        # Written aside and renamed, so a reader never maps a half-written file
+        partial = path + ".tmp"
+        with pa.OSFile(partial, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(partial, path)
+        written.append(label)
+    return {"written": written, "skipped": skipped}
+
+
+def _read(path: str):
+    pa = _pyarrow()
+    mtime = os.path.getmtime(path)
+    with _cache_lock:
+        cached = _tables.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    with _cache_lock:
+        _tables[path] = (mtime, table)
+    return table
+
+
+def covered_months(db: Session, start: date, end: date) -> list:
+    """Whole months inside [start, end] whose partition still matches the database."""
+    if not ANALYTICS_SNAPSHOTS or not os.path.isdir(snapshot_dir()) or _pyarrow() is None:
+        return []
+    states = _month_states(db, start, end)
+    months = []
+    for month_start, (unlocked, fingerprint) in states.items():
+        if month_start < start or _month_end(month_start) > end or unlocked:
+            continue
+        path = _path(month_start)
+        if not os.path.exists(path):
+            continue
+        metadata = _read(path).schema.metadata or {}
+        # A deleted, replaced or corrected sale makes the partition stale
+        if metadata.get(b"version") == FORMAT_VERSION.encode() and metadata.get(b"fingerprint") == fingerprint.encode():
+            months.append(month_start)
+    return sorted(months)
+
+
+def sold_quantities(months: list, group_id: int = None) -> list:
+    """[(group_id, product_id, sold_type_qty, sold_piece_qty)] summed over the given months' partitions."""
+    if not months:
+        return []
+    pa = _pyarrow()
+    pc = pa.compute
+    table = pa.concat_tables([_read(_path(m)) for m in months])
+    if group_id is not None:
+        table = table.filter(pc.equal(table["group_id"], group_id))
+    summed = table.group_by(["group_id", "product_id"]).aggregate([
+        ("sold_type_qty", "sum"),
+        ("sold_piece_qty", "sum"),
+    ])
+    return list(zip(
+        summed["group_id"].to_pylist(),
+        summed["product_id"].to_pylist(),
+        summed["sold_type_qty_sum"].to_pylist(),
+        summed["sold_piece_qty_sum"].to_pylist(),
+    ))
+
+
+if __name__ == "__main__":
+    # Usage: python snapshots.py export [--force]
+    #        python snapshots.py list
+    from database import SessionLocal
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    db = SessionLocal()
+    try:
+        if command == "export":
+            try:
+                result = export(db, force="--force" in sys.argv)
+            except RuntimeError as e:
+                print(e)
+                sys.exit(1)
+            for label in result["written"]:
+                print(f"{label}: written")
+            for label, reason in result["skipped"].items():
+                print(f"{label}: skipped ({reason})")
+            print(f"Snapshots in {snapshot_dir()}")
+        elif command == "list":
+            directory = snapshot_dir()
+            names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+            for name in names:
+                if name.endswith(".arrow"):
+                    size = os.path.getsize(os.path.join(directory, name))
+                    print(f"{name:<24} {size / 1024:>10.1f} KiB")
+            if not names:
+                print(f"No snapshots in {directory}")
+        else:
+            print(f"Unknown command: {command}")
+            sys.exit(2)
+    finally:
+        db.close()
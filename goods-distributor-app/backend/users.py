@@ -0,0 +1,181 @@
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+import models
+from database import SessionLocal
+
+# Seconds a worker trusts its in-memory copy of the users table; password or role
+# changes made by another process (e.g. `python users.py set-password`) show up after this
+USER_CACHE_SECONDS = float(os.environ.get("USER_CACHE_SECONDS", "60"))
+
+# Unknown usernames are remembered this long (at most MISSING_USER_CACHE_SIZE of them), so
+# repeated logins with a wrong username don't query the database every time
+MISSING_USER_CACHE_SECONDS = float(os.environ.get("MISSING_USER_CACHE_SECONDS", "5"))
+MISSING_USER_CACHE_SIZE = 1024
+
+# Created on first start so the documented default logins keep working; change them
+# with `python users.py set-password <username> <password>`
+DEFAULT_USERS = (
+    ("admin", "admin1234", "admin"),
+    ("guest", "guest1234", "sr"),
+)
+
+ROLES = ("admin", "sr")
+
+# bcrypt only looks at the first 72 bytes of a password
+MAX_PASSWORD_BYTES = 72
+
+
+def hash_password(password: str) -> str:
+    # Imported on first use, like jose in routers/auth.py
+    import bcrypt
+    encoded = password.encode()
+    if len(encoded) > MAX_PASSWORD_BYTES:
+        raise ValueError(f"Password is longer than {MAX_PASSWORD_BYTES} bytes")
+    return bcrypt.hashpw(encoded, bcrypt.gensalt()).decode()
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    import bcrypt
+    encoded = password.encode()
+    if len(encoded) > MAX_PASSWORD_BYTES:
+        return False
+    return bcrypt.checkpw(encoded, password_hash.encode())
+
+
+class UserStore(ABC):
+    """Where logins are looked up. Users are plain dicts: username, role, password_hash."""
+
+    @abstractmethod
+    def get(self, username: str):
+        """The user, or None if there is no such login."""
+
+    def authenticate(self, username: str, password: str):
+        """The user if the password matches, else None."""
+        user = self.get(username)
+        if user is None or not verify_password(password, user["password_hash"]):
+            return None
+        return user
+
+    def invalidate(self):
+        pass
+
+
+def _as_dict(user: models.User) -> dict:
+    return {"username": user.username, "role": user.role, "password_hash": user.password_hash}
+
+
+class DatabaseUserStore(UserStore):
+    """
+    The `users` table, held in memory and re-read every USER_CACHE_SECONDS. A username
+    not in memory is looked up on its own (logins created since the last load); misses
+    are remembered for MISSING_USER_CACHE_SECONDS.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._users = None
+        self._loaded_at = 0.0
+        self._missing = OrderedDict() # username -> time.monotonic() of the failed lookup
+
+    def _load(self) -> dict:
+        with self._session_factory() as db:
+            return {u.username: _as_dict(u) for u in db.query(models.User).all()}
+
+    def _fetch(self, username: str):
+        with self._session_factory() as db:
+            user = db.query(models.User).filter(models.User.username == username).first()
+            return _as_dict(user) if user is not None else None
+
+    def get(self, username: str):
+        with self._lock:
+            now = time.monotonic()
+            if self._users is None or now - self._loaded_at > USER_CACHE_SECONDS:
+                self._users = self._load()
+                self._loaded_at = now
+                self._missing.clear()
+            if username in self._users:
+                return self._users[username]
+            missed_at = self._missing.get(username)
+            if missed_at is not None and now - missed_at <= MISSING_USER_CACHE_SECONDS:
+                return None
+
+        # Outside the lock: one indexed lookup, never a reload of the whole table
+        user = self._fetch(username)
+        with self._lock:
+            if self._users is None:
+                return user
+            if user is not None:
+                self._users[username] = user
+                self._missing.pop(username, None)
+            else:
+                self._missing[username] = time.monotonic()
+                self._missing.move_to_end(username)
+                if len(self._missing) > MISSING_USER_CACHE_SIZE:
+                    self._missing.popitem(last=False)
+        return user
+
+    def invalidate(self):
+        with self._lock:
+            self._users = None
+            self._missing.clear()
+
+
+store = DatabaseUserStore()
+
+
+def set_password(db: Session, username: str, password: str, role: str = None) -> models.User:
+    """Create the user or change its password (and role, if given)."""
+    if role is not None and role not in ROLES:
+        raise ValueError(f"Unknown role: {role}. Allowed: {', '.join(ROLES)}")
+    user = db.query(models.User).filter(models.User.username == username).first()
+    if user is None:
+        user = models.User(username=username, role=role or "sr")
+        db.add(user)
+    elif role is not None:
+        user.role = role
+    user.password_hash = hash_password(password)
+    db.commit()
+    store.invalidate()
+    return user
+
+
+def ensure_initialized(db: Session):
+    """Seed the default logins into an empty users table."""
+    if db.query(models.User.id).first() is not None:
+        return
+    for username, password, role in DEFAULT_USERS:
+        db.add(models.User(username=username, password_hash=hash_password(password), role=role))
+    db.commit()
+    store.invalidate()
+
+
+if __name__ == "__main__":
+    # Usage: python users.py list
+    #        python users.py set-password <username> <password> [admin|sr]
+    from database import engine, Base
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if command == "list":
+            for user in db.query(models.User).order_by(models.User.username).all():
+                print(f"{user.username:<20} {user.role}")
+        elif command == "set-password" and len(sys.argv) in (4, 5):
+            try:
+                user = set_password(db, sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) == 5 else None)
+            except ValueError as e:
+                print(e)
+                sys.exit(2)
+            print(f"Password set for {user.username} ({user.role}).")
+        else:
+            print(f"Unknown command: {' '.join(sys.argv[1:])}")
+            sys.exit(2)
+    finally:
+        db.close()
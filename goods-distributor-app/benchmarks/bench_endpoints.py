@@ -0,0 +1,251 @@
+"""
+Latency and SQL statement count for every API endpoint, stored as JSON so runs
+can be compared between commits.
+
+Usage (from the goods-distributor-app directory):
+    python benchmarks/generate_dataset.py --db bench.db --start 2024-01-01
+    python benchmarks/bench_endpoints.py --db bench.db --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/bench_endpoints.py --db bench.db --compare results/<older>.json
+
+Write endpoints are only exercised with --writes (they modify the dataset).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# Streaming/monitoring routes, background jobs (the work happens off the request),
+# plus writes that can't be repeated against the same rows (create-unique, delete,
+# lock) and would only measure 4xx responses
+SKIPPED_ROUTES = {
+    "GET /events", "GET /metrics", "GET /metrics/etag", "GET /metrics/admission",
+    "POST /jobs", "GET /jobs/{job_id}", "GET /jobs/{job_id}/result",
+    "POST /groups/", "POST /products/", "POST /sales/{sale_id}/lock",
+    "DELETE /groups/{group_id}", "DELETE /products/{product_id}",
+}
+
+
+def build_cases(db, models, writes: bool) -> list:
+    """(name, method, path, kwargs) for each endpoint, filled with ids from the dataset."""
+    group_id = db.query(models.Group.id).order_by(models.Group.id).first()[0]
+    product_id = db.query(models.Product.id).filter(models.Product.group_id == group_id).first()[0]
+    last_sale = db.query(models.DailySale).order_by(models.DailySale.date.desc()).first()
+    ref = last_sale.date if last_sale else date.today()
+
+    cases = [
+        ("GET /", "GET", "/", {}),
+        ("GET /groups/", "GET", "/groups/", {}),
+        ("GET /products/group/{group_id}", "GET", f"/products/group/{group_id}", {}),
+        ("GET /products/group/{group_id}/history", "GET", f"/products/group/{group_id}/history", {}),
+        ("GET /sales/today/{group_id}", "GET", f"/sales/today/{group_id}", {}),
+        ("GET /reports/monthly/{group_id}", "GET", f"/reports/monthly/{group_id}",
+         {"params": {"month": ref.month, "year": ref.year}}),
+        ("GET /reports/monthly/{group_id}?fields", "GET", f"/reports/monthly/{group_id}",
+         {"params": {"month": ref.month, "year": ref.year, "fields": "date,total_amount"}}),
+        ("GET /reports/yearly/{group_id}", "GET", f"/reports/yearly/{group_id}", {"params": {"year": ref.year}}),
+        ("GET /reports/profit/daily/{date}", "GET", f"/reports/profit/daily/{ref}", {}),
+        ("GET /reports/dashboard", "GET", "/reports/dashboard", {}),
+        ("GET /reports/profit/monthly/{year}/{month}", "GET", f"/reports/profit/monthly/{ref.year}/{ref.month}", {}),
+        ("GET /reports/profit/yearly/{year}", "GET", f"/reports/profit/yearly/{ref.year}", {}),
+        ("GET /reports/profit/lifetime", "GET", "/reports/profit/lifetime", {}),
+        ("GET /reports/profit/series", "GET", "/reports/profit/series",
+         {"params": {"from": str(ref - timedelta(days=364)), "to": str(ref), "bucket": "week"}}),
+        ("GET /reports/profit/by-group", "GET", "/reports/profit/by-group", {}),
+        ("GET /reports/profit/by-product", "GET", "/reports/profit/by-product",
+         {"params": {"from": str(ref - timedelta(days=89)), "to": str(ref), "limit": 20}}),
+        ("GET /reports/target/{group_id}/{month}", "GET", f"/reports/target/{group_id}/{ref:%Y-%m}", {}),
+        ("GET /reports/dashboard/chart", "GET", "/reports/dashboard/chart", {}),
+        ("GET /reports/dashboard/top-products", "GET", "/reports/dashboard/top-products", {}),
+        ("GET /reports/dashboard/top-products?window=30d", "GET", "/reports/dashboard/top-products",
+         {"params": {"window": "30d", "limit": 10}}),
+        ("GET /total-due/groups", "GET", "/total-due/groups", {}),
+        ("GET /total-due/aging", "GET", "/total-due/aging", {}),
+        ("GET /total-due/{group_id}/commissions", "GET", f"/total-due/{group_id}/commissions", {}),
+        ("GET /total-due/{group_id}/remarks", "GET", f"/total-due/{group_id}/remarks", {}),
+        ("GET /total-due/{group_id}/remarks?unpaid=true", "GET", f"/total-due/{group_id}/remarks",
+         {"params": {"unpaid": "true"}}),
+        ("GET /total-due/{group_id}/product-taken", "GET", f"/total-due/{group_id}/product-taken", {}),
+        ("GET /jobs", "GET", "/jobs", {}),
+    ]
+
+    if writes:
+        today = date.today()
+        remark_id = db.query(models.SaleRemark.id).filter(models.SaleRemark.is_fully_paid == 0).first()
+        taken_id = db.query(models.ProductTaken.id).filter(models.ProductTaken.is_fully_paid == 0).first()
+        cases += [
+            ("POST /auth/login", "POST", "/auth/login", {"data": {"username": "admin", "password": "admin1234"}}),
+            ("POST /sales/today", "POST", "/sales/today", {"json": {
+                "group_id": group_id, "date": str(today), "cash_received": 1000, "status": "draft",
+                "sale_items": [{"product_id": product_id, "request_type_qty": 2, "request_piece_qty": 0,
+                                "return_type_qty": 0, "return_piece_qty": 0}],
+                "remarks": [{"comment": "bench", "amount": 10}],
+            }}),
+            ("PUT /products/{product_id}/add", "PUT", f"/products/{product_id}/add", {"json": {
+                "quantity_value": 1, "pieces_quantity": 0, "buy_price_total": 100,
+                "sell_price_per_type": 120, "sell_price_per_piece": 12,
+            }}),
+            ("PUT /products/{product_id}/purchase", "PUT", f"/products/{product_id}/purchase", {"json": {
+                "quantity_value": 0, "pieces_quantity": 1, "buy_price_total": 0,
+                "sell_price_per_type": 120, "sell_price_per_piece": 12,
+            }}),
+            ("POST /total-due/product-taken", "POST", "/total-due/product-taken", {"json": {
+                "group_id": group_id, "product_id": product_id, "quantity": 0, "pieces": 1, "total_price": 10,
+            }}),
+            ("POST /total-due/{group_id}/pay-generic", "POST", f"/total-due/{group_id}/pay-generic", {"json": {
+                "group_id": group_id, "amount": 1, "payment_type": "commission",
+            }}),
+            ("POST /total-due/{group_id}/settle", "POST", f"/total-due/{group_id}/settle", {"json": {"amount": 1}}),
+            ("POST /total-due/remarks/{remark_id}/pay", "POST", f"/total-due/remarks/{remark_id[0] if remark_id else 0}/pay",
+             {"json": {"group_id": group_id, "amount": 0.01, "payment_type": "remark"}}),
+            ("POST /total-due/product-taken/{id}/pay", "POST", f"/total-due/product-taken/{taken_id[0] if taken_id else 0}/pay",
+             {"json": {"amount": 0.01}}),
+            ("POST /total-due/product-taken/{id}/return", "POST", f"/total-due/product-taken/{taken_id[0] if taken_id else 0}/return",
+             {"json": {"quantity": 0, "pieces": 0}}),
+            ("POST /reports/expense", "POST", "/reports/expense", {"json": {
+                "description": "bench", "amount": 1, "date": str(today),
+            }}),
+            ("POST /reports/target", "POST", "/reports/target", {"json": {
+                "group_id": group_id, "month": f"{today:%Y-%m}", "target_amount": 1000,
+            }}),
+        ]
+    return cases
+
+
+def run(client, engines, cases: list, repeat: int) -> dict:
+    from sqlalchemy import event
+
+    counter = {"queries": 0}
+
+    def _count(*args):
+        counter["queries"] += 1
+
+    for engine in engines:
+        event.listen(engine, "after_cursor_execute", _count)
+
+    results = {}
+    for name, method, path, kwargs in cases:
+        client.request(method, path, **kwargs) # warm-up
+        timings, queries, status = [], [], None
+        for _ in range(repeat):
+            counter["queries"] = 0
+            start = time.perf_counter()
+            response = client.request(method, path, **kwargs)
+            timings.append((time.perf_counter() - start) * 1000)
+            queries.append(counter["queries"])
+            status = response.status_code
+        timings.sort()
+        results[name] = {
+            "status": status,
+            "min_ms": round(timings[0], 3),
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "queries": max(queries),
+        }
+        print(f"{name:<55} {status:>4} p50 {results[name]['p50_ms']:>9.2f} ms  "
+              f"p95 {results[name]['p95_ms']:>9.2f} ms  {results[name]['queries']:>6} queries")
+    return results
+
+
+def uncovered_routes(app, cases: list, writes: bool) -> list:
+    from fastapi.routing import APIRoute
+
+    covered = {name.split("?")[0] for name, *_ in cases}
+    missing = set()
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        for method in route.methods:
+            key = f"{method} {route.path}"
+            if key in covered or key in SKIPPED_ROUTES or (method != "GET" and not writes):
+                continue
+            missing.add(key)
+    return sorted(missing)
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('commit')}):")
+    print(f"{'endpoint':<55} {'p50 before':>11} {'p50 now':>9} {'ratio':>6} {'queries':>15}")
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        ratio = now["p50_ms"] / before["p50_ms"] if before["p50_ms"] else float("inf")
+        print(f"{name:<55} {before['p50_ms']:>11.2f} {now['p50_ms']:>9.2f} {ratio:>6.2f} "
+              f"{before['queries']:>7} -> {now['queries']:<6}")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench.db", help="Dataset created by generate_dataset.py")
+    parser.add_argument("--url", help="SQLAlchemy database URL, overrides --db")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--writes", action="store_true", help="Also benchmark write endpoints")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.url or f"sqlite:///{os.path.abspath(args.db)}"
+    # Each case is repeated back to back; the rate limiter would turn most of them into 429s
+    os.environ.setdefault("RATE_LIMIT", "0")
+    sys.path.insert(0, BACKEND_DIR)
+    from fastapi.testclient import TestClient
+    import database, models, main as app_main
+
+    db = database.SessionLocal()
+    try:
+        cases = build_cases(db, models, args.writes)
+        dataset = {
+            "daily_sales": db.query(models.DailySale).count(),
+            "sale_items": db.query(models.SaleItem).count(),
+        }
+    finally:
+        db.close()
+
+    with TestClient(app_main.app) as client:
+        results = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "repeat": args.repeat,
+                "dataset": dataset,
+            },
+            "results": run(client, {database.engine, database.read_engine}, cases, args.repeat),
+        }
+
+    missing = uncovered_routes(app_main.app, cases, args.writes)
+    if missing:
+        print("\nNo benchmark case for: " + ", ".join(missing))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Lifetime profit computed inline vs on the process pool with 1..N workers.
+
+Usage (from the goods-distributor-app directory):
+    python benchmarks/generate_dataset.py --db profit.db --days 1825
+    python benchmarks/bench_profit.py --db profit.db --max-workers 4
+
+Every run must produce the same totals; the pool start-up is excluded (warm-up call).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+
+def timed(fn, repeat: int) -> tuple:
+    result = fn() # warm-up (starts the pool)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="profit.db", help="Dataset created by generate_dataset.py")
+    parser.add_argument("--url", help="SQLAlchemy database URL, overrides --db")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.url or f"sqlite:///{os.path.abspath(args.db)}"
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy import func
+    import database, models, profit
+
+    db = database.ReadSessionLocal()
+    try:
+        first, last = db.query(func.min(models.DailySale.date), func.max(models.DailySale.date)).one()
+        if first is None:
+            sys.exit("The dataset has no sales")
+        months = len(profit._month_starts(first, last))
+        print(f"{first} .. {last}: {months} months, {db.query(models.SaleItem).count():,} sale items\n")
+
+        expected, inline_ms = timed(lambda: profit.totals(db, first, last, parallel=False), args.repeat)
+        print(f"{'inline':<12} {inline_ms:>9.1f} ms")
+
+        for workers in range(1, args.max_workers + 1):
+            profit.shutdown()
+            profit.PROFIT_WORKERS = workers
+            totals, pool_ms = timed(lambda: profit.totals(db, first, last, parallel=True), args.repeat)
+            same = all(abs(a - b) <= 1e-6 * max(1.0, abs(a)) for a, b in zip(expected, totals))
+            print(f"{f'{workers} worker(s)':<12} {pool_ms:>9.1f} ms  x{inline_ms / pool_ms:>5.2f}"
+                  f"{'' if same else '  TOTALS DIFFER'}")
+    finally:
+        profit.shutdown()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
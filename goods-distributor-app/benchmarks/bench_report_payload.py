@@ -0,0 +1,96 @@
+"""
+Serialization time and bytes-on-wire for a large /reports/monthly payload.
+
+Builds a 31-day month with 150 sale lines per day (the shape returned by
+/reports/monthly/{group_id}), then compares stdlib json against orjson and
+raw vs GZip vs Brotli sizes.
+
+Usage (from the goods-distributor-app directory):
+    python benchmarks/bench_report_payload.py [--days 31] [--lines 150] [--repeat 20]
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+import schemas
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_report(days: int, lines: int) -> schemas.MonthlyReportResponse:
+    product = schemas.ProductResponse(
+        id=1, group_id=1, name="Mango Juice 250ml", weight_type="ml", weight_value=250,
+        quantity_type="Cartoon", quantity_value=40, pieces_per_quantity=24, pieces_quantity=6,
+        buy_price_avg=18.5, sell_price_per_type=520.0, sell_price_per_piece=22.0
+    )
+    sales = []
+    for day in range(1, days + 1):
+        items = [
+            schemas.SaleItemResponse(
+                id=day * 1000 + line, product_id=line, product=product,
+                request_type_qty=5, request_piece_qty=3, return_type_qty=1, return_piece_qty=2,
+                sold_type_qty=4, sold_piece_qty=1, price=2102.0 + line
+            )
+            for line in range(lines)
+        ]
+        sales.append(schemas.DailySaleResponse(
+            id=day, group_id=1, date=date(2026, 1, day), cash_received=300000.0,
+            total_amount=315000.0, due=15000.0, commission=12000.0, status="completed", is_locked=1,
+            sale_items=items,
+            remarks=[schemas.SaleRemarkResponse(comment="Shop credit", amount=3000.0)]
+        ))
+    return schemas.MonthlyReportResponse(sales=sales, total_sales=315000.0 * days)
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--lines", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    report = build_report(args.days, args.lines)
+    # What FastAPI hands to the response class after response_model validation
+    content = report.model_dump(mode="json")
+
+    print(f"Payload: {args.days} days x {args.lines} lines ({args.days * args.lines} sale items)")
+
+    stdlib_time, stdlib_body = timed(lambda: JSONResponse(content).body, args.repeat)
+    orjson_time, orjson_body = timed(lambda: ORJSONResponse(content).body, args.repeat)
+    print(f"stdlib json render: {stdlib_time * 1000:8.2f} ms  {len(stdlib_body):>10,} bytes")
+    print(f"orjson render:      {orjson_time * 1000:8.2f} ms  {len(orjson_body):>10,} bytes "
+          f"({stdlib_time / orjson_time:.1f}x faster)")
+
+    gzip_time, gzip_body = timed(lambda: gzip.compress(orjson_body, compresslevel=6), args.repeat)
+    print(f"gzip (level 6):     {gzip_time * 1000:8.2f} ms  {len(gzip_body):>10,} bytes "
+          f"({len(orjson_body) / len(gzip_body):.1f}x smaller)")
+
+    if brotli is not None:
+        br_time, br_body = timed(lambda: brotli.compress(orjson_body, quality=4), args.repeat)
+        print(f"brotli (quality 4): {br_time * 1000:8.2f} ms  {len(br_body):>10,} bytes "
+              f"({len(orjson_body) / len(br_body):.1f}x smaller)")
+    else:
+        print("brotli: not installed, skipped")
+
+
+if __name__ == "__main__":
+    main()
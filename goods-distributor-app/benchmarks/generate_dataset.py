@@ -0,0 +1,263 @@
+"""
+Deterministic synthetic dataset for benchmarks.
+
+Creates groups, products, one daily sale per group per day with N sale lines,
+remarks, commission/remark payments, product-taken items, expenses and monthly
+targets. The same --seed always produces the same database.
+
+Usage (from the goods-distributor-app directory):
+    python benchmarks/generate_dataset.py --db bench.db --groups 5 --products-per-group 40 \
+        --days 730 --lines-per-sale 30 --seed 42
+
+Size: groups x days x lines-per-sale sale_items (defaults: 5 x 730 x 30 = 109,500).
+Sales end today unless --start is given; pass --start too for byte-identical reruns.
+The target database is dropped and recreated.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+CHUNK_SIZE = 50000
+
+QUANTITY_TYPES = [("Cartoon", 24), ("Dozon", 12), ("Poly", 50), ("Box", 10)]
+WEIGHTS = [("g", 250), ("g", 500), ("kg", 1), ("ml", 250), ("L", 1)]
+REMARK_COMMENTS = ["Shop credit", "Damaged goods", "Advance", "Short cash", "Route expense"]
+EXPENSE_DESCRIPTIONS = ["Fuel", "Van rent", "Labour", "Electricity", "Snacks"]
+
+
+def _flush(conn, table, rows):
+    if rows:
+        conn.execute(table.insert(), rows)
+        rows.clear()
+
+
+def generate(db_url: str, groups: int = 5, products_per_group: int = 40, days: int = 730,
+             lines_per_sale: int = 30, payments_per_month: int = 2, seed: int = 42,
+             start: date = None, draft_days: int = 1) -> dict:
+    """
+    Fill `db_url` (schema created from the models) with a reproducible dataset.
+    The last `draft_days` days are left unlocked like a live "today".
+    Returns row counts.
+    """
+    os.environ["DATABASE_URL"] = db_url
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import database, models, balances, rollups, db_init
+
+    rng = random.Random(seed)
+    start = start or date.today() - timedelta(days=days - 1)
+    engine = database.engine
+
+    database.Base.metadata.drop_all(bind=engine)
+    db_init.init_db()
+
+    counts = {}
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+
+        # Groups and products
+        group_rows = [{"id": g, "name": f"SR Group {g}"} for g in range(1, groups + 1)]
+        conn.execute(models.Group.__table__.insert(), group_rows)
+
+        products = []
+        product_id = 0
+        for g in range(1, groups + 1):
+            for p in range(products_per_group):
+                product_id += 1
+                quantity_type, pieces_per_quantity = rng.choice(QUANTITY_TYPES)
+                weight_type, weight_value = rng.choice(WEIGHTS)
+                buy_price_avg = round(rng.uniform(5, 200), 2)
+                sell_price_per_piece = round(buy_price_avg * rng.uniform(1.05, 1.3), 2)
+                products.append({
+                    "id": product_id,
+                    "group_id": g,
+                    "name": f"Product {g}-{p + 1}",
+                    "weight_type": weight_type,
+                    "weight_value": weight_value,
+                    "quantity_type": quantity_type,
+                    "quantity_value": rng.randint(100, 1000),
+                    "pieces_per_quantity": pieces_per_quantity,
+                    "pieces_quantity": rng.randint(0, pieces_per_quantity - 1),
+                    "buy_price_avg": buy_price_avg,
+                    "sell_price_per_type": round(sell_price_per_piece * pieces_per_quantity * 0.97, 2),
+                    "sell_price_per_piece": sell_price_per_piece,
+                })
+        conn.execute(models.Product.__table__.insert(), products)
+        products_by_group = {g: [p for p in products if p["group_id"] == g] for g in range(1, groups + 1)}
+
+        # Daily sales, items and remarks
+        sales, items, remarks = [], [], []
+        sale_id = item_id = remark_id = 0
+        counts.update(daily_sales=0, sale_items=0, sale_remarks=0)
+        for day_index in range(days):
+            day = start + timedelta(days=day_index)
+            locked = day_index < days - draft_days
+            for g in range(1, groups + 1):
+                sale_id += 1
+                total_amount = 0.0
+                lines = rng.sample(products_by_group[g], min(lines_per_sale, len(products_by_group[g])))
+                if lines_per_sale > len(lines):
+                    lines += [rng.choice(products_by_group[g]) for _ in range(lines_per_sale - len(lines))]
+                for product in lines:
+                    item_id += 1
+                    ppq = product["pieces_per_quantity"]
+                    request_total = rng.randint(ppq, ppq * 6)
+                    return_total = rng.randint(0, request_total // 5)
+                    sold_total = request_total - return_total
+                    sold_type_qty, sold_piece_qty = divmod(sold_total, ppq)
+                    price = sold_type_qty * product["sell_price_per_type"] + sold_piece_qty * product["sell_price_per_piece"]
+                    total_amount += price
+                    items.append({
+                        "id": item_id,
+                        "daily_sale_id": sale_id,
+                        "product_id": product["id"],
+                        "request_type_qty": request_total // ppq,
+                        "request_piece_qty": request_total % ppq,
+                        "return_type_qty": return_total // ppq,
+                        "return_piece_qty": return_total % ppq,
+                        "sold_type_qty": sold_type_qty,
+                        "sold_piece_qty": sold_piece_qty,
+                        "price": price,
+                    })
+
+                remarks_total = 0.0
+                for _ in range(rng.choice([0, 0, 1, 1, 2])):
+                    remark_id += 1
+                    amount = round(rng.uniform(50, 2000), 2)
+                    paid = rng.choice([0.0, 0.0, amount, round(amount / 2, 2)]) if locked else 0.0
+                    remarks_total += amount
+                    remarks.append({
+                        "id": remark_id,
+                        "daily_sale_id": sale_id,
+                        "comment": rng.choice(REMARK_COMMENTS),
+                        "amount": amount,
+                        "paid_amount": paid,
+                        "is_fully_paid": 1 if paid >= amount else 0,
+                    })
+
+                cash_received = round(total_amount * rng.uniform(0.9, 0.99), 2)
+                due = total_amount - cash_received - remarks_total
+                sales.append({
+                    "id": sale_id,
+                    "group_id": g,
+                    "date": day,
+                    "year_month": models.year_month(day), # Core inserts skip the ORM hook that sets it
+                    "total_amount": total_amount,
+                    "cash_received": cash_received,
+                    "due": due,
+                    "commission": due,
+                    "status": "completed" if locked else "draft",
+                    "is_locked": 1 if locked else 0,
+                })
+
+                if len(items) >= CHUNK_SIZE:
+                    _flush(conn, models.DailySale.__table__, sales)
+                    counts["sale_items"] += len(items)
+                    _flush(conn, models.SaleItem.__table__, items)
+                    counts["sale_remarks"] += len(remarks)
+                    _flush(conn, models.SaleRemark.__table__, remarks)
+
+        _flush(conn, models.DailySale.__table__, sales)
+        counts["sale_items"] += len(items)
+        _flush(conn, models.SaleItem.__table__, items)
+        counts["sale_remarks"] += len(remarks)
+        _flush(conn, models.SaleRemark.__table__, remarks)
+        counts["daily_sales"] = sale_id
+
+        # Payments, product taken, expenses and targets
+        payments, taken, expenses, targets = [], [], [], []
+        month_starts = sorted({(start + timedelta(days=d)).replace(day=1) for d in range(days)})
+        for month_start in month_starts:
+            for g in range(1, groups + 1):
+                for _ in range(payments_per_month):
+                    payments.append({
+                        "group_id": g,
+                        "amount": round(rng.uniform(500, 5000), 2),
+                        "payment_type": rng.choice(["commission", "remark"]),
+                        "date": month_start + timedelta(days=rng.randint(0, 27)),
+                    })
+                product = rng.choice(products_by_group[g])
+                total_price = round(rng.uniform(500, 5000), 2)
+                paid_amount = rng.choice([0.0, total_price, round(total_price / 3, 2)])
+                taken.append({
+                    "group_id": g,
+                    "product_id": product["id"],
+                    "product_name": product["name"],
+                    "quantity": rng.randint(1, 5),
+                    "pieces": 0,
+                    "total_price": total_price,
+                    "paid_amount": paid_amount,
+                    "date": month_start + timedelta(days=rng.randint(0, 27)),
+                    "is_fully_paid": 1 if paid_amount >= total_price else 0,
+                })
+                targets.append({
+                    "group_id": g,
+                    "month": month_start.strftime("%Y-%m"),
+                    "year_month": models.year_month(month_start),
+                    "target_amount": round(rng.uniform(1e5, 1e6), -3),
+                })
+        for day_index in range(days):
+            if rng.random() < 0.6:
+                expenses.append({
+                    "date": start + timedelta(days=day_index),
+                    "year_month": models.year_month(start + timedelta(days=day_index)),
+                    "description": rng.choice(EXPENSE_DESCRIPTIONS),
+                    "amount": round(rng.uniform(100, 3000), 2),
+                })
+
+        for table, rows, name in [
+            (models.GroupPayment.__table__, payments, "group_payments"),
+            (models.ProductTaken.__table__, taken, "products_taken"),
+            (models.Expense.__table__, expenses, "expenses"),
+            (models.MonthlyTarget.__table__, targets, "monthly_targets"),
+        ]:
+            counts[name] = len(rows)
+            _flush(conn, table, rows)
+
+    # Derived tables the app maintains incrementally
+    db = database.SessionLocal()
+    try:
+        balances.rebuild_all(db)
+        rollups.rebuild(db)
+    finally:
+        db.close()
+
+    counts.update(groups=groups, products=len(products))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench.db", help="SQLite file (or --url for any SQLAlchemy URL)")
+    parser.add_argument("--url", help="SQLAlchemy database URL, overrides --db")
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--products-per-group", type=int, default=40)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--lines-per-sale", type=int, default=30)
+    parser.add_argument("--payments-per-month", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", type=date.fromisoformat, help="First sale date (default: days before today)")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.abspath(args.db)}"
+    if os.path.abspath(args.db) == os.path.abspath(os.path.join(BACKEND_DIR, "goods_distributor.db")) and not args.url:
+        parser.error("refusing to overwrite the application database")
+    began = time.perf_counter()
+    counts = generate(
+        url, groups=args.groups, products_per_group=args.products_per_group, days=args.days,
+        lines_per_sale=args.lines_per_sale, payments_per_month=args.payments_per_month,
+        seed=args.seed, start=args.start
+    )
+    print(f"Generated {url} in {time.perf_counter() - began:.1f}s")
+    for name, count in counts.items():
+        print(f"  {name:<16} {count:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+Load-test scenario modelling a distributor's working day, for capacity planning.
+
+Phases, run against a live uvicorn server with dashboard pollers active throughout:
+  1. Morning stock intake   - concurrent PUT /products/{id}/add batches
+  2. SR autosaves           - every SR saves today's sale repeatedly (POST /sales/today)
+  3. Evening lock           - all SRs lock at once (POST /sales/{id}/lock)
+  4. Due payments           - concurrent commission payments (POST /total-due/{id}/pay-generic)
+
+Reports throughput, p50/p95/p99 latency per operation, SQLite busy errors and
+lost-update checks (stock, ledger and duplicate-sale consistency after each phase).
+Every run works on freshly created groups, so it can be repeated against the same server.
+
+Usage (from the goods-distributor-app directory):
+    # Start uvicorn on a benchmark database, run, stop it again
+    python benchmarks/load_scenario.py --spawn --db bench.db --srs 20 --products 15
+    # Or target a server that is already running
+    python benchmarks/load_scenario.py --url http://127.0.0.1:8000
+
+tests/verify_backend.py stays the serial functional smoke test; use this for load.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import date
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+PIECES_PER_QUANTITY = 12
+SELL_PRICE_PER_TYPE = 1200
+SELL_PRICE_PER_PIECE = 110
+CASH_RECEIVED = 1000
+REMARK_AMOUNT = 10
+PAYMENT_AMOUNT = 1.0
+
+# SQLite lock contention surfaces as this message in the server log (and a 500)
+BUSY_MARKERS = ("database is locked", "database table is locked")
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.failures = defaultdict(list)
+
+    async def call(self, client: httpx.AsyncClient, op: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.latencies[op].append((time.perf_counter() - start) * 1000)
+            self.statuses[op][type(e).__name__] += 1
+            self.failures[op].append(repr(e))
+            return None
+        self.latencies[op].append((time.perf_counter() - start) * 1000)
+        self.statuses[op][response.status_code] += 1
+        if response.status_code >= 400:
+            self.failures[op].append(f"{response.status_code} {response.text[:200]}")
+        return response
+
+    def summary(self, wall_seconds: float) -> dict:
+        ops = {}
+        for op, timings in self.latencies.items():
+            statuses = self.statuses[op]
+            ok = sum(n for s, n in statuses.items() if isinstance(s, int) and s < 400)
+            ops[op] = {
+                "requests": len(timings),
+                "errors": len(timings) - ok,
+                "statuses": {str(s): n for s, n in statuses.items()},
+                "throughput_rps": round(len(timings) / wall_seconds, 2) if wall_seconds else 0.0,
+                "p50_ms": round(percentile(timings, 50), 2),
+                "p95_ms": round(percentile(timings, 95), 2),
+                "p99_ms": round(percentile(timings, 99), 2),
+                "max_ms": round(max(timings), 2),
+            }
+        return ops
+
+
+class Checks:
+    def __init__(self):
+        self.results = []
+
+    def expect(self, name: str, ok: bool, detail: str = ""):
+        self.results.append({"check": name, "ok": bool(ok), "detail": detail})
+
+
+async def setup(client, recorder, run_id: str, srs: int, products: int) -> list:
+    """Create one group per SR, each with `products` empty products."""
+    groups = []
+    for i in range(srs):
+        response = await recorder.call(client, "setup", "POST", "/groups/", json={"name": f"Load SR {run_id}-{i + 1}"})
+        response.raise_for_status()
+        group = {"id": response.json()["id"], "products": []}
+        for p in range(products):
+            response = await recorder.call(client, "setup", "POST", "/products/", json={
+                "group_id": group["id"],
+                "name": f"Load Product {run_id}-{i + 1}-{p + 1}",
+                "weight_type": "g",
+                "weight_value": 500,
+                "quantity_type": "Dozon",
+                "quantity_value": 0,
+                "pieces_per_quantity": PIECES_PER_QUANTITY,
+                "pieces_quantity": 0,
+                "buy_price_avg": 0,
+                "sell_price_per_type": SELL_PRICE_PER_TYPE,
+                "sell_price_per_piece": SELL_PRICE_PER_PIECE,
+            })
+            response.raise_for_status()
+            group["products"].append(response.json()["id"])
+        groups.append(group)
+    return groups
+
+
+async def product_stock(client, groups: list) -> dict:
+    """product id -> stock in pieces."""
+    stock = {}
+    for group in groups:
+        response = await client.get(f"/products/group/{group['id']}")
+        for p in response.json():
+            stock[p["id"]] = p["quantity_value"] * p["pieces_per_quantity"] + p["pieces_quantity"]
+    return stock
+
+
+async def phase_intake(client, recorder, checks, groups, batches: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def add(product_id):
+        async with semaphore:
+            await recorder.call(client, "stock intake", "PUT", f"/products/{product_id}/add", json={
+                "quantity_value": 1,
+                "pieces_quantity": 0,
+                "buy_price_total": 1000,
+                "sell_price_per_type": SELL_PRICE_PER_TYPE,
+                "sell_price_per_piece": SELL_PRICE_PER_PIECE,
+            })
+
+    jobs = [add(pid) for group in groups for pid in group["products"] for _ in range(batches)]
+    random.shuffle(jobs)
+    await asyncio.gather(*jobs)
+
+    stock = await product_stock(client, groups)
+    expected = batches * PIECES_PER_QUANTITY
+    lost = {pid: s for pid, s in stock.items() if s != expected}
+    checks.expect(
+        "stock intake: no lost updates", not lost,
+        f"{len(lost)}/{len(stock)} products off, e.g. {dict(list(lost.items())[:5])} (expected {expected} pieces each)"
+    )
+    return stock
+
+
+async def phase_autosave(client, recorder, checks, groups, autosaves: int):
+    today = str(date.today())
+
+    async def sr_day(group):
+        # The form grows line by line; each autosave posts the whole form
+        products = group["products"]
+        response = None
+        for n in range(1, autosaves + 1):
+            lines = products[:max(1, round(len(products) * n / autosaves))]
+            response = await recorder.call(client, "autosave", "POST", "/sales/today", json={
+                "group_id": group["id"],
+                "date": today,
+                "cash_received": CASH_RECEIVED,
+                "status": "draft",
+                "sale_items": [
+                    {"product_id": pid, "request_type_qty": 1, "request_piece_qty": 0,
+                     "return_type_qty": 0, "return_piece_qty": 0}
+                    for pid in lines
+                ],
+                "remarks": [{"comment": "load test", "amount": REMARK_AMOUNT}],
+            })
+            await asyncio.sleep(random.uniform(0, 0.05))
+        group["sale_id"] = response.json()["id"] if response is not None and response.status_code == 200 else None
+
+    await asyncio.gather(*(sr_day(g) for g in groups))
+
+    missing = [g["id"] for g in groups if not g.get("sale_id")]
+    checks.expect("autosave: every SR has a saved sale", not missing, f"groups without a sale: {missing}")
+
+    today_date = date.today()
+    duplicates = []
+    for group in groups:
+        response = await client.get(f"/reports/monthly/{group['id']}",
+                                    params={"month": today_date.month, "year": today_date.year, "fields": "date"})
+        days = [row["date"] for row in response.json().get("sales", [])]
+        if days.count(today) > 1:
+            duplicates.append(group["id"])
+    checks.expect("autosave: one sale per group and day", not duplicates, f"duplicated in groups {duplicates}")
+
+
+async def phase_lock(client, recorder, checks, groups, stock_before: dict):
+    async def lock(group):
+        if group.get("sale_id"):
+            await recorder.call(client, "lock", "POST", f"/sales/{group['sale_id']}/lock")
+
+    await asyncio.gather(*(lock(g) for g in groups))
+
+    stock = await product_stock(client, groups)
+    expected = {pid: s - PIECES_PER_QUANTITY for pid, s in stock_before.items()}
+    off = {pid: (stock.get(pid), e) for pid, e in expected.items() if stock.get(pid) != e}
+    checks.expect("lock: stock reduced by exactly the sold quantity", not off,
+                  f"{len(off)} products off, e.g. {dict(list(off.items())[:5])} (actual, expected)")
+
+
+async def phase_payments(client, recorder, checks, groups, payments: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def pay(group):
+        async with semaphore:
+            await recorder.call(client, "payment", "POST", f"/total-due/{group['id']}/pay-generic", json={
+                "group_id": group["id"], "amount": PAYMENT_AMOUNT, "payment_type": "commission",
+            })
+
+    jobs = [pay(g) for g in groups for _ in range(payments)]
+    random.shuffle(jobs)
+    await asyncio.gather(*jobs)
+
+    ledger_off, paid_off = [], []
+    for group in groups:
+        commissions = (await client.get(f"/total-due/{group['id']}/commissions")).json()
+        remarks = (await client.get(f"/total-due/{group['id']}/remarks")).json()
+        item_total = sum(i["amount"] for i in commissions["items"])
+        remark_total = sum(i["amount"] for i in remarks["items"])
+        if abs(commissions["total_commission"] - item_total) > 0.01 or abs(remarks["total_remarks"] - remark_total) > 0.01:
+            ledger_off.append(group["id"])
+        if abs(commissions["paid_commission"] - payments * PAYMENT_AMOUNT) > 0.01:
+            paid_off.append((group["id"], commissions["paid_commission"]))
+    checks.expect("ledger: balance totals match sale history", not ledger_off, f"groups {ledger_off}")
+    checks.expect("payments: no lost updates", not paid_off,
+                  f"(group, paid) {paid_off[:5]} (expected {payments * PAYMENT_AMOUNT} each)")
+
+
+async def poll_dashboard(client, recorder, stop: asyncio.Event, interval: float):
+    await asyncio.sleep(random.uniform(0, interval))
+    while not stop.is_set():
+        await recorder.call(client, "dashboard poll", "GET", "/reports/dashboard")
+        await recorder.call(client, "dues poll", "GET", "/total-due/groups")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def scenario(args) -> dict:
+    run_id = f"{int(time.time()) % 100000:05d}"
+    recorder, checks = Recorder(), Checks()
+    limits = httpx.Limits(max_connections=args.concurrency + args.pollers + args.srs)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        groups = await setup(client, recorder, run_id, args.srs, args.products)
+
+        stop = asyncio.Event()
+        pollers = [asyncio.create_task(poll_dashboard(client, recorder, stop, args.poll_interval))
+                   for _ in range(args.pollers)]
+
+        phases = {}
+        began = time.perf_counter()
+        start = time.perf_counter()
+        stock = await phase_intake(client, recorder, checks, groups, args.intake_batches, args.concurrency)
+        phases["intake"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await phase_autosave(client, recorder, checks, groups, args.autosaves)
+        phases["autosave"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await phase_lock(client, recorder, checks, groups, stock)
+        phases["lock"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await phase_payments(client, recorder, checks, groups, args.payments, args.concurrency)
+        phases["payments"] = time.perf_counter() - start
+
+        stop.set()
+        await asyncio.gather(*pollers)
+        wall = time.perf_counter() - began
+
+    recorder.latencies.pop("setup", None)
+    ops = recorder.summary(wall)
+    return {
+        "run_id": run_id,
+        "wall_seconds": round(wall, 3),
+        "phase_seconds": {k: round(v, 3) for k, v in phases.items()},
+        "total_requests": sum(o["requests"] for o in ops.values()),
+        "throughput_rps": round(sum(o["requests"] for o in ops.values()) / wall, 2),
+        "operations": ops,
+        "checks": checks.results,
+        "failures": {op: msgs[:5] for op, msgs in recorder.failures.items() if op != "setup"},
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(args, log_path: str):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=args.db_url or f"sqlite:///{os.path.abspath(args.db)}")
+    # Every simulated client shares one IP; measure capacity, not the rate limiter (RATE_LIMIT=1 to include it)
+    env.setdefault("RATE_LIMIT", "0")
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    if args.workers > 1:
+        command += ["--workers", str(args.workers)]
+    log = open(log_path, "w")
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"uvicorn exited early, see {log_path}")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return process, log, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"uvicorn did not start within 30s, see {log_path}")
+
+
+def count_busy_errors(log_path: str) -> int:
+    with open(log_path, errors="replace") as f:
+        return sum(1 for line in f if any(marker in line for marker in BUSY_MARKERS))
+
+
+def print_report(report: dict):
+    print(f"\nRun {report['run_id']}: {report['total_requests']} requests in {report['wall_seconds']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s)")
+    print("Phases: " + ", ".join(f"{k} {v:.2f}s" for k, v in report["phase_seconds"].items()))
+    print(f"\n{'operation':<16} {'requests':>8} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for op, o in report["operations"].items():
+        print(f"{op:<16} {o['requests']:>8} {o['errors']:>7} {o['throughput_rps']:>8.1f} "
+              f"{o['p50_ms']:>9.1f} {o['p95_ms']:>9.1f} {o['p99_ms']:>9.1f} {o['max_ms']:>9.1f}")
+    if report.get("busy_errors") is not None:
+        print(f"\nSQLite busy errors in server log: {report['busy_errors']}")
+    print("\nChecks:")
+    for check in report["checks"]:
+        print(f"  [{'PASS' if check['ok'] else 'FAIL'}] {check['check']}" + ("" if check["ok"] else f" - {check['detail']}"))
+    for op, messages in report["failures"].items():
+        print(f"\nFirst errors for {op}:")
+        for message in messages:
+            print(f"  {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Running server (ignored with --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="Start uvicorn for the run and stop it afterwards")
+    parser.add_argument("--db", default="bench.db", help="SQLite file for --spawn (e.g. from generate_dataset.py)")
+    parser.add_argument("--db-url", help="SQLAlchemy database URL for --spawn, overrides --db")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn")
+    parser.add_argument("--srs", type=int, default=10, help="Concurrent sales representatives (groups)")
+    parser.add_argument("--products", type=int, default=10, help="Products per SR")
+    parser.add_argument("--intake-batches", type=int, default=5, help="Stock additions per product")
+    parser.add_argument("--autosaves", type=int, default=10, help="Autosaves per SR before locking")
+    parser.add_argument("--payments", type=int, default=10, help="Commission payments per SR")
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight intake/payment requests")
+    parser.add_argument("--pollers", type=int, default=5, help="Dashboards polling throughout the run")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the report as JSON here")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    process = log = log_path = None
+    if args.spawn:
+        log_path = os.path.abspath("load_scenario_server.log")
+        process, log, args.url = spawn_server(args, log_path)
+    try:
+        report = asyncio.run(scenario(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+            log.close()
+
+    report["busy_errors"] = count_busy_errors(log_path) if log_path else None
+    print_report(report)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    sys.exit(1 if any(not c["ok"] for c in report["checks"]) else 0)
+
+
+if __name__ == "__main__":
+    main()
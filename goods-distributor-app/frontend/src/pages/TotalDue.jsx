@@ -50,7 +50,7 @@ const TotalDue = () => {
                     items: res.data.items
                 });
             } else if (tab === 'remarks') {
-                const res = await api.get(`/total-due/${groupId}/remarks`);
+                const res = await api.get(`/total-due/${groupId}/remarks?unpaid=true`);
                 setRemarks({
                     total: res.data.total_remarks,
                     paid: res.data.paid_remarks,
@@ -44,18 +44,15 @@ def reset_and_seed():
         
         # 3. Add Commissions (via DailySale)
         print("Adding sample commissions...")
-        # Check if sale exists for today, else create
-        cursor.execute("SELECT id FROM daily_sales WHERE group_id = ? AND date = ?", (group_id, today))
-        sale = cursor.fetchone()
-        
-        if sale:
-            sale_id = sale[0]
-            # Set a Commission
-            cursor.execute("UPDATE daily_sales SET commission = 1000 WHERE id = ?", (sale_id,))
-        else:
-            # Create a dummy sale for commission
-            cursor.execute("INSERT INTO daily_sales (group_id, date, total_amount, commission, due, status, is_locked) VALUES (?, ?, 5000, 1000, 4000, 'completed', 0)", (group_id, today))
-            sale_id = cursor.lastrowid
+        # Create a dummy sale for today, or set the commission on the existing one (one sale per group and day)
+        # year_month is the monthly grouping key the reports filter on (set by the ORM in the app)
+        cursor.execute("""
+            INSERT INTO daily_sales (group_id, date, year_month, total_amount, commission, due, status, is_locked)
+            VALUES (?, ?, ?, 5000, 1000, 4000, 'completed', 0)
+            ON CONFLICT (group_id, date) DO UPDATE SET commission = excluded.commission
+            RETURNING id
+        """, (group_id, today, today.year * 100 + today.month))
+        sale_id = cursor.fetchone()[0]
             
         # 4. Add Remarks
         print("Adding sample remarks...")
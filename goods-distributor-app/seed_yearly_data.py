@@ -38,12 +38,19 @@ def seed_yearly_data(year=2026, group_id=2):
             cash_received = total_amount
             due = 0
             
+            # year_month is the monthly grouping key the reports filter on (set by the ORM in the app).
+            # One sale per group and day (unique index): a day that already has one is left alone
             cursor.execute("""
-                INSERT INTO daily_sales (group_id, date, total_amount, cash_received, due, commission, status, is_locked)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (group_id, sale_date, total_amount, cash_received, due, 0, 'completed', 1))
+                INSERT INTO daily_sales (group_id, date, year_month, total_amount, cash_received, due, commission, status, is_locked)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (group_id, date) DO NOTHING
+                RETURNING id
+            """, (group_id, sale_date, year * 100 + month, total_amount, cash_received, due, 0, 'completed', 1))
+            row = cursor.fetchone()
+            if row is None:
+                continue
             
-            sale_id = cursor.lastrowid
+            sale_id = row[0]
             
             # If we have products, add a dummy sale_item to make Profit Calc work too
             if products:
@@ -0,0 +1,77 @@
+"""
+Shared fixtures: the API runs in-process (TestClient) against a throwaway SQLite file
+whose schema is dropped and recreated for every test, with the N+1 detector raising.
+"""
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# Must be set before the backend is imported: database.py reads it at import time
+_db_dir = tempfile.mkdtemp(prefix="goods-distributor-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_db_dir, "test.db")
+os.environ["RATE_LIMIT"] = "0"
+os.environ["PROFIT_WORKERS"] = "1"
+# N+1 detector (query_debug.py) on, raising: a lazy load in a loop fails the test that hits it
+os.environ["QUERY_DEBUG"] = "1"
+os.environ["QUERY_DEBUG_RAISE"] = "1"
+sys.path.insert(0, BACKEND_DIR)
+
+PRODUCT = {
+    "name": "Soap",
+    "weight_type": "g",
+    "weight_value": 100,
+    "quantity_type": "Cartoon",
+    "quantity_value": 50,
+    "pieces_per_quantity": 10,
+    "pieces_quantity": 0,
+    "buy_price_avg": 80,
+    "sell_price_per_type": 100,
+    "sell_price_per_piece": 10,
+}
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    import database, main
+
+    # The app's startup (db_init) creates everything again
+    database.Base.metadata.drop_all(bind=database.engine)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db(client):
+    import database
+
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def group(client):
+    """An SR group with one product in stock: {"id", "product_id"}."""
+    group_id = client.post("/groups/", json={"name": "SR Group 1"}).json()["id"]
+    product = client.post("/products/", json=dict(PRODUCT, group_id=group_id)).json()
+    return {"id": group_id, "product_id": product["id"]}
+
+
+def sale_payload(group: dict, day: str, cartons: int, cash: float, remarks=(), status: str = "draft") -> dict:
+    """POST /sales/today body selling `cartons` of the group's product (100 each)."""
+    return {
+        "group_id": group["id"],
+        "date": day,
+        "cash_received": cash,
+        "status": status,
+        "sale_items": [{
+            "product_id": group["product_id"],
+            "request_type_qty": cartons, "request_piece_qty": 0,
+            "return_type_qty": 0, "return_piece_qty": 0,
+        }],
+        "remarks": [{"comment": f"remark {i}", "amount": amount} for i, amount in enumerate(remarks)],
+    }
@@ -0,0 +1,101 @@
+"""
+Admission control (admission.py): token buckets per client and route class, and the cap
+on expensive reports running at once. conftest turns it off; these tests turn it back on.
+
+    python -m pytest tests/test_admission.py -q
+"""
+from collections import OrderedDict, defaultdict
+import pytest
+
+BURST = 3
+
+
+@pytest.fixture
+def admission(client, monkeypatch):
+    """Admission on with a 3-request burst for reads (refilled too slowly to matter) and fresh state."""
+    import admission
+
+    monkeypatch.setattr(admission, "RATE_LIMIT", True)
+    monkeypatch.setattr(admission, "RATE_LIMITS", {
+        "read": (0.01, BURST),
+        "write": (100.0, 100),
+        "expensive": (100.0, 100),
+    })
+    monkeypatch.setattr(admission, "MAX_CONCURRENT_EXPENSIVE", 1)
+    monkeypatch.setattr(admission, "_buckets", OrderedDict())
+    monkeypatch.setattr(admission, "_counters", defaultdict(lambda: {"allowed": 0, "rate_limited": 0, "shed": 0}))
+    monkeypatch.setattr(admission, "_in_flight", 0)
+    return admission
+
+
+def bearer(username: str, role: str) -> dict:
+    from routers import auth
+
+    return {"Authorization": "Bearer " + auth.create_access_token({"sub": username, "role": role})}
+
+
+def test_burst_past_the_bucket_gets_429(client, admission):
+    for _ in range(BURST):
+        assert client.get("/groups/").status_code == 200
+
+    refused = client.get("/groups/")
+    assert refused.status_code == 429
+    # One token at 0.01/s: 100 s away
+    assert refused.headers["retry-after"] == "100"
+    # Monitoring is exempt
+    assert client.get("/metrics/admission").status_code == 200
+
+
+def test_buckets_are_per_user_then_per_ip(client, admission):
+    admin, guest = bearer("admin", "admin"), bearer("guest", "sr")
+    for _ in range(BURST):
+        assert client.get("/groups/", headers=admin).status_code == 200
+    assert client.get("/groups/", headers=admin).status_code == 429
+
+    # Another user, and requests without a (valid) token, have buckets of their own
+    assert client.get("/groups/", headers=guest).status_code == 200
+    for _ in range(BURST):
+        assert client.get("/groups/", headers={"Authorization": "Bearer not-a-token"}).status_code == 200
+    assert client.get("/groups/").status_code == 429
+
+    assert {key for key, _ in admission._buckets} == {"user:admin", "user:guest", "ip:testclient"}
+
+
+def test_expensive_cap_sheds_and_releases_after_errors(client, admission, monkeypatch):
+    import profit
+
+    monkeypatch.setattr(admission, "_in_flight", 1) # another report is running
+    shed = client.get("/reports/profit/by-group")
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "1"
+    monkeypatch.setattr(admission, "_in_flight", 0)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("report failed")
+
+    breakdown = profit.breakdown
+    monkeypatch.setattr(profit, "breakdown", broken)
+    with pytest.raises(RuntimeError):
+        client.get("/reports/profit/by-group")
+    assert admission.stats()["expensive_in_flight"] == 0
+
+    # The failed request gave its slot back (the cap is 1)
+    monkeypatch.setattr(profit, "breakdown", breakdown)
+    assert client.get("/reports/profit/by-group").status_code == 200
+
+
+def test_stats_count_each_outcome(client, admission, monkeypatch):
+    for _ in range(BURST + 2):
+        client.get("/groups/")
+    monkeypatch.setattr(admission, "_in_flight", 1)
+    client.get("/reports/profit/by-group")
+    monkeypatch.setattr(admission, "_in_flight", 0)
+    client.get("/reports/profit/by-group")
+
+    stats = admission.stats()
+    assert stats["classes"] == {
+        "read": {"allowed": BURST, "rate_limited": 2, "shed": 0},
+        "expensive": {"allowed": 1, "rate_limited": 0, "shed": 1},
+    }
+    assert stats["expensive_in_flight"] == 0
+    assert stats["buckets"] == 2
@@ -0,0 +1,51 @@
+"""
+The group_balances ledger must always equal a full recomputation from history.
+
+    python -m pytest tests/test_balances.py -q
+"""
+from conftest import sale_payload
+
+
+def total_due(client, group_id: int) -> float:
+    return next(g["total_due"] for g in client.get("/total-due/groups").json() if g["id"] == group_id)
+
+
+def test_save_resave_lock_keeps_ledger_consistent(client, db, group):
+    import balances
+
+    # 2 cartons (200) - 50 cash - 30 remark = 120 commission
+    first = client.post("/sales/today", json=sale_payload(group, "2026-03-02", 2, 50, remarks=[30]))
+    assert first.status_code == 200
+    assert first.json()["commission"] == 120
+    assert total_due(client, group["id"]) == 150
+
+    # Re-saving replaces the day: 300 - 100 - 20 = 180, not added on top
+    second = client.post("/sales/today", json=sale_payload(group, "2026-03-02", 3, 100, remarks=[20]))
+    assert second.json()["id"] == first.json()["id"]
+    assert second.json()["commission"] == 180
+    assert total_due(client, group["id"]) == 200
+
+    assert client.post(f"/sales/{second.json()['id']}/lock").status_code == 200
+
+    payment = {"group_id": group["id"], "amount": 40, "payment_type": "commission"}
+    assert client.post(f"/total-due/{group['id']}/pay-generic", json=payment).status_code == 200
+    assert total_due(client, group["id"]) == 160
+
+    assert balances.verify(db) == []
+
+
+def test_verify_reports_drift(client, db, group):
+    import balances, models
+
+    client.post("/sales/today", json=sale_payload(group, "2026-03-02", 2, 50))
+    db.query(models.GroupBalance).filter(models.GroupBalance.group_id == group["id"]).update(
+        {models.GroupBalance.commission_total: 1.0}
+    )
+    db.commit()
+
+    drift = balances.verify(db)
+    assert [entry["group_id"] for entry in drift] == [group["id"]]
+    assert drift[0]["fields"]["commission_total"] == {"stored": 1.0, "expected": 150.0}
+
+    balances.rebuild_all(db)
+    assert balances.verify(db) == []
@@ -0,0 +1,98 @@
+"""
+Settling dues: one lump payment spread oldest first, all-or-nothing. Aging: what is
+still owed, bucketed by how old it is.
+
+    python -m pytest tests/test_dues.py -q
+"""
+from datetime import date, timedelta
+from conftest import sale_payload
+from test_balances import total_due
+
+
+def settle(client, group_id: int, amount: float, plan=None):
+    body = {"amount": amount} if plan is None else {"amount": amount, "plan": plan}
+    return client.post(f"/total-due/{group_id}/settle", json=body)
+
+
+def unpaid_remarks(client, group_id: int) -> list:
+    items = client.get(f"/total-due/{group_id}/remarks?unpaid=true").json()["items"]
+    return sorted(items, key=lambda item: item["id"])
+
+
+def test_settle_pays_commission_then_remarks(client, db, group):
+    import balances
+
+    # 2 cartons (200) - 50 cash - 50 remarks = 100 commission; 150 owed in all
+    sale_id = client.post("/sales/today", json=sale_payload(group, "2026-03-02", 2, 50, remarks=[30, 20])).json()["id"]
+    first, second = unpaid_remarks(client, group["id"])
+
+    response = settle(client, group["id"], 140)
+    assert response.status_code == 200
+    paid = [(a["kind"], a["id"], a["amount"], a["remaining"]) for a in response.json()["allocations"]]
+    # Same day: the commission first, then the remarks in order
+    assert paid == [
+        ("commission", sale_id, 100, 0), ("remark", first["id"], 30, 0), ("remark", second["id"], 10, 10)
+    ]
+    assert response.json()["totals"] == {"commission": 100, "remark": 40, "product_taken": 0}
+    assert response.json()["total_due"] == 10
+
+    assert [(r["id"], r["paid_amount"]) for r in unpaid_remarks(client, group["id"])] == [(second["id"], 10)]
+    assert balances.verify(db) == []
+
+
+def test_settle_more_than_owed_is_rejected(client, db, group):
+    import models
+
+    client.post("/sales/today", json=sale_payload(group, "2026-03-02", 2, 50, remarks=[30]))
+
+    response = settle(client, group["id"], 151)
+    assert response.status_code == 400
+    assert total_due(client, group["id"]) == 150
+    assert db.query(models.GroupPayment).count() == 0
+
+
+def test_settle_conflict_on_concurrent_payment(client, db, group, monkeypatch):
+    import balances, dues
+
+    client.post("/sales/today", json=sale_payload(group, "2026-03-02", 2, 50, remarks=[30]))
+    (remark,) = unpaid_remarks(client, group["id"])
+    plan = [{"kind": "remark", "id": remark["id"]}]
+
+    # Read the dues, then let another payment clear the remark before this one writes
+    stale = dues.outstanding(db, group["id"])
+    assert settle(client, group["id"], 30, plan).status_code == 200
+    monkeypatch.setattr(dues, "outstanding", lambda db, group_id: stale)
+
+    response = settle(client, group["id"], 30, plan)
+    assert response.status_code == 409
+    assert total_due(client, group["id"]) == 120
+    assert balances.verify(db) == []
+
+
+def days_ago(days: int) -> str:
+    return (date.today() - timedelta(days=days)).isoformat()
+
+
+def test_aging_buckets_by_age_in_days(client, group):
+    # Prices are powers of two, so each bucket's sum shows which ages landed in it
+    for days, price in ((0, 1), (30, 2), (31, 4), (60, 8), (90, 16), (91, 32)):
+        taken = {"group_id": group["id"], "product_id": group["product_id"], "quantity": 0, "pieces": 1,
+                 "total_price": price, "date": days_ago(days)}
+        assert client.post("/total-due/product-taken", json=taken).status_code == 200
+
+    response = client.get("/total-due/aging").json()
+    assert response["buckets"] == ["0-7", "8-30", "31-90", "90+"]
+    (aged,) = response["groups"]
+    assert aged["product_taken"] == {"0-7": 1, "8-30": 2, "31-90": 4 + 8 + 16, "90+": 32}
+    assert response["totals"]["product_taken"] == aged["product_taken"]
+
+
+def test_aging_counts_commission_payments_against_the_oldest_days(client, group):
+    # 100 commission on each day (1 carton, no cash); 150 paid clears the older day first
+    for days in (60, 5):
+        client.post("/sales/today", json=sale_payload(group, days_ago(days), 1, 0))
+    payment = {"group_id": group["id"], "amount": 150, "payment_type": "commission"}
+    assert client.post(f"/total-due/{group['id']}/pay-generic", json=payment).status_code == 200
+
+    (aged,) = client.get("/total-due/aging").json()["groups"]
+    assert aged["commission"] == {"0-7": 50, "8-30": 0, "31-90": 0, "90+": 0}
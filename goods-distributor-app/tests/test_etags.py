@@ -0,0 +1,61 @@
+"""
+Conditional GETs: a 304 must not cost a query, and a committed write must change the ETag at once.
+
+    python -m pytest tests/test_etags.py -q
+"""
+from contextlib import contextmanager
+
+
+@contextmanager
+def counted_statements():
+    from sqlalchemy import event
+    import database
+
+    counter = {"statements": 0}
+
+    def _count(*args):
+        counter["statements"] += 1
+
+    engines = {database.engine, database.read_engine}
+    for engine in engines:
+        event.listen(engine, "after_cursor_execute", _count)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, "after_cursor_execute", _count)
+
+
+def test_not_modified_without_a_query(client, group):
+    first = client.get("/total-due/groups")
+    etag = first.headers["etag"]
+
+    with counted_statements() as counter:
+        again = client.get("/total-due/groups", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert counter["statements"] == 0
+
+
+def test_write_changes_etag_immediately(client, group):
+    etag = client.get("/total-due/groups").headers["etag"]
+    assert client.get("/total-due/groups", headers={"If-None-Match": etag}).status_code == 304
+
+    payment = {"group_id": group["id"], "amount": 5, "payment_type": "commission"}
+    assert client.post(f"/total-due/{group['id']}/pay-generic", json=payment).status_code == 200
+
+    changed = client.get("/total-due/groups", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_bump_commits_with_the_session(db):
+    import etags
+
+    before = etags.current("dues")[0]
+    etags.bump("dues", db=db)
+    db.rollback()
+    assert etags.current("dues") == (before,)
+
+    etags.bump("dues", db=db)
+    db.commit()
+    assert etags.current("dues") == (before + 1,)
@@ -0,0 +1,69 @@
+"""
+Job submission from many workers at once: identical jobs are shared and the pending cap holds.
+
+    python -m pytest tests/test_jobs.py -q
+"""
+import threading
+import pytest
+
+
+@pytest.fixture
+def no_runs(client, monkeypatch):
+    """Jobs stay queued: nothing is handed to the executor."""
+    import jobs
+
+    class Executor:
+        def submit(self, fn, *args):
+            pass
+
+    monkeypatch.setattr(jobs, "_get_executor", lambda: Executor())
+
+
+def submit_concurrently(params_list: list) -> list:
+    """jobs.submit from one thread (and session) per params, started together: [job id or exception]."""
+    import database, jobs
+
+    results = [None] * len(params_list)
+    barrier = threading.Barrier(len(params_list))
+
+    def worker(i, params):
+        with database.SessionLocal() as db:
+            barrier.wait()
+            try:
+                results[i] = jobs.submit(db, "export_year", params).id
+            except jobs.JobError as e:
+                results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i, p)) for i, p in enumerate(params_list)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_identical_submissions_share_one_job(no_runs, db):
+    import models
+
+    results = submit_concurrently([{"year": 2026}] * 8)
+    assert len(set(results)) == 1 and isinstance(results[0], int)
+    assert db.query(models.Job).count() == 1
+
+
+def test_pending_cap_is_not_overshot(no_runs, db, monkeypatch):
+    import jobs, models
+
+    monkeypatch.setattr(jobs, "MAX_PENDING_JOBS", 3)
+    results = submit_concurrently([{"year": year} for year in range(2020, 2028)])
+    assert sum(isinstance(r, int) for r in results) == 3
+    assert all(isinstance(r, (int, jobs.JobQueueFull)) for r in results)
+    assert db.query(models.Job).count() == 3
+
+
+def test_finished_job_does_not_block_a_new_one(no_runs, db):
+    import jobs, models
+
+    first = jobs.submit(db, "export_year", {"year": 2026})
+    db.query(models.Job).filter(models.Job.id == first.id).update({models.Job.status: "succeeded"})
+    db.commit()
+    assert jobs.submit(db, "export_year", {"year": 2026}).id != first.id
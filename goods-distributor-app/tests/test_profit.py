@@ -0,0 +1,219 @@
+"""
+Profit engine: the process pool must add up to exactly what the inline queries do, and
+the day/week/month series must put every sale and expense in the right bucket, and the
+per-group / per-product breakdowns must price what was sold.
+
+    python -m pytest tests/test_profit.py -q
+"""
+from datetime import date
+import pytest
+from conftest import PRODUCT
+
+
+@pytest.fixture
+def two_years_of_sales(client, db):
+    """Two groups with their own product, selling on two days of every month of 2024-01..2026-01."""
+    import models
+
+    groups = []
+    for index, price in enumerate((100, 70)):
+        group = models.Group(name=f"Group {index}")
+        db.add(group)
+        db.flush()
+        product = models.Product(**dict(PRODUCT, name=f"Product {index}", sell_price_per_type=price), group_id=group.id)
+        db.add(product)
+        db.flush()
+        groups.append((group.id, product))
+
+    for month in range(25):
+        year, month_index = 2024 + month // 12, month % 12 + 1
+        for day in (1, 28):
+            for group_id, product in groups:
+                cartons = month % 5 + day % 3 + 1
+                sale = models.DailySale(group_id=group_id, date=date(year, month_index, day), is_locked=1)
+                db.add(sale)
+                db.flush()
+                db.add(models.SaleItem(
+                    daily_sale_id=sale.id, product_id=product.id,
+                    request_type_qty=cartons, sold_type_qty=cartons, sold_piece_qty=day % 10,
+                    request_piece_qty=0, return_type_qty=0, return_piece_qty=0,
+                ))
+    db.commit()
+    return [group_id for group_id, _ in groups]
+
+
+@pytest.fixture
+def two_workers(monkeypatch):
+    import profit
+
+    monkeypatch.setattr(profit, "PROFIT_WORKERS", 2)
+    yield profit
+    profit.shutdown()
+
+
+@pytest.mark.parametrize("start, end, by_group", [
+    (date(2024, 1, 1), date(2026, 1, 31), False), # 25 month partitions over 2 workers
+    (date(2024, 3, 1), date(2024, 3, 31), False), # fewer months than workers: split by group
+    (date(2024, 1, 15), date(2025, 6, 15), True), # one group, partial first and last month
+])
+def test_pool_matches_inline(db, two_years_of_sales, two_workers, start, end, by_group):
+    profit = two_workers
+    group_id = two_years_of_sales[1] if by_group else None
+
+    inline = profit.monthly_sums(db, start, end, group_id, parallel=False)
+    pooled = profit.monthly_sums(db, start, end, group_id, parallel=True)
+    assert list(pooled) == list(inline)
+    for month_start, sums in inline.items():
+        assert pooled[month_start] == pytest.approx(sums)
+    assert all(revenue > 0 for revenue, _ in inline.values())
+
+
+def test_pool_only_for_long_ranges(db, two_years_of_sales, two_workers, monkeypatch):
+    profit = two_workers
+    used = []
+    get_pool = profit._get_pool
+    monkeypatch.setattr(profit, "_get_pool", lambda: used.append(1) or get_pool())
+
+    profit.monthly_sums(db, date(2025, 1, 1), date(2025, 12, 31))
+    assert used == []
+    long_range = profit.monthly_sums(db, date(2024, 1, 1), date(2026, 1, 31))
+    assert used == [1] and len(long_range) == 25 >= profit.PARALLEL_MIN_MONTHS
+
+
+# Series: per-bucket revenue/COGS/expenses/profit through /reports/profit/series.
+# Each carton sells for 100 and costs 10 pieces x 80 = 800.
+
+@pytest.fixture
+def new_year_sales(client, group):
+    """Cartons sold by `group` around 2026-01-01, 5 more by a second group, one expense."""
+    from conftest import sale_payload
+
+    other_id = client.post("/groups/", json={"name": "SR Group 2"}).json()["id"]
+    other_product = client.post("/products/", json=dict(PRODUCT, name="Other", group_id=other_id)).json()["id"]
+    other = {"id": other_id, "product_id": other_product}
+
+    for day, cartons in (("2025-12-31", 1), ("2026-01-01", 2), ("2026-01-31", 3), ("2026-02-01", 4)):
+        assert client.post("/sales/today", json=sale_payload(group, day, cartons, 0)).status_code == 200
+    assert client.post("/sales/today", json=sale_payload(other, "2026-01-15", 5, 0)).status_code == 200
+    client.post("/reports/expense", json={"description": "Van", "amount": 50, "date": "2026-01-10"})
+    return {"group_id": group["id"], "other_id": other_id}
+
+
+def series(client, start: str, end: str, bucket: str, **params) -> list:
+    response = client.get("/reports/profit/series", params={"from": start, "to": end, "bucket": bucket, **params})
+    assert response.status_code == 200
+    return [(e["start"], e["end"], e["revenue"], e["cogs"], e["expense"], e["net_profit"]) for e in response.json()]
+
+
+def test_series_months_across_the_year_boundary(client, new_year_sales):
+    # First and last months are cut to the range
+    assert series(client, "2025-12-15", "2026-02-10", "month") == [
+        ("2025-12-15", "2025-12-31", 100, 800, 0, -700),
+        ("2026-01-01", "2026-01-31", 1000, 8000, 50, -7050),
+        ("2026-02-01", "2026-02-10", 400, 3200, 0, -2800),
+    ]
+
+
+def test_series_days_are_zero_filled(client, new_year_sales):
+    assert series(client, "2025-12-30", "2026-01-02", "day") == [
+        ("2025-12-30", "2025-12-30", 0, 0, 0, 0),
+        ("2025-12-31", "2025-12-31", 100, 800, 0, -700),
+        ("2026-01-01", "2026-01-01", 200, 1600, 0, -1400),
+        ("2026-01-02", "2026-01-02", 0, 0, 0, 0),
+    ]
+
+
+def test_series_weeks_start_on_monday(client, new_year_sales):
+    # 2025-12-31 is a Wednesday: its week runs from Monday 2025-12-29, cut to the range
+    assert series(client, "2025-12-31", "2026-01-14", "week") == [
+        ("2025-12-31", "2026-01-04", 300, 2400, 0, -2100),
+        ("2026-01-05", "2026-01-11", 0, 0, 50, -50),
+        ("2026-01-12", "2026-01-14", 0, 0, 0, 0),
+    ]
+
+
+def test_series_group_filter_leaves_out_expenses(client, new_year_sales):
+    assert series(client, "2026-01-01", "2026-01-31", "month", group_id=new_year_sales["other_id"]) == [
+        ("2026-01-01", "2026-01-31", 500, 4000, 0, -3500),
+    ]
+
+
+def test_series_rejects_bad_ranges(client):
+    assert client.get("/reports/profit/series", params={"from": "2026-02-01", "to": "2026-01-01"}).status_code == 400
+    too_long = {"from": "2000-01-01", "to": "2026-01-01", "bucket": "day"}
+    assert client.get("/reports/profit/series", params=too_long).status_code == 400
+
+
+# Breakdowns: gross profit per SR group / per product, priced by hand below.
+
+@pytest.fixture
+def march_sales(client):
+    """
+    Group A sells 2 cartons + 5 pieces of Soap and a carton of a free sample; group B sells
+    3 cartons of Oil and a carton of A's Soap. A's April sale is outside the range asked for.
+    """
+    groups, products = {}, {}
+    for name in ("A", "B"):
+        groups[name] = client.post("/groups/", json={"name": name}).json()["id"]
+    for name, group, sell, buy in (("Soap", "A", 100, 6), ("Sample", "A", 0, 2), ("Oil", "B", 200, 15)):
+        product = dict(PRODUCT, name=name, group_id=groups[group], sell_price_per_type=sell,
+                       sell_price_per_piece=sell / 10, buy_price_avg=buy)
+        products[name] = client.post("/products/", json=product).json()["id"]
+
+    def sell(group: str, day: str, lines: list):
+        items = [{
+            "product_id": products[name], "request_type_qty": cartons, "request_piece_qty": pieces,
+            "return_type_qty": 0, "return_piece_qty": 0,
+        } for name, cartons, pieces in lines]
+        body = {"group_id": groups[group], "date": day, "cash_received": 0, "sale_items": items, "remarks": []}
+        assert client.post("/sales/today", json=body).status_code == 200
+
+    sell("A", "2026-03-02", [("Soap", 2, 5), ("Sample", 1, 0)])
+    sell("B", "2026-03-03", [("Oil", 3, 0), ("Soap", 1, 0)])
+    sell("A", "2026-04-01", [("Soap", 1, 0)])
+    return {"groups": groups, "products": products}
+
+
+MARCH = {"from": "2026-03-01", "to": "2026-03-31"}
+
+
+def figures(rows: list, key: str) -> dict:
+    return {row[key]: (row["revenue"], row["cogs"], row["gross_profit"], row["margin"]) for row in rows}
+
+
+def test_profit_by_group(client, march_sales):
+    rows = client.get("/reports/profit/by-group", params=MARCH).json()
+    # A: Soap 250 - 25 pieces x 6, Sample 0 - 10 x 2; B: Oil 600 - 30 x 15, Soap 100 - 10 x 6
+    assert figures(rows, "group") == {
+        "A": (250, 170, 80, 32.0),
+        "B": (700, 510, 190, 27.14),
+    }
+    assert [row["group"] for row in rows] == ["B", "A"] # gross_profit, desc
+
+
+def test_profit_by_product(client, march_sales):
+    rows = client.get("/reports/profit/by-product", params=MARCH).json()
+    assert figures(rows, "product") == {
+        "Oil": (600, 450, 150, 25.0),
+        "Soap": (350, 210, 140, 40.0),
+        "Sample": (0, 20, -20, 0.0), # no revenue: margin 0, not a division by zero
+    }
+    soap = next(row for row in rows if row["product"] == "Soap")
+    assert (soap["sold_type_qty"], soap["sold_piece_qty"], soap["group"]) == (3, 5, "A")
+
+
+def test_profit_by_product_top_n_and_group_filter(client, march_sales):
+    top = client.get("/reports/profit/by-product", params=dict(MARCH, limit=2)).json()
+    assert [row["product"] for row in top] == ["Oil", "Soap"]
+
+    worst_margin = client.get("/reports/profit/by-product", params=dict(MARCH, sort="margin", order="asc", limit=1)).json()
+    assert [row["product"] for row in worst_margin] == ["Sample"]
+
+    # Only what group B sold, including the other group's Soap
+    sold_by_b = client.get("/reports/profit/by-product", params=dict(MARCH, group_id=march_sales["groups"]["B"])).json()
+    assert figures(sold_by_b, "product") == {"Oil": (600, 450, 150, 25.0), "Soap": (100, 60, 40, 40.0)}
+
+
+def test_profit_breakdowns_default_to_all_sales(client, march_sales):
+    rows = client.get("/reports/profit/by-group").json()
+    assert figures(rows, "group")["A"] == (350, 230, 120, 34.29)
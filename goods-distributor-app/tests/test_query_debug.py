@@ -0,0 +1,61 @@
+"""
+The N+1 detector (QUERY_DEBUG=1, QUERY_DEBUG_RAISE=1, set in conftest.py) fails requests
+that repeat a statement, and the endpoints that used to do so stay clean.
+
+    python -m pytest tests/test_query_debug.py -q
+"""
+import pytest
+from conftest import PRODUCT, sale_payload
+
+# More lines than the detector's repeat threshold
+LINES = 15
+
+
+@pytest.fixture
+def many_products(client, group):
+    ids = [group["product_id"]]
+    for i in range(LINES - 1):
+        ids.append(client.post("/products/", json=dict(PRODUCT, name=f"Product {i}", group_id=group["id"])).json()["id"])
+    return ids
+
+
+def test_repeated_statement_raises(client):
+    from sqlalchemy import text
+    import database, metrics, query_debug
+
+    assert query_debug.ENABLED and query_debug.RAISE
+    token = metrics._request_stats.set({"queries": 0, "db_seconds": 0.0})
+    try:
+        with database.engine.connect() as conn:
+            with pytest.raises(query_debug.QueryDebugError):
+                # The shape of a lazy load inside a loop
+                for product_id in range(query_debug.REPEAT_THRESHOLD + 1):
+                    conn.execute(text("SELECT name FROM products WHERE id = :id"), {"id": product_id})
+    finally:
+        metrics._request_stats.reset(token)
+
+
+def test_sale_save_and_lock_load_products_once(client, group, many_products):
+    payload = sale_payload(group, "2026-03-02", 1, 0)
+    payload["sale_items"] = [dict(payload["sale_items"][0], product_id=product_id) for product_id in many_products]
+
+    saved = client.post("/sales/today", json=payload)
+    assert saved.status_code == 200
+    assert saved.json()["total_amount"] == 100 * LINES
+    assert client.post(f"/sales/{saved.json()['id']}/lock").status_code == 200
+
+
+def test_product_taken_list_loads_products_once(client, group, many_products):
+    for product_id in many_products:
+        taken = {"group_id": group["id"], "product_id": product_id, "quantity": 1, "pieces": 0, "total_price": 90}
+        assert client.post("/total-due/product-taken", json=taken).status_code == 200
+
+    items = client.get(f"/total-due/{group['id']}/product-taken").json()
+    assert len(items) == LINES
+    assert {item["quantity_type"] for item in items} == {"Cartoon"}
+
+
+def test_group_list_loads_products_once(client, many_products):
+    for i in range(LINES):
+        client.post("/groups/", json={"name": f"Group {i}"})
+    assert client.get("/groups/").status_code == 200
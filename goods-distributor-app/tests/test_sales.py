@@ -0,0 +1,101 @@
+"""
+One daily sale per group and day: saves upsert it, locked days refuse edits, and startup
+removes copies left by older versions.
+
+    python -m pytest tests/test_sales.py -q
+"""
+import pytest
+from sqlalchemy import text
+from conftest import sale_payload
+
+
+def test_resave_updates_the_same_row(client, db, group):
+    import models
+
+    first = client.post("/sales/today", json=sale_payload(group, "2026-03-02", 2, 50))
+    second = client.post("/sales/today", json=sale_payload(group, "2026-03-02", 3, 50))
+    assert first.json()["id"] == second.json()["id"]
+    assert second.json()["total_amount"] == 300
+    assert db.query(models.DailySale).count() == 1
+    assert db.query(models.SaleItem).count() == 1
+
+
+def test_locked_sale_cannot_be_resaved(client, db, group):
+    import models
+
+    sale_id = client.post("/sales/today", json=sale_payload(group, "2026-03-02", 2, 50)).json()["id"]
+    assert client.post(f"/sales/{sale_id}/lock").status_code == 200
+
+    response = client.post("/sales/today", json=sale_payload(group, "2026-03-02", 5, 0))
+    assert response.status_code == 400
+    sale = db.get(models.DailySale, sale_id)
+    assert (sale.total_amount, sale.cash_received, sale.is_locked) == (200, 50, 1)
+
+
+@pytest.fixture(params=["original", "copy", None])
+def duplicate_day(request, client, group):
+    """
+    A sale saved through the API plus a second copy of the same form (and two targets for
+    one month), inserted behind the unique indexes' back like the old racing saves did.
+    The param says which of the two is locked. The copy also has a remark that was paid.
+    """
+    import database
+
+    # 2 cartons (200) - 50 cash - 30 remark = 120 commission
+    sale_id = client.post("/sales/today", json=sale_payload(group, "2026-03-02", 2, 50, remarks=[30])).json()["id"]
+    if request.param == "original":
+        assert client.post(f"/sales/{sale_id}/lock").status_code == 200
+
+    with database.engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_daily_sales_group_date"))
+        conn.execute(text("DROP INDEX uq_monthly_targets_group_year_month"))
+        copy_id = conn.execute(text(
+            "INSERT INTO daily_sales (group_id, date, year_month, total_amount, cash_received, due, commission, status, is_locked) "
+            "VALUES (:group_id, '2026-03-02', 202603, 200, 50, 120, 120, :status, :locked) RETURNING id"
+        ), {"group_id": group["id"], "locked": int(request.param == "copy"),
+            "status": "completed" if request.param == "copy" else "draft"}).scalar()
+        conn.execute(text(
+            "INSERT INTO sale_items (daily_sale_id, product_id, request_type_qty, request_piece_qty, "
+            "return_type_qty, return_piece_qty, sold_type_qty, sold_piece_qty, price) "
+            "VALUES (:sale_id, :product_id, 2, 0, 0, 0, 2, 0, 200)"
+        ), {"sale_id": copy_id, "product_id": group["product_id"]})
+        conn.execute(text(
+            "INSERT INTO sale_remarks (daily_sale_id, comment, amount, paid_amount, is_fully_paid) "
+            "VALUES (:sale_id, 'remark 0', 30, 0, 0), (:sale_id, 'van fare', 10, 10, 1)"
+        ), {"sale_id": copy_id})
+        for amount in (1000, 2000):
+            conn.execute(text(
+                "INSERT INTO monthly_targets (group_id, month, year_month, target_amount) "
+                "VALUES (:group_id, '2026-03', 202603, :amount)"
+            ), {"group_id": group["id"], "amount": amount})
+    keep_id = copy_id if request.param == "copy" else sale_id
+    return {"keep_id": keep_id, "locked": request.param is not None}
+
+
+def test_startup_dedupes_duplicate_days(client, db, group, duplicate_day):
+    import balances, db_init, models
+
+    db_init.init_db()
+
+    # The locked copy (else the oldest) is kept as it was, not summed with the other
+    keep_id = duplicate_day["keep_id"]
+    sales = db.query(models.DailySale).all()
+    assert [s.id for s in sales] == [keep_id]
+    assert (sales[0].total_amount, sales[0].cash_received, sales[0].commission) == (200, 50, 120)
+    assert sales[0].is_locked == int(duplicate_day["locked"])
+    assert db.query(models.SaleItem).count() == 1
+    # The other copy's unpaid remark went with it; its paid one was moved over
+    remarks = db.query(models.SaleRemark).order_by(models.SaleRemark.amount).all()
+    assert [(r.daily_sale_id, r.amount, r.paid_amount or 0) for r in remarks] == [(keep_id, 10, 10), (keep_id, 30, 0)]
+
+    # Both are recomputed from the kept day
+    assert balances.verify(db) == []
+    rollups = [(r.sold_pieces, r.revenue) for r in db.query(models.ProductSaleRollup).all()]
+    assert rollups == ([(20, 200)] if duplicate_day["locked"] else [])
+
+    targets = db.query(models.MonthlyTarget).all()
+    assert [t.target_amount for t in targets] == [2000]
+
+    # The unique indexes are back, so the next save upserts the merged day
+    indexes = {row[0] for row in db.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    assert {"uq_daily_sales_group_date", "uq_monthly_targets_group_year_month"} <= indexes
@@ -0,0 +1,90 @@
+"""
+Analytics snapshots (snapshots.py): exported months must give the same profit breakdowns
+as SQLite, and a month whose locked sales changed must fall back to SQLite.
+
+    python -m pytest tests/test_snapshots.py -q
+"""
+from datetime import date
+import pytest
+from sqlalchemy import text
+from conftest import sale_payload
+
+pytest.importorskip("pyarrow")
+
+YEAR = (date(2026, 1, 1), date(2026, 12, 31))
+
+
+@pytest.fixture
+def locked_march(client, group, tmp_path, monkeypatch):
+    """Two locked March sales (finished month) and one draft in April."""
+    monkeypatch.setenv("SNAPSHOT_DIR", str(tmp_path))
+    sale_ids = []
+    for day, cartons in (("2026-03-02", 2), ("2026-03-10", 3)):
+        sale_id = client.post("/sales/today", json=sale_payload(group, day, cartons, 0)).json()["id"]
+        assert client.post(f"/sales/{sale_id}/lock").status_code == 200
+        sale_ids.append(sale_id)
+    client.post("/sales/today", json=sale_payload(group, "2026-04-05", 1, 0))
+    return sale_ids
+
+
+def breakdowns(client) -> tuple:
+    return client.get("/reports/profit/by-group").json(), client.get("/reports/profit/by-product").json()
+
+
+def assert_same_figures(rows: list, expected: list):
+    assert len(rows) == len(expected)
+    for row, expected_row in zip(rows, expected):
+        assert row == pytest.approx(expected_row)
+
+
+def test_exported_month_gives_the_same_breakdowns(client, db, group, locked_march):
+    import snapshots
+
+    before = breakdowns(client)
+    assert snapshots.export(db) == {"written": ["2026-03"], "skipped": {"2026-04": "1 unlocked sale(s)"}}
+    assert snapshots.covered_months(db, *YEAR) == [date(2026, 3, 1)]
+
+    after = breakdowns(client)
+    for rows, expected in zip(after, before):
+        assert_same_figures(rows, expected)
+
+    # Exported again only when forced
+    assert snapshots.export(db)["skipped"]["2026-03"] == "already exported"
+    assert snapshots.export(db, force=True)["written"] == ["2026-03"]
+
+
+def test_month_with_unlocked_sales_is_not_exported(client, db, group, locked_march):
+    import snapshots
+
+    client.post("/sales/today", json=sale_payload(group, "2026-03-20", 1, 0)) # a March draft
+    result = snapshots.export(db)
+    assert result["written"] == []
+    assert result["skipped"]["2026-03"] == "1 unlocked sale(s)"
+    assert snapshots.covered_months(db, *YEAR) == []
+
+
+def test_corrected_sale_makes_the_file_stale(client, db, group, locked_march):
+    import database, snapshots
+
+    snapshots.export(db)
+    # A correction to a locked sale: fewer cartons, and its total with them
+    with database.engine.begin() as conn:
+        conn.execute(text("UPDATE sale_items SET sold_type_qty = 1, price = 100 WHERE daily_sale_id = :id"),
+                     {"id": locked_march[1]})
+        conn.execute(text("UPDATE daily_sales SET total_amount = 100 WHERE id = :id"), {"id": locked_march[1]})
+
+    assert snapshots.covered_months(db, *YEAR) == []
+    by_group, _ = breakdowns(client)
+    assert by_group[0]["revenue"] == pytest.approx(100 * (2 + 1 + 1)) # from SQLite, April draft included
+
+
+def test_extra_locked_sale_makes_the_file_stale(client, db, group, locked_march):
+    import snapshots
+
+    snapshots.export(db)
+    sale_id = client.post("/sales/today", json=sale_payload(group, "2026-03-20", 4, 0)).json()["id"]
+    assert client.post(f"/sales/{sale_id}/lock").status_code == 200
+
+    assert snapshots.covered_months(db, *YEAR) == []
+    by_group, _ = breakdowns(client)
+    assert by_group[0]["revenue"] == pytest.approx(100 * (2 + 3 + 4 + 1))
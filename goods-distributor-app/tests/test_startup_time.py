@@ -0,0 +1,72 @@
+"""
+Cold-start budget for the API process, measured with `python -X importtime`.
+
+    python -m pytest tests/test_startup_time.py -q
+    python tests/test_startup_time.py            # breakdown of the slowest imports
+
+STARTUP_BUDGET_MS overrides the budget (slow CI machines).
+"""
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# Best of RUNS `import main` must stay under this: ~890 ms measured when it was set, plus
+# a margin for noise, so a regression the size of an eager jose import still fails
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", "1000"))
+RUNS = 5
+
+# Only needed by specific requests (tokens, logins, analytics snapshots), so they must
+# not be imported at startup
+LAZY_MODULES = ("jose", "bcrypt", "pyarrow")
+
+
+def import_profile() -> dict:
+    """module -> (self_us, cumulative_us) for a fresh `import main`."""
+    env = dict(os.environ, DB_INIT_ON_STARTUP="0")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def test_startup_within_budget():
+    best_ms = min(import_profile()["main"][1] for _ in range(RUNS)) / 1000
+    assert best_ms < STARTUP_BUDGET_MS, f"import main took {best_ms:.0f} ms (budget {STARTUP_BUDGET_MS:.0f} ms)"
+
+
+def test_heavy_dependencies_are_lazy():
+    profile = import_profile()
+    eager = [m for m in profile if m.split(".")[0] in LAZY_MODULES]
+    assert not eager, f"imported at startup: {', '.join(sorted(eager))}"
+
+
+def test_routes_registered_once():
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault("DB_INIT_ON_STARTUP", "0")
+    import main
+
+    seen, duplicates = set(), []
+    for route in main.app.routes:
+        for method in getattr(route, "methods", None) or ():
+            key = (method, route.path)
+            if key in seen:
+                duplicates.append(f"{method} {route.path}")
+            seen.add(key)
+    assert not duplicates, f"registered more than once: {', '.join(duplicates)}"
+
+
+if __name__ == "__main__":
+    profile = import_profile()
+    print(f"import main: {profile['main'][1] / 1000:.0f} ms (budget {STARTUP_BUDGET_MS:.0f} ms)\n")
+    print(f"{'module':<50} {'self ms':>8} {'total ms':>9}")
+    for name, (self_us, cumulative_us) in sorted(profile.items(), key=lambda kv: -kv[1][1])[:25]:
+        print(f"{name:<50} {self_us / 1000:>8.1f} {cumulative_us / 1000:>9.1f}")
@@ -0,0 +1,35 @@
+"""
+The login store: an unknown username costs one indexed lookup, not a reload of the users table.
+
+    python -m pytest tests/test_users.py -q
+"""
+import pytest
+
+
+def test_unknown_username_is_looked_up_alone(client, db):
+    import models, users
+
+    store = users.DatabaseUserStore()
+    assert store.get("admin")["role"] == "admin"
+
+    loads, fetches = [], []
+    store._load = lambda: loads.append(1) or {}
+    fetch = store._fetch
+    store._fetch = lambda username: fetches.append(username) or fetch(username)
+    assert store.get("nobody") is None
+    assert store.get("nobody") is None # remembered, no second lookup
+    assert fetches == ["nobody"]
+
+    # Created by another process since the table was cached
+    db.add(models.User(username="sr2", password_hash=users.hash_password("secret"), role="sr"))
+    db.commit()
+    assert store.authenticate("sr2", "secret")["role"] == "sr"
+    assert fetches == ["nobody", "sr2"]
+    assert loads == []
+
+
+def test_user_store_is_abstract():
+    import users
+
+    with pytest.raises(TypeError):
+        users.UserStore()